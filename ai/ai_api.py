@@ -3,12 +3,17 @@ AI Style Builder API
 Provides outfit recommendations using cosine similarity on CLIP embeddings
 """
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from pymongo import MongoClient
 import os
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+
+from db_schema import check_plans, ensure_all
+from embedding_ledger import backlog_summary, recent_runs
+from embeddings import DEFAULT_FUSION, JOB_FIELD, PENDING_QUERY
+from leases import LeaseQueue
+from price_history import MAX_IDS, PriceHistory, price_value
+from vector_index import VectorIndex
 
 app = Flask(__name__)
 CORS(app)
@@ -18,6 +23,27 @@ client = MongoClient("mongodb://localhost:27017/")
 db = client["value_scout"]
 products_collection = db["products"]
 
+def _fusion_from_env(name, default):
+    """Read an "image,text" weighting such as "0.7,0.3" from the environment"""
+    raw = os.getenv(name)
+    if not raw:
+        return dict(default)
+    image_w, text_w = (float(x) for x in raw.split(","))
+    return {"image": image_w, "text": text_w}
+
+# Fusion weights per endpoint (image/text share of the serving vector)
+# Changing these only rebuilds the in-memory index - stored vectors are untouched
+ENDPOINT_FUSION = {
+    "style-builder": _fusion_from_env("STYLE_BUILDER_FUSION", DEFAULT_FUSION),
+    "similar": _fusion_from_env("SIMILAR_FUSION", {"image": 0.9, "text": 0.1}),
+}
+
+# Serving index built from stored imageEmbedding/textEmbedding components
+style_index = VectorIndex(products_collection, ttl_seconds=int(os.getenv("AI_INDEX_TTL", "300")))
+
+# Monthly price buckets appended by the Python ingest path (indexes are ensured in __main__)
+price_store = PriceHistory(db["price_history"], create_indexes=False)
+
 # Outfit Category Rules
 # Maps a product category to compatible categories for outfit building
 OUTFIT_RULES = {
@@ -31,6 +57,29 @@ OUTFIT_RULES = {
     "shorts": ["tshirt", "shirt", "hoodie", "jacket", "shoes"],
 }
 
+class InvalidFusionWeights(ValueError):
+    """?imageWeight=/?textWeight= out of range (a 400, unlike errors from the search itself)"""
+
+def no_usable_embedding(product_id):
+    return jsonify({
+        "error": "Product has no usable embedding",
+        "product_id": product_id,
+        "message": "Its stored embedding has no image component; re-run process_embeddings.py"
+    }), 400
+
+def fusion_weights(endpoint):
+    """Endpoint weighting, optionally overridden with ?imageWeight=&textWeight="""
+    weights = dict(ENDPOINT_FUSION[endpoint])
+    image_w = request.args.get("imageWeight", type=float)
+    text_w = request.args.get("textWeight", type=float)
+    if image_w is not None:
+        weights["image"] = image_w
+    if text_w is not None:
+        weights["text"] = text_w
+    if weights["image"] < 0 or weights["text"] < 0 or weights["image"] + weights["text"] == 0:
+        raise InvalidFusionWeights("Fusion weights must be non-negative and not both zero")
+    return weights
+
 @app.route('/api/style-builder/<product_id>', methods=['GET'])
 def get_style_recommendations(product_id):
     """
@@ -55,9 +104,9 @@ def get_style_recommendations(product_id):
                 "message": "Run process_embeddings.py first"
             }), 400
         
-        # STEP 2: Get input embedding
-        input_embedding = np.array(input_product["styleEmbedding"]).reshape(1, -1)
+        # STEP 2: Resolve category and fusion weights
         input_category = input_product.get("category", "clothing")
+        weights = fusion_weights("style-builder")
         
         # STEP 3: Determine target categories
         target_categories = OUTFIT_RULES.get(input_category, [])
@@ -69,28 +118,17 @@ def get_style_recommendations(product_id):
                 "available_categories": list(OUTFIT_RULES.keys())
             }), 400
         
-        # STEP 4: Query candidate products
-        cursor = products_collection.find(
-            {
-                "category": {"$in": target_categories},
-                "styleEmbedding": {"$exists": True},
-                "_id": {"$ne": product_id}  # Exclude input product
-            },
-            {
-                "_id": 1,
-                "styleEmbedding": 1
-            }
-        )
-        
-        # STEP 5: Build candidate lists
-        candidate_ids = []
-        candidate_embeddings = []
+        # STEP 4: Fused query vector from the stored image/text components
+        input_embedding = style_index.query_vector(input_product, weights)
+        if input_embedding is None:
+            return no_usable_embedding(product_id)
         
-        for candidate in cursor:
-            candidate_ids.append(candidate["_id"])
-            candidate_embeddings.append(candidate["styleEmbedding"])
+        # STEP 5: Score candidates in the target categories (input excluded)
+        top_5_results, total_candidates = style_index.search(
+            input_embedding, target_categories, weights, exclude_id=product_id, k=5
+        )
         
-        if len(candidate_ids) == 0:
+        if total_candidates == 0:
             return jsonify({
                 "error": "No matching products found",
                 "input_category": input_category,
@@ -98,38 +136,208 @@ def get_style_recommendations(product_id):
                 "message": "Try scraping more products or generating more embeddings"
             }), 404
         
-        # STEP 6: Convert to numpy array
-        candidate_embeddings = np.array(candidate_embeddings)
-        
-        # STEP 7: Calculate cosine similarity
-        similarities = cosine_similarity(input_embedding, candidate_embeddings)[0]
-        
-        # STEP 8: Sort by similarity (descending)
-        sorted_indices = np.argsort(similarities)[::-1]
-        
-        # STEP 9: Get top 5 results
-        top_5_results = []
-        for idx in sorted_indices[:5]:
-            top_5_results.append({
-                "id": candidate_ids[idx],
-                "score": float(similarities[idx])  # Convert numpy float to Python float
-            })
-        
-        # STEP 10: Return results
+        # STEP 6: Return results
         return jsonify({
             "input_product_id": product_id,
             "input_category": input_category,
             "target_categories": target_categories,
-            "total_candidates": len(candidate_ids),
+            "total_candidates": total_candidates,
+            "fusion": weights,
             "recommendations": top_5_results
         }), 200
         
+    except InvalidFusionWeights as e:
+        return jsonify({"error": "Invalid fusion weights", "message": str(e)}), 400
     except Exception as e:
         return jsonify({
             "error": "Internal server error",
             "message": str(e)
         }), 500
 
+@app.route('/api/similar/<product_id>', methods=['GET'])
+def get_similar_products(product_id):
+    """
+    Same-category lookalikes for a product (image-heavy fusion by default)
+    Useful for comparing near-identical items across stores
+    """
+    try:
+        input_product = products_collection.find_one({"_id": product_id})
+        if not input_product:
+            return jsonify({"error": "Product not found", "product_id": product_id}), 404
+        if "styleEmbedding" not in input_product:
+            return jsonify({
+                "error": "Product has no style embedding",
+                "product_id": product_id,
+                "message": "Run process_embeddings.py first"
+            }), 400
+
+        category = input_product.get("category", "clothing")
+        weights = fusion_weights("similar")
+        limit = max(1, min(request.args.get("limit", default=5, type=int), 50))
+
+        query_vec = style_index.query_vector(input_product, weights)
+        if query_vec is None:
+            return no_usable_embedding(product_id)
+        results, total_candidates = style_index.search(
+            query_vec, [category], weights, exclude_id=product_id, k=limit
+        )
+        return jsonify({
+            "input_product_id": product_id,
+            "category": category,
+            "total_candidates": total_candidates,
+            "fusion": weights,
+            "similar": results
+        }), 200
+
+    except InvalidFusionWeights as e:
+        return jsonify({"error": "Invalid fusion weights", "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+
+def requested_ids():
+    """Product ids from ?ids=a,b,c (or repeated ?id=), at most MAX_IDS"""
+    ids = [i for raw in request.args.getlist("ids") for i in raw.split(",") if i]
+    ids += request.args.getlist("id")
+    ids = list(dict.fromkeys(i.strip() for i in ids if i.strip()))
+    if not ids:
+        raise ValueError("Pass product ids as ?ids=a,b,c")
+    if len(ids) > MAX_IDS:
+        raise ValueError(f"At most {MAX_IDS} ids per request")
+    return ids
+
+def _price_stats_json(stats):
+    if stats and stats.get("currentAt"):
+        stats = {**stats, "currentAt": stats["currentAt"].isoformat()}
+    return stats
+
+@app.route('/api/prices/<product_id>', methods=['GET'])
+def get_price_history(product_id):
+    """Price history of one product with its stats and the lowest price in ?lowestDays= (default 30)"""
+    try:
+        days = request.args.get("days", type=int)
+        lowest_days = request.args.get("lowestDays", default=30, type=int)
+        points = price_store.history([product_id], days)[product_id]
+        if not points:
+            return jsonify({"error": "No price history", "product_id": product_id}), 404
+        return jsonify({
+            "product_id": product_id,
+            "days": days,
+            "history": [{"at": at.isoformat(), "price": price} for at, price in points],
+            "stats": _price_stats_json(price_store.stats([product_id], days)[product_id]),
+            "lowest": _price_stats_json(price_store.lowest([product_id], lowest_days)[product_id])
+        }), 200
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+
+@app.route('/api/prices/history', methods=['GET'])
+def get_price_histories():
+    """Price points of many products (?ids=a,b,c&days=90)"""
+    try:
+        days = request.args.get("days", type=int)
+        history = price_store.history(requested_ids(), days)
+        return jsonify({
+            "days": days,
+            "history": {
+                pid: [{"at": at.isoformat(), "price": price} for at, price in points]
+                for pid, points in history.items()
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": "Invalid request", "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+
+@app.route('/api/prices/stats', methods=['GET'])
+def get_price_stats():
+    """Min/max/average and current price of many products (?ids=a,b,c&days=90; all history without days)"""
+    try:
+        days = request.args.get("days", type=int)
+        stats = price_store.stats(requested_ids(), days)
+        return jsonify({"days": days, "stats": {pid: _price_stats_json(s) for pid, s in stats.items()}}), 200
+    except ValueError as e:
+        return jsonify({"error": "Invalid request", "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+
+@app.route('/api/prices/lowest', methods=['GET'])
+def get_lowest_prices():
+    """Whether each product is at its lowest price of the last ?days= days (default 30)"""
+    try:
+        days = request.args.get("days", default=30, type=int)
+        lowest = price_store.lowest(requested_ids(), days)
+        return jsonify({"days": days, "lowest": {pid: _price_stats_json(s) for pid, s in lowest.items()}}), 200
+    except ValueError as e:
+        return jsonify({"error": "Invalid request", "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+
+OFFER_PROJECTION = {"productName": 1, "brand": 1, "source": 1, "price": 1, "productUrl": 1, "imageUrl": 1,
+                    "clusterId": 1}
+
+@app.route('/api/products/<product_id>/offers', methods=['GET'])
+def get_offers(product_id):
+    """
+    The same product at every retailer (near-duplicate cluster from product_clusters.py),
+    cheapest first, each with its lowest price of the last ?days= days (default 30)
+    """
+    try:
+        product = products_collection.find_one({"_id": product_id}, OFFER_PROJECTION)
+        if not product:
+            return jsonify({"error": "Product not found", "product_id": product_id}), 404
+        cluster_id = product.get("clusterId")
+        members = [product]
+        if cluster_id:
+            members = list(products_collection.find(
+                {"clusterId": cluster_id, "delisted": {"$ne": True}}, OFFER_PROJECTION
+            ))
+        days = request.args.get("days", default=30, type=int)
+        lowest = price_store.lowest([m["_id"] for m in members], days)
+
+        offers = []
+        for m in members:
+            low = lowest.get(m["_id"])
+            offers.append({
+                "id": m["_id"],
+                "source": m.get("source"),
+                "brand": m.get("brand"),
+                "productName": m.get("productName"),
+                "price": price_value(m.get("price")),
+                "productUrl": m.get("productUrl"),
+                "imageUrl": m.get("imageUrl"),
+                "lowestPrice": low["lowest"] if low else None,
+            })
+        offers.sort(key=lambda o: (o["price"] is None, o["price"] or 0))
+        return jsonify({
+            "product_id": product_id,
+            "cluster_id": cluster_id,
+            "days": days,
+            "offers": offers,
+            "cheapest": offers[0]["id"] if offers and offers[0]["price"] is not None else None
+        }), 200
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+
+@app.route('/api/index/rebuild', methods=['POST'])
+def rebuild_index():
+    """Reload stored vectors into the serving index (e.g. after an embedding run)"""
+    try:
+        stats = style_index.load()
+        return jsonify({"status": "rebuilt", "index": stats, "fusion": ENDPOINT_FUSION}), 200
+    except Exception as e:
+        return jsonify({"error": "Index rebuild failed", "message": str(e)}), 500
+
+@app.route('/api/embeddings/progress', methods=['GET'])
+def embedding_progress():
+    """Embedding backlog state and the latest runs (throughput, ETA)"""
+    try:
+        queue = LeaseQueue(products_collection, PENDING_QUERY, JOB_FIELD)
+        return jsonify({
+            "backlog": backlog_summary(queue),
+            "runs": recent_runs(db, limit=request.args.get("limit", default=5, type=int))
+        }), 200
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -143,7 +351,8 @@ def health_check():
             "database": "connected",
             "total_products": products_count,
             "products_with_embeddings": embeddings_count,
-            "embedding_coverage": f"{(embeddings_count/products_count*100):.1f}%" if products_count > 0 else "0%"
+            "embedding_coverage": f"{(embeddings_count/products_count*100):.1f}%" if products_count > 0 else "0%",
+            "index": style_index.stats()
         }), 200
     except Exception as e:
         return jsonify({
@@ -159,10 +368,19 @@ def root():
         "version": "1.0",
         "endpoints": {
             "GET /api/style-builder/<product_id>": "Get outfit recommendations for a product",
+            "GET /api/similar/<product_id>": "Get same-category lookalikes for a product",
+            "POST /api/index/rebuild": "Reload stored vectors into the serving index",
+            "GET /api/embeddings/progress": "Embedding backlog and recent run progress",
+            "GET /api/products/<product_id>/offers": "The same product at other retailers, cheapest first",
+            "GET /api/prices/<product_id>": "Price history, stats and lowest price of a product",
+            "GET /api/prices/history?ids=": "Price points of many products",
+            "GET /api/prices/stats?ids=": "Min/max/average and current price of many products",
+            "GET /api/prices/lowest?ids=&days=": "Whether products are at their lowest price in N days",
             "GET /api/health": "Check API health and database stats",
             "GET /": "This documentation"
         },
-        "outfit_rules": OUTFIT_RULES
+        "outfit_rules": OUTFIT_RULES,
+        "fusion": ENDPOINT_FUSION
     }), 200
 
 if __name__ == '__main__':
@@ -172,9 +390,20 @@ if __name__ == '__main__':
     print("Server starting on http://localhost:5000")
     print("\nEndpoints:")
     print("  GET /api/style-builder/<product_id>")
+    print("  GET /api/similar/<product_id>")
+    print("  POST /api/index/rebuild")
+    print("  GET /api/embeddings/progress")
+    print("  GET /api/products/<product_id>/offers")
+    print("  GET /api/prices/<product_id>")
+    print("  GET /api/prices/history|stats|lowest?ids=")
     print("  GET /api/health")
     print("="*60 + "\n")
     
+    # Indexes of the hot queries; a plan that still scans the collection is reported, not fatal
+    ensure_all(db)
+    check_plans(db, strict=False)
+    print()
+
     host = os.getenv("AI_API_HOST", "127.0.0.1")
     port = int(os.getenv("AI_API_PORT", "5000"))
     debug = os.getenv("FLASK_DEBUG", "0") == "1"
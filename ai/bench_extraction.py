@@ -0,0 +1,266 @@
+"""
+Offline extraction benchmark over the fixture corpus (scrape_fixtures.py)
+Replays every captured listing page from a local server and reads it the way
+the scrapers do, once per extraction mode:
+
+  evaluate      one page.evaluate per page (default scraper path)
+  per-element   the old query_selector / inner_text / get_attribute round trips
+  static        static_html.py on the stored HTML (no browser, as http_ingest.py)
+  feed          Shopify products.json pages through shopify_records
+
+Per site and mode it reports pages/s and cards/s (page load + extraction),
+extraction ms per page, IPC calls per page (every Playwright method call on
+the page or an element handle is one round trip), parse errors, and product
+ids that differ from the ones recorded at capture time. --save appends the
+results, tagged with the current git commit, to benchmarks/extraction.jsonl
+and prints the change against the previous entry.
+
+    python bench_extraction.py
+    python bench_extraction.py --mode evaluate --mode static --repeat 3 --save
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+from datetime import datetime
+
+from scrape_fixtures import CORPUS_DIR, Corpus, serve
+from scrape_sites import SITES, build_docs, listing_url
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "extraction.jsonl")
+MODES = ("evaluate", "per-element", "static", "feed")
+_PLAIN = (str, bytes, int, float, bool, dict, type(None))
+
+
+class CallCounter:
+    """Counts method calls on a Playwright page and every handle it returns"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def wrap(self, value):
+        if isinstance(value, list):
+            return [self.wrap(v) for v in value]
+        if isinstance(value, _PLAIN):
+            return value
+        return _Counted(value, self)
+
+
+class _Counted:
+    def __init__(self, target, counter):
+        self._target = target
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._counter.calls += 1
+            return self._counter.wrap(attr(*args, **kwargs))
+
+        return call
+
+
+class ModeResult:
+    def __init__(self, site, mode):
+        self.site = site
+        self.mode = mode
+        self.pages = 0
+        self.cards = 0
+        self.docs = 0
+        self.seconds = 0.0
+        self.extract_seconds = 0.0
+        self.ipc = 0
+        self.parse_errors = 0
+        self.id_mismatches = 0
+
+    def record(self, entry, site, records, seconds, extract_seconds, ipc):
+        errors = []
+        ids = [d["_id"] for d in build_docs(site, records, errors=errors)]
+        self.pages += 1
+        self.cards += len(records)
+        self.docs += len(ids)
+        self.seconds += seconds
+        self.extract_seconds += extract_seconds
+        self.ipc += ipc
+        self.parse_errors += len(errors)
+        # Order-insensitive diff against the ids parsed when the page was captured
+        self.id_mismatches += len(set(ids) ^ set(entry["ids"]))
+
+    def summary(self):
+        pages = max(self.pages, 1)
+        seconds = max(self.seconds, 1e-9)
+        return {
+            "site": self.site,
+            "mode": self.mode,
+            "pages": self.pages,
+            "cards": self.cards,
+            "docs": self.docs,
+            "pages_per_s": round(self.pages / seconds, 2),
+            "cards_per_s": round(self.cards / seconds, 1),
+            "extract_ms_per_page": round(self.extract_seconds / pages * 1000, 2),
+            "ipc_per_page": round(self.ipc / pages, 1),
+            "parse_errors": self.parse_errors,
+            "id_mismatches": self.id_mismatches,
+        }
+
+
+def bench_browser(entries, base_url, mode, repeat=1):
+    from playwright.sync_api import sync_playwright
+
+    from card_extract import EXTRACTORS
+    from page_profile import attach, goto
+    from scraper import get_browser, get_context
+
+    extract = EXTRACTORS[mode]
+    results = {}
+    with sync_playwright() as p:
+        browser = get_browser(p, headless=True)
+        ctx = get_context(browser)
+        page = ctx.new_page()
+        attach(page, "light")
+        for _ in range(repeat):
+            for entry in entries:
+                site = SITES[entry["site"]]
+                res = results.setdefault(entry["site"], ModeResult(entry["site"], mode))
+                url = listing_url(site, entry["query"], entry["page"], f"{base_url}/{entry['slug']}")
+                started = time.perf_counter()
+                goto(page, url, site["wait_until"])
+                if site["wait_for"]:
+                    page.wait_for_selector(site["wait_for"], timeout=20000)
+                counter = CallCounter()
+                extract_started = time.perf_counter()
+                records = extract(counter.wrap(page), site["card"])
+                done = time.perf_counter()
+                res.record(entry, site, records, done - started, done - extract_started, counter.calls)
+        ctx.close()
+        browser.close()
+    return list(results.values())
+
+
+def bench_static(corpus, entries, repeat=1):
+    from static_html import extract_cards_html
+
+    results = {}
+    for _ in range(repeat):
+        for entry in entries:
+            site = SITES[entry["site"]]
+            res = results.setdefault(entry["site"], ModeResult(entry["site"], "static"))
+            html = corpus.read(entry)
+            started = time.perf_counter()
+            records = extract_cards_html(html, site["card"])
+            elapsed = time.perf_counter() - started
+            res.record(entry, site, records, elapsed, elapsed, 0)
+    return list(results.values())
+
+
+def bench_feed(corpus, entries, repeat=1):
+    from http_ingest import shopify_records
+
+    results = {}
+    for _ in range(repeat):
+        for entry in entries:
+            site = SITES[entry["site"]]
+            res = results.setdefault(entry["site"], ModeResult(entry["site"], "feed"))
+            body = corpus.read(entry)
+            started = time.perf_counter()
+            records = shopify_records(json.loads(body))
+            elapsed = time.perf_counter() - started
+            res.record(entry, site, records, elapsed, elapsed, 0)
+    return list(results.values())
+
+
+def run_benchmark(modes=MODES, labels=None, repeat=1, root=CORPUS_DIR):
+    corpus = Corpus(root)
+    html_entries = corpus.entries("html", labels)
+    feed_entries = corpus.entries("json", labels)
+    if not html_entries and not feed_entries:
+        print(f"⚠️ Empty fixture corpus at {root} - run scrape_fixtures.py capture first")
+        return []
+
+    results = []
+    server = None
+    try:
+        for mode in modes:
+            if mode in ("evaluate", "per-element") and html_entries:
+                if server is None:
+                    server, base_url = serve(root, port=0, background=True)
+                results += bench_browser(html_entries, base_url, mode, repeat)
+            elif mode == "static" and html_entries:
+                results += bench_static(corpus, html_entries, repeat)
+            elif mode == "feed" and feed_entries:
+                results += bench_feed(corpus, feed_entries, repeat)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    return [r.summary() for r in results]
+
+
+def print_results(rows):
+    print("\n" + "=" * 100)
+    print(f"{'site':<12} {'mode':<12} {'pages':>5} {'cards':>6} {'pages/s':>9} {'cards/s':>9} "
+          f"{'ext ms/pg':>9} {'IPC/pg':>7} {'errors':>6} {'id diff':>7}")
+    print("=" * 100)
+    for r in rows:
+        print(f"{r['site']:<12} {r['mode']:<12} {r['pages']:>5} {r['cards']:>6} {r['pages_per_s']:>9} "
+              f"{r['cards_per_s']:>9} {r['extract_ms_per_page']:>9} {r['ipc_per_page']:>7} "
+              f"{r['parse_errors']:>6} {r['id_mismatches']:>7}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(rows, path=RESULTS_FILE):
+    """Append this run; print the change against the previous entry"""
+    previous = None
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        if lines:
+            previous = json.loads(lines[-1])
+    entry = {"commit": git_commit(), "at": datetime.utcnow().isoformat(), "results": rows}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+    print(f"\n💾 Saved to {path} (commit {entry['commit']})")
+
+    if previous:
+        before = {(r["site"], r["mode"]): r for r in previous["results"]}
+        print(f"Δ vs {previous['commit']}:")
+        for r in rows:
+            old = before.get((r["site"], r["mode"]))
+            if not old or not old["pages_per_s"]:
+                continue
+            change = (r["pages_per_s"] / old["pages_per_s"] - 1) * 100
+            flags = ""
+            if r["id_mismatches"] > old["id_mismatches"] or r["parse_errors"] > old["parse_errors"]:
+                flags = "  ⚠️ correctness regressed"
+            print(f"   {r['site']:<12} {r['mode']:<12} pages/s {old['pages_per_s']} → {r['pages_per_s']} "
+                  f"({change:+.1f}%){flags}")
+    return entry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark listing extraction against the fixture corpus")
+    parser.add_argument("--mode", action="append", choices=MODES, help="Mode to run (repeatable; default: all)")
+    parser.add_argument("--site", action="append", choices=list(SITES), help="Only this site (repeatable)")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus per mode")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="Corpus directory")
+    parser.add_argument("--save", action="store_true", help=f"Append results to {RESULTS_FILE}")
+    args = parser.parse_args()
+
+    rows = run_benchmark(args.mode or MODES, args.site, args.repeat, args.corpus)
+    if rows:
+        print_results(rows)
+        if args.save:
+            save_results(rows)
@@ -0,0 +1,69 @@
+"""
+Canonical product URLs
+One product page is reachable under many URLs: with or without "www.",
+tracking query strings, Myntra's trailing "/buy", Shopify collection paths
+(/collections/<c>/products/<handle> is /products/<handle>), and links that
+lost the slash after the domain ("myntra.comtshirts/..."). canonical_url()
+maps all of them to one key; ProductWriter stores it as canonicalUrl, and
+a unique index on it (built by ProductWriter, after dedupe_products.py has
+collapsed existing duplicates) keeps one document per product.
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+from pymongo.errors import OperationFailure
+
+# Hosts that already end in a top-level domain
+TLD_RE = re.compile(r"\.(?:com|in|net|org)(?::\d+)?$")
+# "www.myntra.comtshirts" -> ("www.myntra.com", "tshirts"): the path glued onto the domain
+GLUED_PATH_RE = re.compile(r"^(.*\.(?:com|in|net|org))([^.:]+)$")
+SHOPIFY_COLLECTION_RE = re.compile(r"^/collections/[^/]+/products/")
+
+URL_INDEX = "canonicalUrl_unique"
+
+
+def repair_url(url):
+    """Fix protocol-relative links and a path glued onto the domain; anything else is returned unchanged"""
+    url = (url or "").strip()
+    if url.startswith("//"):
+        url = "https:" + url
+    parts = urlsplit(url)
+    if parts.netloc and not TLD_RE.search(parts.netloc):
+        m = GLUED_PATH_RE.match(parts.netloc)
+        if m:
+            host, glued = m.groups()
+            return urlunsplit((parts.scheme, host, f"/{glued}{parts.path}", parts.query, parts.fragment))
+    return url
+
+
+def canonical_url(url):
+    """Deduplication key of a product URL ("" when there is none)"""
+    parts = urlsplit(repair_url(url))
+    if not parts.netloc:
+        return ""
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = re.sub(r"/{2,}", "/", parts.path)
+    path = SHOPIFY_COLLECTION_RE.sub("/products/", path).rstrip("/")
+    if path.endswith("/buy"):
+        path = path[: -len("/buy")]
+    # Query strings and fragments only carry tracking, variant or listing state
+    return f"https://{host}{path}"
+
+
+def ensure_url_index(collection):
+    """
+    Unique index on canonicalUrl (documents without one are not indexed)
+    False when stored duplicates prevent it: collapse them with dedupe_products.py
+    """
+    try:
+        collection.create_index([("canonicalUrl", 1)], name=URL_INDEX, unique=True,
+                                partialFilterExpression={"canonicalUrl": {"$type": "string"}})
+        return True
+    except OperationFailure as e:
+        if e.code != 11000:
+            raise
+        print(f"⚠️  {collection.name}: duplicate canonical URLs, unique index not built (run dedupe_products.py)")
+        return False
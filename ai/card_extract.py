@@ -0,0 +1,143 @@
+"""
+Listing card extraction
+Reads every product card on a listing page from a declarative card spec
+(see scrape_sites.py). The default "evaluate" mode pulls all cards' fields
+in a single page.evaluate call; "per-element" is the old path (one
+query_selector / inner_text / get_attribute round trip per field per card)
+kept for comparison. Both return the same plain records.
+"""
+
+import time
+
+# Runs in the page: card spec in, list of {field: value|null} out
+EXTRACT_JS = """
+(card) => {
+    const read = (root, spec) => {
+        const el = root.querySelector(spec.selector);
+        if (!el) return null;
+        if (spec.attr) {
+            for (const name of spec.attr) {
+                const value = el.getAttribute(name);
+                if (value) return value;
+            }
+            return "";
+        }
+        return el.innerText;
+    };
+    const records = [];
+    for (const root of document.querySelectorAll(card.container)) {
+        const rec = {};
+        for (const [field, spec] of Object.entries(card.fields)) {
+            rec[field] = read(root, spec);
+        }
+        if (card.required.every((f) => rec[f] !== null)) records.push(rec);
+    }
+    return records;
+}
+"""
+
+
+def _complete(raw, card):
+    return all(raw.get(f) is not None for f in card["required"])
+
+
+# ---------- sync ----------
+def extract_cards(page, card):
+    """All cards' fields in one IPC call"""
+    return page.evaluate(EXTRACT_JS, card)
+
+
+def read_cards(page, card):
+    """Legacy per-element path (one element lookup per field)"""
+    records = []
+    for it in page.query_selector_all(card["container"]):
+        try:
+            raw = {}
+            for field, spec in card["fields"].items():
+                el = it.query_selector(spec["selector"])
+                if el is None:
+                    raw[field] = None
+                elif "attr" in spec:
+                    raw[field] = next((v for v in (el.get_attribute(a) for a in spec["attr"]) if v), "")
+                else:
+                    raw[field] = el.inner_text()
+        except Exception as e:
+            print(f"  ⚠️ Parse error: {e}")
+            continue
+        if _complete(raw, card):
+            records.append(raw)
+    return records
+
+
+# ---------- async ----------
+async def extract_cards_async(page, card):
+    return await page.evaluate(EXTRACT_JS, card)
+
+
+async def read_cards_async(page, card):
+    records = []
+    for it in await page.query_selector_all(card["container"]):
+        try:
+            raw = {}
+            for field, spec in card["fields"].items():
+                el = await it.query_selector(spec["selector"])
+                if el is None:
+                    raw[field] = None
+                    continue
+                if "attr" in spec:
+                    value = ""
+                    for attr in spec["attr"]:
+                        value = await el.get_attribute(attr)
+                        if value:
+                            break
+                    raw[field] = value or ""
+                else:
+                    raw[field] = await el.inner_text()
+        except Exception as e:
+            print(f"  ⚠️ Parse error: {e}")
+            continue
+        if _complete(raw, card):
+            records.append(raw)
+    return records
+
+
+EXTRACTORS = {"evaluate": extract_cards, "per-element": read_cards}
+ASYNC_EXTRACTORS = {"evaluate": extract_cards_async, "per-element": read_cards_async}
+
+
+class ExtractionTimer:
+    """Per-page extraction time (page load excluded)"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.samples = []  # (seconds, cards)
+
+    def start(self):
+        return time.perf_counter()
+
+    def stop(self, started, cards):
+        self.samples.append((time.perf_counter() - started, cards))
+
+    def summary(self):
+        if not self.samples:
+            return {"mode": self.mode, "pages": 0}
+        ms = sorted(s * 1000 for s, _ in self.samples)
+        cards = sum(c for _, c in self.samples)
+        return {
+            "mode": self.mode,
+            "pages": len(ms),
+            "cards": cards,
+            "mean_ms": round(sum(ms) / len(ms), 2),
+            "p50_ms": round(ms[len(ms) // 2], 2),
+            "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 2),
+            "ms_per_card": round(sum(ms) / cards, 3) if cards else None,
+        }
+
+    def line(self):
+        s = self.summary()
+        if not s["pages"]:
+            return f"⏱️  extraction ({self.mode}): no pages"
+        return (
+            f"⏱️  extraction ({self.mode}): {s['pages']} pages, mean {s['mean_ms']} ms/page, "
+            f"p95 {s['p95_ms']} ms, {s['ms_per_card']} ms/card"
+        )
@@ -0,0 +1,394 @@
+"""Catalog health audit in two server-side aggregation passes.
+1. One $facet aggregation over a slim projection of every product (vectors are reduced
+   to their $size, never shipped): coverage per category x source, embedding state and
+   dimensions, zero/unparsed/missing prices, per-category log-price statistics, missing
+   images, and duplicate canonical URLs / image URLs (groups, extra copies, examples)
+2. A second aggregation over only the products outside the per-category price bounds
+   from pass 1 (exp(mean +- z*std) of log price) or above MAX_PRICE
+
+The report is written as JSON (--out). --fix applies the matching repairs, set-based:
+    string-prices   text prices ("Rs. 2,999") rewritten as numbers (batched bulk_write)
+    price-outliers  priceReview flag on the outliers (cleared on the rest), price kept
+    missing-images  products without a usable image deleted
+    bad-dimensions  vectors of the wrong length unset so the embedding worker redoes them
+    duplicates      canonical-URL duplicates collapsed (dedupe_products.py)
+Embeddings from another model/version need no fix: the embedding worker picks them up.
+The report describes the catalog before the fixes.
+
+    python catalog_audit.py --samples 10
+    python catalog_audit.py --fix string-prices --fix bad-dimensions
+    python catalog_audit.py --fix all --out reports/audit.json
+"""
+import argparse
+import json
+import math
+import os
+import time
+from collections import Counter
+from datetime import datetime
+
+from pymongo import MongoClient, UpdateOne
+
+from dedupe_products import dedupe
+from embeddings import MODEL_NAME, MODEL_VERSION
+from ingest import ProductWriter
+from price_history import price_value
+from scrape_sites import MAX_PRICE
+
+client = MongoClient("mongodb://127.0.0.1:27017")
+db = client["value_scout"]
+coll = db["products"]
+
+BATCH_SIZE = 1000
+DEFAULT_OUT = "catalog_audit.json"
+# Outliers lie more than Z standard deviations of log price from their category's mean
+DEFAULT_Z = 3.0
+# Categories with fewer priced products only get the MAX_PRICE check
+MIN_CATEGORY_PRICES = 30
+VECTOR_FIELDS = ("imageEmbedding", "textEmbedding", "styleEmbedding")
+FIXES = ("string-prices", "price-outliers", "missing-images", "bad-dimensions", "duplicates")
+
+MISSING_IMAGE_QUERY = {"$or": [{"imageUrl": {"$in": [None, ""]}}, {"imageUrl": {"$regex": "placeholder", "$options": "i"}}]}
+
+
+def _flag(condition):
+    return {"$cond": [condition, 1, 0]}
+
+
+def _dim(field):
+    return {"$cond": [{"$isArray": f"${field}"}, {"$size": f"${field}"}, None]}
+
+
+# Everything the facets read; a product is a few scalars by the time it reaches them
+SLIM = {"$project": {
+    "category": 1,
+    "source": 1,
+    "productName": 1,
+    "imageUrl": 1,
+    "url": {"$ifNull": ["$canonicalUrl", "$productUrl"]},
+    "listed": _flag({"$ne": [{"$ifNull": ["$delisted", False]}, True]}),
+    "price": {"$cond": [{"$isNumber": "$price"}, "$price", None]},
+    "unparsedPrice": _flag({"$and": [{"$eq": [{"$isNumber": "$price"}, False]},
+                                     {"$ne": [{"$ifNull": ["$price", None]}, None]}]}),
+    "missingImage": _flag({"$regexMatch": {"input": {"$toLower": {"$ifNull": ["$imageUrl", ""]}},
+                                           "regex": "^$|placeholder"}}),
+    "imageDim": _dim("imageEmbedding"),
+    "textDim": _dim("textEmbedding"),
+    "styleDim": _dim("styleEmbedding"),
+    "embedded": _flag({"$isArray": "$imageEmbedding"}),
+    "legacy": _flag({"$and": [{"$isArray": "$styleEmbedding"}, {"$eq": [{"$isArray": "$imageEmbedding"}, False]}]}),
+    "stale": _flag({"$and": [{"$isArray": "$imageEmbedding"},
+                             {"$or": [{"$ne": ["$embeddingModel", MODEL_NAME]},
+                                      {"$ne": ["$embeddingModelVersion", MODEL_VERSION]}]}]}),
+    "hashed": _flag({"$ifNull": ["$imageHash", False]}),
+    "enriched": _flag({"$ifNull": ["$enrichedAt", False]}),
+    "clustered": _flag({"$ifNull": ["$clusterId", False]}),
+}}
+
+COUNTERS = ("listed", "embedded", "legacy", "stale", "hashed", "enriched", "clustered", "missingImage",
+            "unparsedPrice")
+
+
+def _duplicate_facets(field, samples, exclude=None):
+    """(examples, totals) sub-pipelines for values of `field` held by more than one product"""
+    match = {field: {"$type": "string", "$ne": ""}}
+    if exclude:
+        match[exclude] = 0
+    groups = [
+        {"$match": match},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}, "ids": {"$push": "$_id"},
+                    "sources": {"$addToSet": "$source"}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    examples = groups + [
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": samples},
+        {"$project": {"count": 1, "sources": 1, "ids": {"$slice": ["$ids", 5]}}},
+    ]
+    totals = groups + [{"$group": {"_id": None, "groups": {"$sum": 1}, "extra": {"$sum": {"$subtract": ["$count", 1]}}}}]
+    return examples, totals
+
+
+def audit_pipeline(samples, max_price=MAX_PRICE):
+    """Pass 1: every statistic that needs no result of another one"""
+    url_examples, url_totals = _duplicate_facets("url", samples)
+    image_examples, image_totals = _duplicate_facets("imageUrl", samples, exclude="missingImage")
+    counters = {name: {"$sum": f"${name}"} for name in COUNTERS}
+    return [SLIM, {"$facet": {
+        "totals": [{"$group": {
+            "_id": None,
+            "products": {"$sum": 1},
+            **counters,
+            "zeroPrice": {"$sum": _flag({"$eq": ["$price", 0]})},
+            "missingPrice": {"$sum": _flag({"$and": [{"$eq": ["$price", None]}, {"$eq": ["$unparsedPrice", 0]}]})},
+            "overMaxPrice": {"$sum": _flag({"$gt": ["$price", max_price]})},
+        }}],
+        "coverage": [
+            {"$group": {"_id": {"category": "$category", "source": "$source"}, "products": {"$sum": 1},
+                        **{name: counters[name] for name in ("listed", "embedded", "stale", "missingImage")}}},
+            {"$sort": {"_id.category": 1, "_id.source": 1}},
+        ],
+        "dimensions": [
+            {"$match": {"$or": [{"imageDim": {"$ne": None}}, {"textDim": {"$ne": None}}, {"styleDim": {"$ne": None}}]}},
+            {"$group": {"_id": {"image": "$imageDim", "text": "$textDim", "style": "$styleDim"},
+                        "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+        ],
+        # Variance from sums of x and x^2 (no $stdDevPop needed)
+        "prices": [
+            {"$match": {"price": {"$gt": 0}}},
+            {"$project": {"category": 1, "price": 1, "log": {"$ln": "$price"}}},
+            {"$group": {"_id": "$category", "count": {"$sum": 1}, "min": {"$min": "$price"},
+                        "max": {"$max": "$price"}, "logSum": {"$sum": "$log"},
+                        "logSquares": {"$sum": {"$multiply": ["$log", "$log"]}}}},
+            {"$sort": {"_id": 1}},
+        ],
+        "missingImages": [
+            {"$match": {"missingImage": 1}},
+            {"$limit": samples},
+            {"$project": {"productName": 1, "source": 1, "imageUrl": 1}},
+        ],
+        "duplicateUrls": url_examples,
+        "duplicateUrlTotals": url_totals,
+        "duplicateImages": image_examples,
+        "duplicateImageTotals": image_totals,
+    }}]
+
+
+def price_bounds(groups, z=DEFAULT_Z):
+    """{category: stats with low/high bounds} from the pass-1 price groups"""
+    bounds = {}
+    for g in groups:
+        n = g["count"]
+        mean = g["logSum"] / n
+        std = math.sqrt(max(g["logSquares"] / n - mean * mean, 0.0))
+        stats = {"count": n, "min": g["min"], "max": g["max"], "geoMean": round(math.exp(mean))}
+        if n >= MIN_CATEGORY_PRICES and std > 0:
+            stats["low"] = round(math.exp(mean - z * std), 2)
+            stats["high"] = round(math.exp(mean + z * std), 2)
+        bounds[g["_id"]] = stats
+    return bounds
+
+
+def outlier_query(bounds, max_price=MAX_PRICE):
+    """Priced products above max_price or outside their category's bounds"""
+    clauses = [{"price": {"$gt": max_price}}]
+    for category, stats in bounds.items():
+        if "high" in stats:
+            clauses.append({"category": category, "$or": [{"price": {"$gt": stats["high"]}},
+                                                          {"price": {"$gt": 0, "$lt": stats["low"]}}]})
+    return {"$or": clauses}
+
+
+def outliers(query, samples):
+    """Pass 2: only the outliers are read"""
+    result = next(coll.aggregate([
+        {"$match": query},
+        {"$facet": {
+            "byCategory": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}, {"$sort": {"count": -1}}],
+            "examples": [{"$sort": {"price": -1}}, {"$limit": samples},
+                         {"$project": {"productName": 1, "category": 1, "source": 1, "price": 1}}],
+        }},
+    ], allowDiskUse=True), {"byCategory": [], "examples": []})
+    return {
+        "count": sum(g["count"] for g in result["byCategory"]),
+        "byCategory": {str(g["_id"]): g["count"] for g in result["byCategory"]},
+        "examples": result["examples"],
+    }
+
+
+def dimension_report(groups):
+    """Expected vector length (the most common imageEmbedding length) and the products that differ"""
+    image_dims = Counter()
+    for g in groups:
+        if g["_id"].get("image") is not None:
+            image_dims[g["_id"]["image"]] += g["count"]
+    expected = image_dims.most_common(1)[0][0] if image_dims else None
+    mismatched = sum(g["count"] for g in groups
+                     if expected is not None and any(d not in (None, expected) for d in g["_id"].values()))
+    return {
+        "expected": expected,
+        "mismatched": mismatched,
+        "layouts": [{**g["_id"], "count": g["count"]} for g in groups],
+    }
+
+
+def bad_dimension_query(expected):
+    return {"$expr": {"$or": [
+        {"$and": [{"$isArray": f"${f}"}, {"$ne": [_dim(f), expected]}]} for f in VECTOR_FIELDS
+    ]}}
+
+
+def _duplicates(examples, totals):
+    totals = totals[0] if totals else {}
+    return {
+        "groups": totals.get("groups", 0),
+        "extra": totals.get("extra", 0),
+        "examples": [{"key": g["_id"], "count": g["count"], "sources": sorted(map(str, g["sources"])),
+                      "ids": g["ids"]} for g in examples],
+    }
+
+
+def run_audit(samples=5, z=DEFAULT_Z, max_price=MAX_PRICE):
+    started = time.time()
+    facets = next(coll.aggregate(audit_pipeline(samples, max_price), allowDiskUse=True))
+    totals = facets["totals"][0] if facets["totals"] else {"products": 0}
+    totals.pop("_id", None)
+    bounds = price_bounds(facets["prices"], z)
+    query = outlier_query(bounds, max_price)
+    dims = dimension_report(facets["dimensions"])
+    products = totals["products"]
+
+    return {
+        "generatedAt": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "totals": totals,
+        "coverage": [{**g.pop("_id"), **g} for g in facets["coverage"]],
+        "embeddings": {
+            "model": MODEL_NAME,
+            "version": MODEL_VERSION,
+            "embedded": totals.get("embedded", 0),
+            "pending": products - totals.get("embedded", 0),
+            "legacyOnly": totals.get("legacy", 0),
+            "stale": totals.get("stale", 0),
+            "dimensions": dims,
+        },
+        "prices": {
+            "zero": totals.get("zeroPrice", 0),
+            "missing": totals.get("missingPrice", 0),
+            "unparsed": totals.get("unparsedPrice", 0),
+            "overMax": totals.get("overMaxPrice", 0),
+            "maxPrice": max_price,
+            "z": z,
+            "byCategory": {str(k): v for k, v in bounds.items()},
+            "outliers": outliers(query, samples),
+        },
+        "missingImages": {"count": totals.get("missingImage", 0), "examples": facets["missingImages"]},
+        "duplicates": {
+            "urls": _duplicates(facets["duplicateUrls"], facets["duplicateUrlTotals"]),
+            "images": _duplicates(facets["duplicateImages"], facets["duplicateImageTotals"]),
+        },
+        "seconds": round(time.time() - started, 2),
+        "_outlierQuery": query,
+    }
+
+
+# ---------- fixes ----------
+def fix_string_prices(batch_size=BATCH_SIZE):
+    ops = []
+    fixed = 0
+    for doc in coll.find({"price": {"$type": "string"}}, {"price": 1}, batch_size=batch_size):
+        value = price_value(doc["price"])
+        if value is None:
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"price": value}}))
+        if len(ops) >= batch_size:
+            fixed += coll.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        fixed += coll.bulk_write(ops, ordered=False).modified_count
+    return fixed
+
+
+def fix_price_outliers(query):
+    flagged = coll.update_many(query, {"$set": {"priceReview": True}}).modified_count
+    coll.update_many({"priceReview": True, "$nor": [query]}, {"$unset": {"priceReview": ""}})
+    return flagged
+
+
+def apply_fixes(report, fixes, batch_size=BATCH_SIZE):
+    applied = {}
+    if "string-prices" in fixes:
+        applied["string-prices"] = fix_string_prices(batch_size)
+    if "price-outliers" in fixes:
+        applied["price-outliers"] = fix_price_outliers(report["_outlierQuery"])
+    if "missing-images" in fixes:
+        applied["missing-images"] = coll.delete_many(MISSING_IMAGE_QUERY).deleted_count
+    expected = report["embeddings"]["dimensions"]["expected"]
+    if "bad-dimensions" in fixes and expected is not None:
+        applied["bad-dimensions"] = coll.update_many(
+            bad_dimension_query(expected), {"$unset": ProductWriter.INVALIDATE}).modified_count
+    if "duplicates" in fixes:
+        applied["duplicates"] = dedupe(batch_size=batch_size)["removed"]
+    return applied
+
+
+def suggested_fixes(report):
+    """Products each fix would touch (string-prices: at most)"""
+    return {
+        "string-prices": report["prices"]["unparsed"],
+        "price-outliers": report["prices"]["outliers"]["count"],
+        "missing-images": report["missingImages"]["count"],
+        "bad-dimensions": report["embeddings"]["dimensions"]["mismatched"],
+        "duplicates": report["duplicates"]["urls"]["extra"],
+    }
+
+
+def print_report(report):
+    t = report["totals"]
+    emb = report["embeddings"]
+    prices = report["prices"]
+    print(f"📦 {t['products']} products, {t.get('listed', 0)} listed "
+          f"(audited in {report['seconds']}s)")
+    print(f"🧠 Embedded {emb['embedded']}, pending {emb['pending']} ({emb['legacyOnly']} legacy styleEmbedding only), "
+          f"stale model/version {emb['stale']}")
+    if emb["dimensions"]["expected"] is not None:
+        print(f"📐 Vector length {emb['dimensions']['expected']}; {emb['dimensions']['mismatched']} products differ")
+    print(f"💰 Prices: {prices['zero']} zero, {prices['missing']} missing, {prices['unparsed']} text, "
+          f"{prices['outliers']['count']} outliers (> {prices['maxPrice']} or {prices['z']} sd off their category)")
+    for category, n in list(prices["outliers"]["byCategory"].items())[:10]:
+        print(f"   {n:>6}  {category}")
+    print(f"🖼️  {report['missingImages']['count']} products without a usable image")
+    for kind, label in (("urls", "canonical URLs"), ("images", "image URLs")):
+        d = report["duplicates"][kind]
+        print(f"🧬 {d['groups']} {label} held by several products ({d['extra']} extra copies)")
+        for g in d["examples"]:
+            print(f"    e.g. {g['count']}x {g['key']} ({', '.join(g['sources'])})")
+
+    print(f"\n{'category':<16} {'source':<20} {'products':>9} {'listed':>8} {'embedded':>9} {'no image':>9}")
+    print("-" * 76)
+    for row in report["coverage"]:
+        print(f"{str(row.get('category')):<16} {str(row.get('source')):<20} {row['products']:>9} "
+              f"{row['listed']:>8} {row['embedded']:>9} {row['missingImage']:>9}")
+
+
+def write_report(report, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    public = {k: v for k, v in report.items() if not k.startswith("_")}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(public, f, indent=2, default=str)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit catalog health in two aggregation passes")
+    parser.add_argument("--out", default=DEFAULT_OUT, help=f"JSON report path (default: {DEFAULT_OUT})")
+    parser.add_argument("--samples", type=int, default=5, help="Examples per finding (default: 5)")
+    parser.add_argument("--z", type=float, default=DEFAULT_Z,
+                        help=f"Price outlier width in log-price standard deviations (default: {DEFAULT_Z})")
+    parser.add_argument("--max-price", type=float, default=MAX_PRICE,
+                        help=f"Any price above this is an outlier (default: {MAX_PRICE})")
+    parser.add_argument("--fix", action="append", choices=FIXES + ("all",),
+                        help="Apply a repair (repeatable; 'all' for every one)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    report = run_audit(args.samples, args.z, args.max_price)
+    fixes = set(FIXES) if "all" in (args.fix or []) else set(args.fix or [])
+    report["fixes"] = {"suggested": suggested_fixes(report)}
+    if fixes:
+        report["fixes"]["applied"] = apply_fixes(report, fixes, args.batch_size)
+    print_report(report)
+    if fixes:
+        print("\n🔧 " + ", ".join(f"{name}: {n}" for name, n in report["fixes"]["applied"].items()))
+    else:
+        todo = {name: n for name, n in report["fixes"]["suggested"].items() if n}
+        if todo:
+            print("\n💡 --fix would touch " + ", ".join(f"{name}: {n}" for name, n in todo.items()))
+    write_report(report, args.out)
+    print(f"📝 Report written to {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
+    print("Audit complete.")
@@ -0,0 +1,94 @@
+"""
+Product category classifier
+One rule table drives both ingest (scrape_sites.py, scraper_v2.py) and bulk
+reclassification (reclassify_categories.py). Every keyword is matched as a
+whole word by a single precompiled regex, so "short" never matches "shirt"
+and "shirt" never matches "sweatshirt".
+
+When a product name has garment words of several rows, the head noun wins:
+the last garment word ("Denim Jacket" -> jacket, "Sweatshirt Dress" ->
+dress, "Formal Dress Shirt" -> shirt). Garment words in the name are checked
+first, then in the product URL path. Only then WEAK words: fabrics and fits
+("jersey", "denim", "boot-cut") that name a garment on their own ("Football
+Jersey") but only describe one elsewhere ("Jersey Shorts"). HINTS come last:
+activity or product-line words ("running", "court", "jordan") that suggest
+footwear but also appear on clothing.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+DEFAULT_CATEGORY = "clothing"
+
+# (category, keyword patterns); the last match in a name decides
+RULES = [
+    ("shoes", [r"shoes?", r"sneakers?", r"boots?(?![- ]?cut)", r"trainers?", r"sandals?", r"slides?",
+               r"flip[- ]?flops?", r"loafers?", r"clogs?", r"mules?", r"slip[- ]?ons?", r"footwear"]),
+    ("tshirt", [r"t[- ]?shirts?", r"tees?", r"polos?"]),
+    ("hoodie", [r"hoodies?", r"sweatshirts?", r"sweaters?", r"pullovers?", r"cardigans?"]),
+    ("jacket", [r"jackets?", r"coats?", r"blazers?", r"gilets?", r"windbreakers?", r"parkas?", r"shackets?"]),
+    ("dress", [r"dress(?:es)?", r"skirts?", r"jumpsuits?", r"playsuits?"]),
+    ("shirt", [r"shirts?", r"overshirts?", r"blouses?", r"tops?", r"tunics?"]),
+    ("shorts", [r"(?:sweat ?)?shorts", r"bermudas?"]),
+    ("jeans", [r"jeans"]),
+    ("pants", [r"pants?", r"trousers?", r"joggers?", r"(?:track|sweat) ?pants?", r"chinos?", r"cargos?",
+               r"leggings?"]),
+]
+
+# Fabrics and fits: a garment only when no garment word matched
+WEAK = [
+    ("tshirt", [r"jerseys?"]),
+    ("jeans", [r"denims?", r"boot[- ]?cut"]),
+]
+
+# Weaker still: only used when neither a garment nor a WEAK word matched
+HINTS = [
+    ("shoes", [r"running", r"basketball", r"football", r"golf", r"court", r"jordan", r"air max",
+               r"air force", r"dunk", r"yeezy"]),
+]
+
+
+class CategoryClassifier:
+    def __init__(self, rules=RULES, weak=WEAK, hints=HINTS, default=DEFAULT_CATEGORY):
+        self.default = default
+        self.rules = self._compile(rules)
+        self.weak = self._compile(weak)
+        self.hints = self._compile(hints)
+
+    @staticmethod
+    def _compile(rows):
+        """One alternation with a named group per row: (?P<r0>...)|(?P<r1>...)"""
+        categories = [category for category, _ in rows]
+        groups = "|".join(f"(?P<r{i}>{'|'.join(patterns)})" for i, (_, patterns) in enumerate(rows))
+        return categories, re.compile(rf"\b(?:{groups})\b", re.IGNORECASE)
+
+    @staticmethod
+    def _head(compiled, text):
+        """(category, keyword) of the last keyword in text: the head noun of "Jersey Shorts" is shorts"""
+        categories, regex = compiled
+        last = None
+        for last in regex.finditer(text or ""):
+            pass
+        return (categories[int(last.lastgroup[1:])], last.group(0).lower()) if last else None
+
+    def explain(self, name, url=""):
+        """(category, matched keyword, "name" / "url" / "weak" / "hint" / None)"""
+        path = urlsplit(url or "").path.replace("/", " ")
+        for compiled, text, where in ((self.rules, name, "name"), (self.rules, path, "url"),
+                                      (self.weak, f"{name} {path}", "weak"),
+                                      (self.hints, f"{name} {path}", "hint")):
+            found = self._head(compiled, text)
+            if found:
+                return found[0], found[1], where
+        return self.default, None, None
+
+    def classify(self, name, url=""):
+        return self.explain(name, url)[0]
+
+
+CLASSIFIER = CategoryClassifier()
+
+
+def classify(name, url=""):
+    """Category of a product from its name and (optionally) its product URL"""
+    return CLASSIFIER.classify(name, url)
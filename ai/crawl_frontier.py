@@ -0,0 +1,395 @@
+"""
+Distributed crawl frontier (MongoDB)
+Listing pages of a crawl live in a shared collection, so scraper workers on
+several machines split the Myntra brand queries and store paginations
+without overlapping:
+
+  crawl_runs      one document per run: sites, stand-in base_url, per-site
+                  totals, status
+  crawl_frontier  one document per (run, site, query, page), claimed through
+                  the LeaseQueue in leases.py (crawlJob: owner, lease expiry,
+                  attempts, retry backoff, poisoning)
+  crawl_slots     domain_limit lease slots per domain; a worker holds one while
+                  it loads a page, which caps concurrent pages per domain across
+                  every worker
+
+Pagination is discovered as the crawl goes: `seed` queues the first lookahead
+pages of every listing, and a page with new products queues the pages after it.
+The usual stop rules hold across workers: MAX_EMPTY_PAGES consecutive pages
+without new products end a listing, a site target ends the site (pending pages
+are marked skipped). "New" means not yet written by any worker in this run
+(lastSeenRun), so a repeated page counts as empty whichever worker loads it.
+
+    python crawl_frontier.py seed --site Nike --site SuperKicks
+    python crawl_frontier.py work                     # on every scraper machine
+    python crawl_frontier.py local --workers 3 --base-url http://127.0.0.1:8765
+    python crawl_frontier.py status
+"""
+
+import argparse
+import multiprocessing as mp
+import random
+import time
+import uuid
+from datetime import datetime
+
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+
+from leases import LeaseQueue, make_worker_id
+from scrape_sites import MAX_EMPTY_PAGES, SITES, build_docs, domain_of, fetch_base, listing_url
+
+MONGO_URI = "mongodb://127.0.0.1:27017"
+JOB_FIELD = "crawlJob"
+SLOT_FIELD = "slotLease"
+
+
+def page_id(run_id, label, query, page):
+    return f"{run_id}:{label}:{query}:{page}"
+
+
+class FrontierState:
+    """CrawlState stand-in for ProductWriter: the shared run id, plus ids this worker wrote"""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.seen = set()
+
+    def is_seen(self, pid):
+        return pid in self.seen
+
+    def commit(self, ids, cursors):
+        self.seen.update(ids)
+
+
+class Frontier:
+    def __init__(self, uri=MONGO_URI, lease_seconds=300, max_attempts=3, owner=None):
+        db = MongoClient(uri)["value_scout"]
+        self.products = db["products"]
+        self.runs = db["crawl_runs"]
+        self.pages = db["crawl_frontier"]
+        self.slots = db["crawl_slots"]
+        self.reports = db["crawl_reports"]
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.owner = owner or make_worker_id()
+
+    def ensure_indexes(self):
+        self.pages.create_index([("run", 1), ("domain", 1), ("state", 1), ("page", 1)])
+        self.pages.create_index([("run", 1), ("site", 1), ("query", 1), ("page", 1)])
+        self.slots.create_index([("run", 1), ("domain", 1)])
+
+    # ---------- queues ----------
+    def page_queue(self, run_id, domain):
+        return LeaseQueue(
+            self.pages, {"run": run_id, "domain": domain, "state": "pending"}, JOB_FIELD,
+            lease_seconds=self.lease_seconds, max_attempts=self.max_attempts,
+            sort=[("page", 1), ("_id", 1)], owner=self.owner,
+            retry_base_seconds=60, retry_max_seconds=900,
+        )
+
+    def slot_queue(self, run_id, domain):
+        # Slots are completed after every page, which resets their attempt count
+        return LeaseQueue(self.slots, {"run": run_id, "domain": domain}, SLOT_FIELD,
+                          lease_seconds=self.lease_seconds, max_attempts=10 ** 6, owner=self.owner)
+
+    # ---------- runs ----------
+    def seed(self, sites, domain_limit=2, lookahead=2, base_url=None):
+        """Start a run: slots per domain and the first pages of every listing"""
+        self.ensure_indexes()
+        run_id = uuid.uuid4().hex
+        self.runs.insert_one({
+            "_id": run_id,
+            "status": "running",
+            "sites": [site["label"] for site in sites],
+            "base_url": base_url,
+            "domain_limit": domain_limit,
+            "lookahead": lookahead,
+            "totals": {site["label"]: 0 for site in sites},
+            "startedAt": datetime.utcnow(),
+        })
+        domains = sorted({domain_of(site["base_url"]) for site in sites})
+        self.slots.insert_many([
+            {"_id": f"{run_id}:{domain}:{i}", "run": run_id, "domain": domain}
+            for domain in domains for i in range(domain_limit)
+        ])
+        for site in sites:
+            for query in site["queries"]:
+                self.enqueue(run_id, site, query, range(1, lookahead + 1))
+        print(f"🌱 Seeded crawl run {run_id}: {len(sites)} sites, {len(domains)} domains "
+              f"x {domain_limit} slots")
+        return run_id
+
+    def writer(self, run_id):
+        """ProductWriter on this frontier's database, so every worker writes (and dedupes against) one catalog"""
+        from ingest import ProductWriter
+
+        return ProductWriter(collection=self.products, state=FrontierState(run_id))
+
+    def latest_run(self):
+        run = self.runs.find_one({"status": "running"}, sort=[("startedAt", -1)])
+        return run["_id"] if run else None
+
+    def enqueue(self, run_id, site, query, pages):
+        """Idempotent: a page already queued (by any worker) is left alone"""
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne(
+                {"_id": page_id(run_id, site["label"], query, n)},
+                {"$setOnInsert": {
+                    "run": run_id, "site": site["label"], "query": query, "page": n,
+                    "domain": domain_of(site["base_url"]), "state": "pending", "createdAt": now,
+                }},
+                upsert=True,
+            )
+            for n in pages if n <= site["max_pages"]
+        ]
+        if ops:
+            self.pages.bulk_write(ops, ordered=False)
+
+    def skip(self, run_id, scope, reason):
+        """Drop pending, unleased pages of a listing/site that has been stopped"""
+        res = self.pages.update_many(
+            {"run": run_id, "state": "pending", f"{JOB_FIELD}.owner": {"$exists": False}, **scope},
+            {"$set": {"state": "skipped", "skipReason": reason}},
+        )
+        return res.modified_count
+
+    def drained(self, run_id):
+        """True (and the run marked completed) once no page is pending or leased"""
+        # Leases that expired on their final attempt (crashed worker) count as failed
+        self.page_queue(run_id, None).poison_exhausted({"run": run_id})
+        if self.pages.count_documents(
+            {"run": run_id, "state": "pending", f"{JOB_FIELD}.status": {"$ne": "poisoned"}}, limit=1
+        ):
+            return False
+        self.runs.update_one({"_id": run_id, "status": "running"},
+                             {"$set": {"status": "completed", "finishedAt": datetime.utcnow()}})
+        return True
+
+    # ---------- claiming ----------
+    def claim(self, run_id):
+        """A (slot, page) pair from a domain with spare capacity, or None if nothing is claimable now"""
+        domains = self.pages.distinct("domain", {"run": run_id, "state": "pending"})
+        random.shuffle(domains)
+        for domain in domains:
+            slots = self.slot_queue(run_id, domain)
+            held = slots.claim(1)
+            if not held:
+                continue
+            pages = self.page_queue(run_id, domain)
+            claimed = pages.claim(1)
+            if claimed:
+                return slots, held[0], pages, claimed[0]
+            slots.release([held[0]["_id"]])
+        return None
+
+    # ---------- page results ----------
+    def empty_streak(self, run_id, label, query, page):
+        done = {
+            d["page"]: d.get("added", 0)
+            for d in self.pages.find(
+                {"run": run_id, "site": label, "query": query, "state": "done",
+                 "page": {"$gt": page - MAX_EMPTY_PAGES, "$lte": page}},
+                {"page": 1, "added": 1},
+            )
+        }
+        streak = 0
+        while done.get(page - streak) == 0:
+            streak += 1
+        return streak
+
+    def advance(self, run, site, job, added):
+        """Queue what comes after a finished page (added=None: the page failed for good)"""
+        run_id, label, query, page = run["_id"], site["label"], job["query"], job["page"]
+        target = site["target"]
+        if target and run["totals"].get(label, 0) >= target:
+            skipped = self.skip(run_id, {"site": label}, f"target {target} reached")
+            print(f"  🎯 [{label}] target {target} reached ({skipped} pending pages skipped)")
+            return
+        if added is None or added:
+            # Failed pages don't count as empty (see politeness.py)
+            self.enqueue(run_id, site, query, range(page + 1, page + 1 + run["lookahead"]))
+            return
+        if self.empty_streak(run_id, label, query, page) >= MAX_EMPTY_PAGES:
+            self.skip(run_id, {"site": label, "query": query, "page": {"$gt": page}},
+                      f"{MAX_EMPTY_PAGES} pages without new products")
+            print(f"  🛑 [{label}] {query}: no new products in {MAX_EMPTY_PAGES} consecutive pages")
+        else:
+            self.enqueue(run_id, site, query, [page + 1])
+
+    def finish_page(self, run_id, site, job, records, writer, pages, errors=None):
+        """
+        Write the page's products, then mark it done and queue its successors
+        Returns (products new to this run, products on the page)
+        """
+        docs = build_docs(site, records, set() if site["dedupe_urls"] else None, errors)
+        ids = [d["_id"] for d in docs]
+        fresh = len(set(ids) - writer.known(ids, this_run=True))
+        for doc in docs:
+            writer.add(doc)
+        # Products are durable before the page counts as done
+        writer.flush()
+        pages.complete(job["_id"], {"state": "done", "cards": len(records), "added": fresh,
+                                    "doneAt": datetime.utcnow(), "worker": self.owner})
+        run = self.runs.find_one_and_update(
+            {"_id": run_id}, {"$inc": {f"totals.{site['label']}": fresh}},
+            return_document=ReturnDocument.AFTER,
+        )
+        self.advance(run, site, job, fresh)
+        return fresh, len(docs)
+
+    def fail_page(self, run_id, site, job, error, pages):
+        if pages.fail(job, error):
+            self.pages.update_one({"_id": job["_id"]}, {"$set": {"state": "failed"}})
+            print(f"  ☠️ [{site['label']}] {job['query']} p{job['page']} failed {self.max_attempts} times - skipped")
+            self.advance(self.runs.find_one({"_id": run_id}), site, job, None)
+
+    # ---------- reporting ----------
+    def status(self, run_id):
+        run = self.runs.find_one({"_id": run_id}) or {}
+        states = {d["_id"]: d["n"] for d in self.pages.aggregate([
+            {"$match": {"run": run_id}},
+            {"$group": {"_id": "$state", "n": {"$sum": 1}}},
+        ])}
+        leased = {d["_id"]: d["n"] for d in self.pages.aggregate([
+            {"$match": {"run": run_id, "state": "pending", f"{JOB_FIELD}.expiresAt": {"$gt": datetime.utcnow()}}},
+            {"$group": {"_id": "$domain", "n": {"$sum": 1}}},
+        ])}
+        workers = self.pages.distinct("worker", {"run": run_id, "state": "done"})
+        return {"run": run_id, "status": run.get("status"), "pages": states,
+                "leased_by_domain": leased, "totals": run.get("totals", {}), "workers": len(workers)}
+
+
+def work(run_id=None, uri=MONGO_URI, profile="light", extraction="evaluate", idle_seconds=5, verbosity=0):
+    """Worker loop: claim a page, load it, write it, queue successors; exits when the run is drained"""
+    from playwright.sync_api import sync_playwright
+
+    from card_extract import EXTRACTORS, ExtractionTimer
+    from page_profile import PROFILES, LoadStats, attach
+    from crawl_telemetry import PAGES, Attempts, CrawlTelemetry
+    from politeness import PolitenessScheduler
+    from scraper import get_browser, get_context, load_listing
+
+    frontier = Frontier(uri)
+    run_id = run_id or frontier.latest_run()
+    if not run_id:
+        print("No running crawl - seed one first")
+        return 0
+    run = frontier.runs.find_one({"_id": run_id})
+    writer = frontier.writer(run_id)
+    scheduler = PolitenessScheduler()
+    extract = EXTRACTORS[extraction]
+    timer = ExtractionTimer(extraction)
+    load_stats = LoadStats(frontier.owner, profile)
+    telemetry = CrawlTelemetry(run_id, "frontier", verbosity, worker=frontier.owner)
+    pages_done = 0
+    print(f"👷 Worker {frontier.owner} on run {run_id}")
+
+    with sync_playwright() as p:
+        browser = get_browser(p, headless=PROFILES[profile]["headless"])
+        ctx = get_context(browser)
+        page = ctx.new_page()
+        meter = attach(page, profile)
+
+        while True:
+            claim = frontier.claim(run_id)
+            if claim is None:
+                if frontier.drained(run_id):
+                    break
+                # Everything left is leased by other workers or backing off
+                time.sleep(idle_seconds)
+                continue
+            slots, slot, pages, job = claim
+            site = SITES[job["site"]]
+            domain = domain_of(site["base_url"])
+            url = listing_url(site, job["query"], job["page"], fetch_base(site, run.get("base_url")))
+            metrics = telemetry.site(site["label"])
+            fetch = Attempts(lambda: load_listing(page, meter, site, url, extract, timer, load_stats, metrics))
+            with pages.heartbeat(), slots.heartbeat():
+                try:
+                    records = scheduler.call(domain, fetch)
+                except Exception as e:
+                    slots.complete(slot["_id"], {"lastUsedAt": datetime.utcnow()})
+                    telemetry.page_failed(site["label"], job["query"], job["page"], e, fetch.retries)
+                    frontier.fail_page(run_id, site, job, e, pages)
+                    continue
+                # Free the domain slot before the Mongo bookkeeping
+                slots.complete(slot["_id"], {"lastUsedAt": datetime.utcnow()})
+                errors = []
+                fresh, docs = frontier.finish_page(run_id, site, job, records, writer, pages, errors)
+            pages_done += 1
+            telemetry.page(site["label"], job["query"], job["page"], len(records), fresh, docs - fresh,
+                           len(errors), fetch.retries)
+            telemetry.say(PAGES, f"➡ [{site['label']}] {job['query']} | page {job['page']}: "
+                                 f"{len(records)} cards, +{fresh}")
+
+        ctx.close()
+        browser.close()
+
+    writer.flush()
+    print(f"✅ Worker {frontier.owner}: {pages_done} pages")
+    writer.summary()
+    print(timer.line())
+    scheduler.print_summary()
+    telemetry.save_report(frontier.reports, writer=writer, scheduler=scheduler)
+    return pages_done
+
+
+def _work_process(args):
+    return work(*args)
+
+
+def run_local(run_id, workers=3, uri=MONGO_URI, profile="light", extraction="evaluate", verbosity=0):
+    """Several worker processes on this machine against one mongod (testing / a single big box)"""
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers) as pool:
+        done = pool.map(_work_process, [(run_id, uri, profile, extraction, 5, verbosity)] * workers)
+    print(f"🏁 {sum(done)} pages over {workers} workers: {done}")
+    return done
+
+
+def print_status(frontier, run_id):
+    s = frontier.status(run_id)
+    print(f"📋 Run {s['run']} ({s['status']}) - {s['workers']} workers")
+    print("   pages: " + ", ".join(f"{k} {v}" for k, v in sorted(s["pages"].items())))
+    if s["leased_by_domain"]:
+        print("   leased: " + ", ".join(f"{k} {v}" for k, v in sorted(s["leased_by_domain"].items())))
+    for label, total in s["totals"].items():
+        print(f"   {label}: {total}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared crawl frontier for several scraper workers")
+    parser.add_argument("command", choices=["seed", "work", "local", "status"])
+    parser.add_argument("--site", action="append", choices=list(SITES),
+                        help="seed/local: only this site (repeatable; default: all)")
+    parser.add_argument("--run", help="Run id (default: latest running run)")
+    parser.add_argument("--domain-limit", type=int, default=2,
+                        help="seed/local: pages loading at once per domain, across all workers (default: 2)")
+    parser.add_argument("--lookahead", type=int, default=2,
+                        help="seed/local: pages queued ahead per listing (default: 2)")
+    parser.add_argument("--base-url", help="seed/local: stand-in server root (sites served under /<site>)")
+    parser.add_argument("--workers", type=int, default=3, help="local: worker processes (default: 3)")
+    parser.add_argument("--profile", choices=["light", "full"], default="light")
+    parser.add_argument("--extraction", choices=["evaluate", "per-element"], default="evaluate")
+    parser.add_argument("--mongo", default=MONGO_URI, help=f"MongoDB URI (default: {MONGO_URI})")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="work/local: a line per page (default: periodic summaries)")
+    args = parser.parse_args()
+
+    frontier = Frontier(args.mongo)
+    sites = [SITES[label] for label in (args.site or SITES)]
+    if args.command == "seed":
+        frontier.seed(sites, args.domain_limit, args.lookahead, args.base_url)
+    elif args.command == "work":
+        work(args.run, args.mongo, args.profile, args.extraction, verbosity=args.verbose)
+    elif args.command == "local":
+        run_id = args.run or frontier.seed(sites, args.domain_limit, args.lookahead, args.base_url)
+        run_local(run_id, args.workers, args.mongo, args.profile, args.extraction, args.verbose)
+        print_status(frontier, run_id)
+    else:
+        run_id = args.run or frontier.latest_run() or (frontier.runs.find_one(sort=[("startedAt", -1)]) or {}).get("_id")
+        if run_id:
+            print_status(frontier, run_id)
+        else:
+            print("No crawl runs yet")
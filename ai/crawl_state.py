@@ -0,0 +1,177 @@
+"""
+Crawl state store (SQLite)
+Replaces scraper_checkpoint.json. Per crawl run it keeps:
+  - seen product ids (dedupe across sites/queries; O(1) in-memory set,
+    appended to SQLite in the same transaction as the Mongo batch they belong to)
+  - a cursor per (site, query): last finished page, empty-page streak,
+    products added and whether the listing is done
+  - run metadata: engine, scope (which sites/mode), status, start/finish
+    time, final counts
+
+Writes are small incremental transactions in WAL mode, so a crash loses at
+most the batch in flight. A run that never finished is resumed by the next
+crawl of the same engine and scope: seen ids are reloaded and every listing
+continues after its cursor. Seen ids and cursors of old runs are pruned when
+a run finishes.
+"""
+
+import json
+import sqlite3
+import uuid
+from datetime import datetime
+
+STATE_FILE = "scraper_state.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    engine      TEXT,
+    scope       TEXT,
+    status      TEXT NOT NULL,
+    started_at  TEXT NOT NULL,
+    finished_at TEXT,
+    stats       TEXT
+);
+CREATE TABLE IF NOT EXISTS seen (
+    run_id TEXT NOT NULL,
+    id     TEXT NOT NULL,
+    PRIMARY KEY (run_id, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cursors (
+    run_id      TEXT NOT NULL,
+    site        TEXT NOT NULL,
+    query       TEXT NOT NULL,
+    page        INTEGER NOT NULL,
+    empty_pages INTEGER NOT NULL,
+    added       INTEGER NOT NULL,
+    done        INTEGER NOT NULL,
+    updated_at  TEXT NOT NULL,
+    PRIMARY KEY (run_id, site, query)
+) WITHOUT ROWID;
+"""
+
+NEW_CURSOR = {"page": 0, "empty_pages": 0, "added": 0, "done": False}
+
+
+def run_scope(labels, incremental=False):
+    """Scope of a run over these sites, e.g. "Nike,SuperKicks full" """
+    return f"{','.join(sorted(labels))} {'incremental' if incremental else 'full'}"
+
+
+class CrawlState:
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        # State files written before runs had a scope
+        if "scope" not in {r[1] for r in self.db.execute("PRAGMA table_info(runs)")}:
+            self.db.execute("ALTER TABLE runs ADD COLUMN scope TEXT")
+        self.run_id = None
+        self.seen = set()
+        # True when start_run picked up an unfinished run (its earlier progress is not all in memory)
+        self.resumed = False
+
+    # ---------- runs ----------
+    def start_run(self, engine, resume=True, scope="all"):
+        """
+        Resume the latest unfinished run of this engine and scope (crash recovery) or start a new one
+        scope names what the run crawls (e.g. a site label), so a one-site run never picks up
+        (and completes) an unfinished run of the whole pipeline or of another crawler
+        """
+        row = None
+        if resume:
+            row = self.db.execute(
+                "SELECT run_id FROM runs WHERE status = 'running' AND engine = ? AND scope = ? "
+                "ORDER BY started_at DESC LIMIT 1", (engine, scope),
+            ).fetchone()
+        self.resumed = bool(row)
+        if row:
+            self.run_id = row[0]
+            self.seen = {r[0] for r in self.db.execute("SELECT id FROM seen WHERE run_id = ?", (self.run_id,))}
+            print(f"↩️  Resuming crawl run {self.run_id} ({len(self.seen)} products already saved)")
+        else:
+            with self.db:
+                # A fresh run supersedes what was left unfinished in the same scope
+                self.db.execute(
+                    "UPDATE runs SET status = 'abandoned' WHERE status = 'running' AND engine = ? AND scope = ?",
+                    (engine, scope),
+                )
+                self.run_id = uuid.uuid4().hex
+                self.db.execute(
+                    "INSERT INTO runs (run_id, engine, scope, status, started_at) VALUES (?, ?, ?, 'running', ?)",
+                    (self.run_id, engine, scope, datetime.utcnow().isoformat()),
+                )
+            self.seen = set()
+        return self.run_id
+
+    def finish_run(self, status="completed", stats=None, keep_runs=5):
+        with self.db:
+            self.db.execute(
+                "UPDATE runs SET status = ?, finished_at = ?, stats = ? WHERE run_id = ?",
+                (status, datetime.utcnow().isoformat(), json.dumps(stats or {}), self.run_id),
+            )
+        self.prune(keep_runs)
+
+    def runs(self, limit=10):
+        rows = self.db.execute(
+            "SELECT run_id, engine, scope, status, started_at, finished_at, stats FROM runs "
+            "ORDER BY started_at DESC LIMIT ?", (limit,),
+        )
+        return [
+            {"run_id": r[0], "engine": r[1], "scope": r[2], "status": r[3], "started_at": r[4],
+             "finished_at": r[5], "stats": json.loads(r[6]) if r[6] else None}
+            for r in rows
+        ]
+
+    # ---------- seen ids / cursors ----------
+    def is_seen(self, pid):
+        return pid in self.seen
+
+    def cursor(self, site, query):
+        row = self.db.execute(
+            "SELECT page, empty_pages, added, done FROM cursors WHERE run_id = ? AND site = ? AND query = ?",
+            (self.run_id, site, query),
+        ).fetchone()
+        if not row:
+            return dict(NEW_CURSOR)
+        return {"page": row[0], "empty_pages": row[1], "added": row[2], "done": bool(row[3])}
+
+    def site_total(self, site):
+        row = self.db.execute(
+            "SELECT COALESCE(SUM(added), 0) FROM cursors WHERE run_id = ? AND site = ?",
+            (self.run_id, site),
+        ).fetchone()
+        return row[0]
+
+    def commit(self, ids, cursors):
+        """
+        Record a written batch: product ids plus the listing cursors it completes
+        (one transaction, so cursors never get ahead of the products they cover)
+        """
+        now = datetime.utcnow().isoformat()
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO seen (run_id, id) VALUES (?, ?)",
+                ((self.run_id, pid) for pid in ids),
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO cursors (run_id, site, query, page, empty_pages, added, done, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((self.run_id, site, query, c["page"], c["empty_pages"], c["added"], int(c["done"]), now)
+                 for (site, query), c in cursors.items()),
+            )
+        self.seen.update(ids)
+
+    def prune(self, keep_runs=5):
+        """Drop seen ids / cursors of all but the latest runs; unfinished runs stay resumable"""
+        keep = [r["run_id"] for r in self.runs(keep_runs)]
+        keep += [r[0] for r in self.db.execute("SELECT run_id FROM runs WHERE status = 'running'")]
+        marks = ",".join("?" * len(keep)) or "''"
+        with self.db:
+            self.db.execute(f"DELETE FROM seen WHERE run_id NOT IN ({marks})", keep)
+            self.db.execute(f"DELETE FROM cursors WHERE run_id NOT IN ({marks})", keep)
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,296 @@
+"""
+Crawl telemetry
+Counters and histograms per site for every crawler (scraper.py,
+scrape_engine.py, http_ingest.py, crawl_frontier.py, scraper_v2.py) instead
+of one print per page or product:
+
+  - counters: pages, empty and failed pages, cards, products added, skipped
+    (already written in this run) and errored (parse errors), retries
+  - histograms: page load and card extraction time in ms (fixed buckets)
+
+Every page is one JSON line in the run's crawl log (crawl_logs/<run>.jsonl,
+only the newest JSON_LOG_KEEP logs are kept), a summary line is printed
+every `summary_every` seconds, and the run report (per-site counters and
+histograms, writer counts, politeness scheduler state) is saved to the
+crawl_reports collection, which also closes the log.
+
+The old human-readable lines are verbosity levels: 0 summaries only,
+1 one line per page (-v), 2 one line per product (-vv).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# One JSON-lines log per run (a resumed run appends to its log); older logs beyond the newest few are deleted
+JSON_LOG_DIR = "crawl_logs"
+JSON_LOG_KEEP = 20
+
+QUIET, PAGES, ITEMS = 0, 1, 2
+
+# Histogram bucket upper bounds in ms; the last bucket is everything above
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+COUNTERS = ("pages", "empty_pages", "failed_pages", "cards", "added", "skipped", "errored", "retries")
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        i = 0
+        while i < len(self.bounds) and ms > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, capped at the largest value seen"""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.bounds[i], round(self.max, 1)) if i < len(self.bounds) else round(self.max, 1)
+        return round(self.max, 1)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 1) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max, 1),
+            "buckets": [[le, n] for le, n in zip(list(self.bounds) + [None], self.counts) if n],
+        }
+
+
+class SiteMetrics:
+    def __init__(self, label):
+        self.label = label
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.load = Histogram()
+        self.extract = Histogram()
+
+    def observe_load(self, seconds):
+        self.load.observe(seconds * 1000)
+
+    def observe_extract(self, seconds):
+        self.extract.observe(seconds * 1000)
+
+    def summary(self):
+        return {**self.counts, "load": self.load.summary(), "extract": self.extract.summary()}
+
+
+class Attempts:
+    """Wraps a fetch passed to scheduler.call / call_async and counts how often it ran"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.count = 0
+
+    def __call__(self):
+        self.count += 1
+        return self.fn()
+
+    @property
+    def retries(self):
+        return max(self.count - 1, 0)
+
+
+class CrawlTelemetry:
+    def __init__(self, run_id=None, engine="sync", verbosity=QUIET, json_log=JSON_LOG_DIR, summary_every=30.0,
+                 worker=None):
+        """json_log: directory of the per-run logs, "-" for stdout, None for no log"""
+        self.run_id = run_id or uuid.uuid4().hex
+        self.engine = engine
+        # Frontier workers share a run; each saves its own report
+        self.worker = worker
+        self.verbosity = verbosity
+        self.summary_every = summary_every
+        self.sites = {}
+        self.started_at = datetime.utcnow()
+        self._started = time.monotonic()
+        self._last_summary = self._started
+        self._lock = threading.Lock()
+        self.json_log = json_log
+        # Opened on the first event, so a module-level telemetry leaves no file behind until it is used
+        self._log = sys.stdout if json_log == "-" else None
+
+    def site(self, label):
+        with self._lock:
+            if label not in self.sites:
+                self.sites[label] = SiteMetrics(label)
+            return self.sites[label]
+
+    # ---------- output ----------
+    def say(self, level, message):
+        """Human-readable line, printed only at this verbosity or above"""
+        if self.verbosity >= level:
+            print(message)
+
+    def log_path(self):
+        if not self.json_log or self.json_log == "-":
+            return None
+        name = f"{self.run_id}-{self.worker}" if self.worker else self.run_id
+        return os.path.join(self.json_log, f"{name}.jsonl")
+
+    def _open_log(self):
+        os.makedirs(self.json_log, exist_ok=True)
+        path = self.log_path()
+        logs = sorted(
+            (os.path.join(self.json_log, f) for f in os.listdir(self.json_log) if f.endswith(".jsonl")),
+            key=os.path.getmtime, reverse=True,
+        )
+        for old in [p for p in logs if p != path][JSON_LOG_KEEP - 1:]:
+            os.remove(old)
+        return open(path, "a", encoding="utf-8")
+
+    def event(self, name, **fields):
+        if not self.json_log:
+            return
+        record = {"ts": datetime.utcnow().isoformat(), "run": self.run_id, "event": name}
+        if self.worker:
+            record["worker"] = self.worker
+        line = json.dumps({**record, **fields}, default=str)
+        with self._lock:
+            if self._log is None:
+                self._log = self._open_log()
+            self._log.write(line + "\n")
+            self._log.flush()
+
+    # ---------- recording ----------
+    def page(self, label, query, page_num, cards, added, skipped=0, errored=0, retries=0):
+        """One listing/feed page read and written"""
+        m = self.site(label)
+        with self._lock:
+            c = m.counts
+            c["pages"] += 1
+            c["empty_pages"] += 0 if added else 1
+            c["cards"] += cards
+            c["added"] += added
+            c["skipped"] += skipped
+            c["errored"] += errored
+            c["retries"] += retries
+        self.event("page", site=label, query=query, page=page_num, cards=cards, added=added,
+                   skipped=skipped, errored=errored, retries=retries)
+        self.maybe_summary()
+
+    def page_failed(self, label, query, page_num, error, retries=0):
+        """A page that still failed after the scheduler's retries"""
+        m = self.site(label)
+        with self._lock:
+            m.counts["failed_pages"] += 1
+            m.counts["retries"] += retries
+        self.event("page_failed", site=label, query=query, page=page_num, retries=retries,
+                   error=f"{error.__class__.__name__}: {error}")
+        print(f"  ❌ [{label}] {query} p{page_num} failed after {retries} retries: {error}")
+        self.maybe_summary()
+
+    # ---------- summaries ----------
+    def totals(self):
+        counts = dict.fromkeys(COUNTERS, 0)
+        load, extract = Histogram(), Histogram()
+        with self._lock:
+            for m in self.sites.values():
+                for k, v in m.counts.items():
+                    counts[k] += v
+                load.merge(m.load)
+                extract.merge(m.extract)
+        return counts, load, extract
+
+    def summary_line(self):
+        c, load, extract = self.totals()
+        elapsed = time.monotonic() - self._started
+        rate = c["pages"] / elapsed * 60 if elapsed else 0.0
+        return (
+            f"📈 [{elapsed / 60:.1f} min] {c['pages']} pages ({rate:.1f}/min), {c['failed_pages']} failed, "
+            f"{c['retries']} retries | +{c['added']} added, {c['skipped']} skipped, {c['errored']} errors "
+            f"| load p50 {load.quantile(0.5)} ms p95 {load.quantile(0.95)} ms "
+            f"| extract p50 {extract.quantile(0.5)} ms"
+        )
+
+    def maybe_summary(self):
+        """Print the summary line if `summary_every` seconds passed since the last one"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_summary < self.summary_every:
+                return
+            self._last_summary = now
+        print(self.summary_line())
+        c, _, _ = self.totals()
+        self.event("summary", **c)
+
+    def report(self, writer=None, scheduler=None, **extra):
+        """Run report document; writer/scheduler add product counts and per-domain politeness state"""
+        if writer is not None:
+            extra["products"] = dict(writer.counts)
+        if scheduler is not None:
+            # Domains contain dots, so they are values rather than keys
+            extra["politeness"] = [{"domain": d, **s} for d, s in scheduler.summary().items()]
+        counts, load, extract = self.totals()
+        with self._lock:
+            sites = {label: m.summary() for label, m in self.sites.items()}
+        return {
+            "_id": f"{self.run_id}:{self.worker}" if self.worker else self.run_id,
+            "run": self.run_id,
+            "worker": self.worker,
+            "engine": self.engine,
+            "startedAt": self.started_at,
+            "finishedAt": datetime.utcnow(),
+            "seconds": round(time.monotonic() - self._started, 1),
+            "totals": {**counts, "load": load.summary(), "extract": extract.summary()},
+            "sites": sites,
+            **extra,
+        }
+
+    def print_report(self):
+        print(self.summary_line())
+        with self._lock:
+            sites = {label: m.summary() for label, m in self.sites.items()}
+        for label, s in sites.items():
+            print(
+                f"   {label}: {s['pages']} pages ({s['empty_pages']} empty, {s['failed_pages']} failed, "
+                f"{s['retries']} retries) | +{s['added']} added, {s['skipped']} skipped, {s['errored']} errors "
+                f"| load p50/p95 {s['load']['p50_ms']}/{s['load']['p95_ms']} ms "
+                f"| extract p50/p95 {s['extract']['p50_ms']}/{s['extract']['p95_ms']} ms"
+            )
+
+    def save_report(self, collection=None, writer=None, scheduler=None, **extra):
+        """Print the final report and store it in crawl_reports (keyed by run id)"""
+        if collection is None:
+            from ingest import db
+
+            collection = db["crawl_reports"]
+        report = self.report(writer, scheduler, **extra)
+        self.print_report()
+        collection.replace_one({"_id": report["_id"]}, report, upsert=True)
+        self.event("run", **{k: v for k, v in report.items() if k not in ("_id", "run", "worker")})
+        print(f"🗒️  Crawl report saved ({collection.name} {report['_id']})")
+        self.close()
+        return report
+
+    def close(self):
+        with self._lock:
+            if self._log is not None and self._log is not sys.stdout:
+                self._log.close()
+                self._log = None
@@ -0,0 +1,176 @@
+"""
+Indexes of the value_scout collections and a query-plan check
+Every index the hot queries rely on is declared here and created idempotently
+(create_indexes is a no-op for an index that already exists) by the services
+and jobs at startup: ProductWriter (every scraper), the embedding worker and
+runner, detail enrichment, clustering and the API.
+
+The hot queries are the ones that run per request, per batch or per poll.
+check_plans() explains each of them and fails when one falls back to a
+COLLSCAN, e.g. after a query shape changed or an index could not be built.
+Full passes (vector index load, audits, reclassification) scan by design
+and are not listed.
+
+    python db_schema.py            # create indexes, then check the plans
+    python db_schema.py --check    # only check the plans
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient
+from pymongo.errors import OperationFailure
+
+from canonical_urls import ensure_url_index
+from embeddings import JOB_FIELD, NEEDS_EMBEDDING_QUERY, PENDING_QUERY
+from leases import LeaseQueue
+
+client = MongoClient("mongodb://127.0.0.1:27017")
+db = client["value_scout"]
+
+# Index options/key conflicts with an existing index of the same name or keys
+CONFLICT_CODES = (85, 86)
+
+PRODUCT_INDEXES = [
+    # Embedding backlog: missing version = never embedded; $ne = other model/version
+    IndexModel([("embeddingModelVersion", ASCENDING)]),
+    IndexModel([("embeddingModel", ASCENDING)]),
+    # Lease claims re-read their batch by token; finished leases are unset, so it stays small
+    IndexModel([(f"{JOB_FIELD}.token", ASCENDING)], sparse=True),
+    # Embedding worker watermark and --scraped-after selections
+    IndexModel([("scrapedAt", DESCENDING)]),
+    # Delisting sweep and detail enrichment backlog (per source, oldest details first)
+    IndexModel([("source", ASCENDING), ("enrichedAt", ASCENDING)]),
+    # Offers of a near-duplicate cluster (product_clusters.py)
+    IndexModel([("clusterId", ASCENDING)], sparse=True),
+]
+
+PRICE_HISTORY_INDEXES = [
+    IndexModel([("productId", ASCENDING), ("start", ASCENDING)]),
+]
+
+
+class CollectionScan(Exception):
+    """A hot query is answered by scanning the whole collection"""
+
+
+def ensure_indexes(collection, indexes):
+    """Create the declared indexes one by one; a conflicting existing index is reported, not replaced"""
+    created = []
+    for model in indexes:
+        try:
+            created += collection.create_indexes([model])
+        except OperationFailure as e:
+            if e.code not in CONFLICT_CODES:
+                raise
+            print(f"⚠️  {collection.name}: index {model.document['name']} conflicts with an existing one ({e})")
+    return created
+
+
+def ensure_product_indexes(collection):
+    """Declared product indexes plus the unique canonicalUrl index (skipped while duplicates remain)"""
+    created = ensure_indexes(collection, PRODUCT_INDEXES)
+    ensure_url_index(collection)
+    return created
+
+
+def ensure_all(database=None):
+    database = database if database is not None else db
+    return {
+        "products": ensure_product_indexes(database["products"]),
+        "price_history": ensure_indexes(database["price_history"], PRICE_HISTORY_INDEXES),
+    }
+
+
+def hot_queries(now=None):
+    """[(name, collection, filter, sort)] in the shape the code sends them (values are placeholders)"""
+    now = now or datetime.utcnow()
+    # Backlog predicates without the claim's _id sort, which any plan could satisfy from the _id index
+    backlog = LeaseQueue(None, PENDING_QUERY, JOB_FIELD).claimable_query(now)
+    worker_backlog = LeaseQueue(None, NEEDS_EMBEDDING_QUERY, JOB_FIELD).claimable_query(now)
+    return [
+        ("embedding backlog (process_embeddings.py)", "products", backlog, None),
+        ("embedding backlog (embedding_worker.py)", "products", worker_backlog, None),
+        ("lease batch by token", "products", {f"{JOB_FIELD}.token": "token"}, [("_id", 1)]),
+        ("newest scrape watermark", "products", {"scrapedAt": {"$gt": now}}, [("scrapedAt", -1)]),
+        ("ingest batch lookup", "products",
+         {"$or": [{"_id": {"$in": ["id"]}}, {"canonicalUrl": {"$in": ["https://url"], "$type": "string"}}]}, None),
+        ("delisting sweep", "products",
+         {"source": {"$in": ["source"]}, "delisted": {"$ne": True}, "lastSeenRun": {"$ne": "run"}}, None),
+        ("detail enrichment backlog", "products",
+         {"source": {"$in": ["source"]}, "delisted": {"$ne": True}, "productUrl": {"$nin": [None, ""]},
+          "$or": [{"enrichedAt": {"$exists": False}}, {"enrichedAt": {"$lt": now}}]}, None),
+        ("offers by cluster", "products", {"clusterId": "cluster", "delisted": {"$ne": True}}, None),
+        ("product by id", "products", {"_id": "id"}, None),
+        ("price history window", "price_history", {"productId": {"$in": ["id"]}, "start": {"$gte": now}}, None),
+    ]
+
+
+def plan_stages(plan):
+    """(stage names, index names) of an explain() winning plan, classic or slot-based, sharded or not"""
+    stages, indexes = [], []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "indexName" in node:
+            indexes.append(node["indexName"])
+        for key in ("queryPlan", "winningPlan", "inputStage", "inputStages", "shards"):
+            if key in node:
+                stack.append(node[key])
+    return stages, indexes
+
+
+def check_plans(database=None, strict=True):
+    """Explain every hot query; raises CollectionScan (strict) or returns the report with problems flagged"""
+    database = database if database is not None else db
+    report, scans = [], []
+    for name, collection, query, sort in hot_queries():
+        explained = database[collection].find(query, sort=sort, limit=1).explain()
+        stages, indexes = plan_stages(explained["queryPlanner"]["winningPlan"])
+        stats = explained.get("executionStats", {})
+        row = {
+            "name": name,
+            "collection": collection,
+            "stages": stages,
+            "indexes": indexes,
+            "keysExamined": stats.get("totalKeysExamined"),
+            "docsExamined": stats.get("totalDocsExamined"),
+            "collscan": "COLLSCAN" in stages,
+        }
+        report.append(row)
+        if row["collscan"]:
+            scans.append(name)
+
+    for row in report:
+        mark = "❌" if row["collscan"] else "✅"
+        via = ", ".join(row["indexes"]) or " > ".join(reversed(row["stages"]))
+        print(f"{mark} {row['name']:<44} {via}")
+    if scans:
+        message = f"{len(scans)} hot queries fall back to COLLSCAN: {', '.join(scans)}"
+        if strict:
+            raise CollectionScan(message)
+        print(f"⚠️  {message} (run db_schema.py)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the declared indexes and check hot query plans")
+    parser.add_argument("--check", action="store_true", help="Only check the plans, create nothing")
+    args = parser.parse_args()
+
+    if not args.check:
+        for name, created in ensure_all().items():
+            print(f"🗂️  {name}: {', '.join(created) or 'no indexes declared'} in place")
+    try:
+        check_plans()
+    except CollectionScan as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("Query plans OK.")
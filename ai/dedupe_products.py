@@ -1,20 +1,146 @@
-from pymongo import MongoClient
+"""Collapse duplicate products that share a canonical product URL (canonical_urls.py).
+1. Stamp: stream products in batches, repair broken productUrls (links that lost the
+   slash after the domain, e.g. ".comtshirts") and set canonicalUrl; only changed
+   documents are written, with unordered bulk_write
+2. Group server-side: one $group aggregation (allowDiskUse) returns only the canonical
+   URLs held by more than one document, keeper first (embedded, then most recently scraped)
+3. Delete the rest with delete_many in batches, then build the unique canonicalUrl
+   index so ingest (ProductWriter) cannot create them again
+
+Memory is bounded by the batch size and the largest duplicate group, not the catalog.
+--dry-run writes nothing: it groups on the canonicalUrl values already stored and
+reports how many products are still unstamped (those are not grouped).
+
+    python dedupe_products.py --dry-run --samples 5
+    python dedupe_products.py
+"""
+import argparse
+from collections import Counter
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from canonical_urls import URL_INDEX, canonical_url, ensure_url_index, repair_url
 
 client = MongoClient("mongodb://127.0.0.1:27017")
 db = client["value_scout"]
 col = db["products"]
 
-print("Scanning duplicates by productUrl ...")
+BATCH_SIZE = 1000
+
+UNSTAMPED = {"productUrl": {"$nin": [None, ""]}, "canonicalUrl": {"$not": {"$type": "string"}}}
+
+DUPLICATE_GROUPS = [
+    {"$match": {"canonicalUrl": {"$type": "string"}}},
+    # Keep the sort small: no vectors, only whether there are any
+    {"$project": {
+        "canonicalUrl": 1,
+        "source": 1,
+        "scrapedAt": 1,
+        "embedded": {"$cond": [{"$ifNull": ["$imageEmbedding", "$styleEmbedding"]}, 1, 0]},
+    }},
+    {"$sort": {"canonicalUrl": 1, "embedded": -1, "scrapedAt": -1, "_id": 1}},
+    {"$group": {
+        "_id": "$canonicalUrl",
+        "count": {"$sum": 1},
+        "ids": {"$push": "$_id"},
+        # $push skips missing values, which would shift sources against ids
+        "sources": {"$push": {"$ifNull": ["$source", None]}},
+    }},
+    {"$match": {"count": {"$gt": 1}}},
+]
+
+
+def stamp(batch_size=BATCH_SIZE):
+    """Repair productUrl and set canonicalUrl where missing or outdated; (updated, conflicts)"""
+    ops = []
+    updated = conflicts = 0
+
+    def write(ops):
+        try:
+            return col.bulk_write(ops, ordered=False).modified_count, 0
+        except BulkWriteError as e:
+            # Unique index could not be dropped: the duplicate stays unstamped
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+            return e.details.get("nModified", 0), len(errors)
 
-dups = {}
-for doc in col.find({}, {"_id":1, "productUrl":1, "scrapedAt":1}).sort("scrapedAt", -1):
-    url = doc.get("productUrl")
-    if not url:
-        continue
-    if url not in dups:
-        dups[url] = doc["_id"]
+    for doc in col.find({"productUrl": {"$nin": [None, ""]}}, {"productUrl": 1, "canonicalUrl": 1},
+                        batch_size=batch_size):
+        fields = {"productUrl": repair_url(doc["productUrl"]), "canonicalUrl": canonical_url(doc["productUrl"])}
+        changed = {k: v for k, v in fields.items() if doc.get(k) != v}
+        if not changed:
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": changed}))
+        if len(ops) >= batch_size:
+            counts = write(ops)
+            updated, conflicts, ops = updated + counts[0], conflicts + counts[1], []
+    if ops:
+        counts = write(ops)
+        updated, conflicts = updated + counts[0], conflicts + counts[1]
+    return updated, conflicts
+
+
+def dedupe(dry_run=False, samples=3, batch_size=BATCH_SIZE):
+    total_before = col.count_documents({})
+
+    if not dry_run and URL_INDEX in col.index_information():
+        # Re-stamping can briefly give two documents the same URL; the index is rebuilt at the end
+        col.drop_index(URL_INDEX)
+    if dry_run:
+        updated = 0
+        unstamped = col.count_documents(UNSTAMPED)
+        print(f"🔗 {unstamped} products have no canonical URL yet (stamped by a real run, not grouped here)")
     else:
-        col.delete_one({"_id": doc["_id"]})
+        updated, conflicts = stamp(batch_size)
+        print(f"🔗 Canonical URLs stamped/repaired on {updated} products")
+        if conflicts:
+            print(f"⚠️  {conflicts} products left unstamped (they collide with the unique index)")
+
+    groups = removed = 0
+    pairs = Counter()
+    examples = []
+    losers = []
+    for group in col.aggregate(DUPLICATE_GROUPS, allowDiskUse=True, batchSize=batch_size):
+        groups += 1
+        keeper_source = group["sources"][0]
+        for source in group["sources"][1:]:
+            pairs[(keeper_source, source)] += 1
+        if len(examples) < samples:
+            examples.append(f"{group['count']}x {group['_id']} (kept {group['ids'][0]})")
+        removed += len(group["ids"]) - 1
+        if dry_run:
+            continue
+        losers.extend(group["ids"][1:])
+        if len(losers) >= batch_size:
+            col.delete_many({"_id": {"$in": losers}})
+            losers = []
+    if losers:
+        col.delete_many({"_id": {"$in": losers}})
+
+    verb = "would be removed" if dry_run else "removed"
+    print(f"🧹 {groups} canonical URLs held by several products; {removed} duplicates {verb}")
+    if pairs:
+        print(f"\n{'kept (source)':<24} {'removed (source)':<24} {'count':>7}")
+        print("-" * 57)
+        for (kept, dropped), count in pairs.most_common():
+            print(f"{str(kept):<24} {str(dropped):<24} {count:>7}")
+    for example in examples:
+        print(f"    e.g. {example}")
+
+    if not dry_run and ensure_url_index(col):
+        print(f"🔒 Unique index {URL_INDEX} in place")
+    print(f"Total products: {total_before} -> {col.count_documents({})}")
+    return {"groups": groups, "removed": removed, "stamped": updated}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collapse products sharing a canonical URL")
+    parser.add_argument("--dry-run", action="store_true", help="Report duplicate groups without deleting")
+    parser.add_argument("--samples", type=int, default=3, help="Example duplicate URLs to print (default: 3)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
 
-print("De-duplication complete.")
-print(f"Total remaining products: {col.count_documents({})}")
+    dedupe(args.dry_run, args.samples, args.batch_size)
+    print("De-duplication complete.")
@@ -0,0 +1,342 @@
+"""
+Product detail enrichment
+Listing cards only carry one image and the selling price. This optional stage
+visits the detail pages of new, changed or stale products and merges MRP,
+discount, available sizes, colour and extra images into the product documents.
+Each site's "detail" entry in scrape_sites.py picks the parser:
+
+  myntra   the pdpData JSON Myntra renders into window.__myx
+  shopify  <product url>.js (variants with availability, compare-at price)
+  jsonld   schema.org Product JSON-LD in the page (other stores)
+
+A product is stale when it was never enriched, when ProductWriter saw its
+contentFingerprint change (enrichedAt is unset), or when its details are
+older than --max-age-days. Products whose page failed are retried after
+RETRY_HOURS.
+
+Pages are fetched over plain HTTP by a bounded thread pool, through a
+politeness scheduler with its own DETAIL_POLICY, so detail throughput is tuned
+separately from the listing crawl (--workers, --rate). Results are merged with
+one unordered bulk_write per batch.
+
+    python detail_enrich.py --site Nike --limit 200
+    python detail_enrich.py --workers 16 --rate 2.0
+    python scraper.py --enrich
+"""
+
+import argparse
+import json
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from pymongo import UpdateOne
+
+from crawl_telemetry import PAGES, Attempts, CrawlTelemetry
+from db_schema import ensure_product_indexes
+from http_ingest import make_session
+from ingest import products
+from politeness import PolitenessScheduler, check_status
+from scrape_sites import SITES, absolute_image, domain_of, fetch_base
+
+# Detail pages per second per domain to start with (the listing crawl keeps its own rate)
+DETAIL_POLICY = {"rate": 1.0, "max_rate": 3.0}
+MAX_AGE_DAYS = 7
+RETRY_HOURS = 24
+MAX_IMAGES = 8
+
+MYX_RE = re.compile(r"window\.__myx\s*=\s*(\{.*?\})\s*;?\s*</script>", re.DOTALL)
+JSONLD_RE = re.compile(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script\s*>',
+                       re.IGNORECASE | re.DOTALL)
+COLOUR_OPTIONS = {"color", "colour"}
+SIZE_OPTIONS = {"size", "uk size", "shoe size", "us size"}
+
+
+def rupees(value, paise=False):
+    """Price from a number or text like "₹ 7,999.00" (None if there is none)"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, str):
+        digits = re.sub(r"[^\d.]", "", value)
+        if not digits:
+            return None
+        value = float(digits)
+    return int(round(value / 100 if paise else value))
+
+
+def details(mrp, price, sizes, colour, images):
+    """Normalised detail fields merged into the product document"""
+    mrp, price = rupees(mrp), rupees(price)
+    if mrp is None or (price is not None and price > mrp):
+        mrp = price
+    discount = round((mrp - price) / mrp * 100) if mrp and price is not None and price < mrp else 0
+    seen, clean = set(), []
+    for src in images:
+        src = absolute_image(src or "")
+        if src and src not in seen:
+            seen.add(src)
+            clean.append(src)
+    return {
+        "mrp": mrp,
+        "discountPercent": discount,
+        "sizes": [str(s).strip() for s in sizes if str(s).strip()],
+        "colour": colour.strip() if isinstance(colour, str) and colour.strip() else None,
+        "images": clean[:MAX_IMAGES],
+    }
+
+
+# ---------- detail parsers (response text -> detail fields; ValueError if unreadable) ----------
+def parse_myntra(body):
+    match = MYX_RE.search(body)
+    if not match:
+        raise ValueError("no window.__myx on page")
+    pdp = json.loads(match.group(1)).get("pdpData")
+    if not pdp:
+        raise ValueError("no pdpData")
+    price = pdp.get("price") or {}
+    sizes = [s.get("label") for s in pdp.get("sizes") or [] if s.get("available", True) and s.get("label")]
+    images = [
+        img.get("imageURL") or img.get("src")
+        for album in (pdp.get("media") or {}).get("albums") or []
+        for img in album.get("images") or []
+    ]
+    return details(price.get("mrp") or pdp.get("mrp"), price.get("discounted") or pdp.get("price"),
+                   sizes, pdp.get("baseColour"), images)
+
+
+def parse_shopify(body):
+    product = json.loads(body)
+    variants = product.get("variants") or []
+    options = [(o.get("name") or "").lower() if isinstance(o, dict) else str(o).lower()
+               for o in product.get("options") or []]
+    size_key = next((f"option{i + 1}" for i, name in enumerate(options) if name in SIZE_OPTIONS), None)
+    colour_key = next((f"option{i + 1}" for i, name in enumerate(options) if name in COLOUR_OPTIONS), None)
+
+    available = [v for v in variants if v.get("available", True)]
+    sizes = list(dict.fromkeys(v.get(size_key) for v in available if size_key and v.get(size_key)))
+    colour = variants[0].get(colour_key) if colour_key and variants else None
+    priced = available or variants
+    price = min((v["price"] for v in priced if v.get("price") is not None), default=product.get("price"))
+    mrp = max((v.get("compare_at_price") or 0 for v in priced), default=0) or product.get("compare_at_price")
+    images = [img if isinstance(img, str) else img.get("src") for img in product.get("images") or []]
+    # .js prices are in paise
+    return details(rupees(mrp, paise=True), rupees(price, paise=True), sizes, colour, images)
+
+
+def _jsonld_products(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from _jsonld_products(item)
+    elif isinstance(node, dict):
+        kind = node.get("@type")
+        kinds = kind if isinstance(kind, list) else [kind]
+        if "Product" in kinds or "ProductGroup" in kinds:
+            yield node
+        yield from _jsonld_products(node.get("@graph") or [])
+
+
+def parse_jsonld(body):
+    found = []
+    for block in JSONLD_RE.findall(body):
+        try:
+            found.extend(_jsonld_products(json.loads(block)))
+        except ValueError:
+            continue
+    if not found:
+        raise ValueError("no Product JSON-LD on page")
+    product = found[0]
+
+    variants = product.get("hasVariant") or [product]
+    offers = []
+    for variant in variants:
+        variant_offers = variant.get("offers") or []
+        for offer in variant_offers if isinstance(variant_offers, list) else [variant_offers]:
+            offers.append((variant, offer))
+
+    prices, list_prices, sizes = [], [], []
+    for variant, offer in offers:
+        in_stock = "InStock" in str(offer.get("availability", "InStock"))
+        price = offer.get("price") or offer.get("lowPrice")
+        if price is not None and in_stock:
+            prices.append(rupees(price))
+        if offer.get("highPrice") is not None:
+            list_prices.append(rupees(offer["highPrice"]))
+        spec = offer.get("priceSpecification") or []
+        for s in spec if isinstance(spec, list) else [spec]:
+            if str(s.get("priceType", "")).endswith(("ListPrice", "StrikethroughPrice")):
+                list_prices.append(rupees(s.get("price")))
+        size = variant.get("size") if variant is not product else None
+        if size and in_stock:
+            sizes.append(size if isinstance(size, str) else size.get("name"))
+
+    image = product.get("image") or []
+    images = image if isinstance(image, list) else [image]
+    images = [i if isinstance(i, str) else i.get("url") for i in images]
+    price = min((p for p in prices if p is not None), default=None)
+    mrp = max((p for p in list_prices if p is not None), default=None)
+    return details(mrp, price, list(dict.fromkeys(sizes)), product.get("color"), images)
+
+
+PARSERS = {"myntra": parse_myntra, "shopify": parse_shopify, "jsonld": parse_jsonld}
+
+
+def detail_url(site, product_url, base_url=None):
+    """Where to fetch a product's details (a stand-in server keeps the product path)"""
+    parts = urlsplit(product_url)
+    url = fetch_base(site, base_url).rstrip("/") + parts.path
+    if parts.query:
+        url += "?" + parts.query
+    if site["detail"] == "shopify":
+        url = url.rstrip("/") + ".js"
+    return url
+
+
+# ---------- enrichment ----------
+class DetailEnricher:
+    def __init__(self, workers=8, rate=None, base_url=None, max_age_days=MAX_AGE_DAYS,
+                 batch_size=100, collection=None, scheduler=None, session=None, verbosity=0):
+        self.workers = workers
+        self.base_url = base_url
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+        self.collection = collection if collection is not None else products
+        policy = dict(DETAIL_POLICY, **({"rate": rate, "max_rate": max(rate, DETAIL_POLICY["max_rate"])}
+                                        if rate else {}))
+        self.scheduler = scheduler or PolitenessScheduler(policy)
+        self.session = session or make_session(pool_size=workers)
+        self.verbosity = verbosity
+        self.telemetry = None
+        self.stats = {}
+
+    def stale_query(self, sources):
+        now = datetime.utcnow()
+        return {
+            "source": {"$in": sources},
+            "delisted": {"$ne": True},
+            "productUrl": {"$nin": [None, ""]},
+            "$or": [
+                {"enrichedAt": {"$exists": False}},
+                {"enrichedAt": {"$lt": now - timedelta(days=self.max_age_days)}},
+            ],
+            "detailFailedAt": {"$not": {"$gt": now - timedelta(hours=RETRY_HOURS)}},
+        }
+
+    def fetch(self, site, doc):
+        """Fetch and parse one product's detail page (runs on a pool thread)"""
+        url = detail_url(site, doc["productUrl"], self.base_url)
+        metrics = self.telemetry.site(site["label"])
+
+        def get():
+            started = time.time()
+            resp = self.session.get(url, timeout=30)
+            check_status(resp.status_code, resp.headers.get("Retry-After"))
+            metrics.observe_load(time.time() - started)
+            return resp
+
+        attempts = Attempts(get)
+        try:
+            resp = self.scheduler.call(domain_of(site["base_url"]), attempts)
+            # 404 and friends are not retried: the product page is gone, not the site
+            resp.raise_for_status()
+            started = time.perf_counter()
+            fields = PARSERS[site["detail"]](resp.text)
+            metrics.observe_extract(time.perf_counter() - started)
+            return fields, None, attempts.retries
+        except Exception as e:
+            # Any error, including a parser tripping over an unexpected page shape, fails this product only
+            return None, e, attempts.retries
+
+    def _update(self, site, doc, fields, error, retries):
+        stats = self.stats.setdefault(site["label"], {"enriched": 0, "failed": 0, "retries": 0})
+        stats["retries"] += retries
+        # Only if the product was not re-scraped with new content meanwhile
+        match = {"_id": doc["_id"], "contentFingerprint": doc.get("contentFingerprint")}
+        if error is None:
+            stats["enriched"] += 1
+            # One telemetry "page" per detail page (page = product id)
+            self.telemetry.page(site["label"], "detail", doc["_id"], 1, 1, retries=retries)
+            self.telemetry.say(PAGES, f"  ✓ [{site['label']}] {doc['productName'][:50]}: MRP {fields['mrp']}, "
+                                      f"-{fields['discountPercent']}%, {len(fields['sizes'])} sizes")
+            return UpdateOne(match, {
+                "$set": {**fields, "enrichedAt": datetime.utcnow()},
+                "$unset": {"detailError": "", "detailFailedAt": ""},
+            })
+        stats["failed"] += 1
+        message = f"{error.__class__.__name__}: {error}"
+        self.telemetry.page(site["label"], "detail", doc["_id"], 0, 0, errored=1, retries=retries)
+        self.telemetry.event("detail_failed", site=site["label"], id=doc["_id"], error=message)
+        self.telemetry.say(PAGES, f"  ❌ [{site['label']}] {doc['productUrl']}: {message}")
+        return UpdateOne(match, {"$set": {"detailError": message[:300], "detailFailedAt": datetime.utcnow()}})
+
+    def _flush(self, ops):
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+        return []
+
+    def run(self, sites, limit=None, run_id=None):
+        """Enrich stale products of these sites; returns {label: products enriched}"""
+        by_source = {site["source"]: site for site in sites if site.get("detail") in PARSERS}
+        self.telemetry = CrawlTelemetry(run_id, "detail", self.verbosity)
+        query = self.stale_query(list(by_source))
+        pending = self.collection.count_documents(query)
+        if limit:
+            pending = min(pending, limit)
+        print("=" * 60)
+        print(f"🔎 DETAIL ENRICHMENT: {pending} stale products | {self.workers} workers "
+              f"| {self.scheduler.policy['rate']} pages/s per domain to start")
+        print("=" * 60)
+
+        cursor = self.collection.find(query, {"productUrl": 1, "productName": 1, "source": 1,
+                                              "contentFingerprint": 1})
+        if limit:
+            cursor = cursor.limit(limit)
+        ops, in_flight = [], {}
+        started = time.time()
+        # At most 2x workers requests queued, so a large backlog streams from the cursor
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for doc in cursor:
+                site = by_source[doc["source"]]
+                in_flight[pool.submit(self.fetch, site, doc)] = (site, doc)
+                if len(in_flight) < 2 * self.workers:
+                    continue
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ops.append(self._update(*in_flight.pop(future), *future.result()))
+                if len(ops) >= self.batch_size:
+                    ops = self._flush(ops)
+                self.telemetry.maybe_summary()
+            for future in list(in_flight):
+                ops.append(self._update(*in_flight.pop(future), *future.result()))
+        self._flush(ops)
+
+        elapsed = max(time.time() - started, 1e-6)
+        enriched = {label: s["enriched"] for label, s in self.stats.items()}
+        done = sum(s["enriched"] + s["failed"] for s in self.stats.values())
+        print(f"\n⏱️  {done} detail pages in {elapsed:.1f}s ({done / elapsed:.2f} pages/s)")
+        for label, s in self.stats.items():
+            print(f"   {label}: enriched {s['enriched']} | failed {s['failed']} | retries {s['retries']}")
+        self.scheduler.print_summary()
+        self.telemetry.save_report(self.collection.database["crawl_reports"], scheduler=self.scheduler,
+                                   details=self.stats)
+        return enriched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrich stale products from their detail pages")
+    parser.add_argument("--site", action="append", choices=list(SITES),
+                        help="Only this site (repeatable; default: all)")
+    parser.add_argument("--workers", type=int, default=8, help="Detail pages in flight (default: 8)")
+    parser.add_argument("--rate", type=float,
+                        help=f"Starting detail pages/s per domain (default: {DETAIL_POLICY['rate']})")
+    parser.add_argument("--max-age-days", type=float, default=MAX_AGE_DAYS,
+                        help=f"Re-read details older than this (default: {MAX_AGE_DAYS})")
+    parser.add_argument("--limit", type=int, help="At most this many products")
+    parser.add_argument("--base-url", help="Stand-in server root (sites served under /<site>)")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="A line per product")
+    args = parser.parse_args()
+
+    ensure_product_indexes(products)
+    enricher = DetailEnricher(args.workers, args.rate, args.base_url, args.max_age_days, verbosity=args.verbose)
+    enricher.run([SITES[label] for label in (args.site or SITES)], args.limit)
@@ -0,0 +1,90 @@
+"""
+Embedding job ledger
+Per-product status, attempts, last error and next retry live on
+products.embeddingJob (see leases.py). This module records run-level progress
+in the embedding_runs collection - processed counts, throughput and ETA are
+flushed while the job runs, so a separate shell or the AI API can watch it.
+"""
+
+import time
+import uuid
+from datetime import datetime
+
+RUNS_COLLECTION = "embedding_runs"
+
+
+class RunProgress:
+    """Counters for one embedding run, periodically persisted to Mongo"""
+
+    def __init__(self, db, owner, total, mode="in-process", flush_seconds=5):
+        self.runs = db[RUNS_COLLECTION]
+        self.run_id = uuid.uuid4().hex
+        self.total = total
+        self.flush_seconds = flush_seconds
+        self.started = time.time()
+        self._last_flush = 0.0
+        self.counts = {"processed": 0, "successful": 0, "failed": 0, "poisoned": 0}
+        self.runs.insert_one({
+            "_id": self.run_id,
+            "owner": owner,
+            "mode": mode,
+            "status": "running",
+            "total": total,
+            "startedAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow(),
+            **self.counts,
+        })
+
+    def record(self, successful=0, failed=0, poisoned=0):
+        self.counts["processed"] += successful + failed
+        self.counts["successful"] += successful
+        self.counts["failed"] += failed
+        self.counts["poisoned"] += poisoned
+        if time.time() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def rate(self):
+        elapsed = time.time() - self.started
+        return self.counts["processed"] / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self):
+        rate = self.rate()
+        remaining = max(self.total - self.counts["processed"], 0)
+        return remaining / rate if rate else None
+
+    def line(self):
+        eta = self.eta_seconds()
+        eta_txt = f"{eta:.0f}s" if eta is not None else "?"
+        return (
+            f"[{self.counts['processed']}/{self.total}] {self.rate():.2f} products/s "
+            f"| ok {self.counts['successful']} | failed {self.counts['failed']} | ETA {eta_txt}"
+        )
+
+    def flush(self, status=None):
+        self._last_flush = time.time()
+        update = {
+            **self.counts,
+            "updatedAt": datetime.utcnow(),
+            "productsPerSecond": round(self.rate(), 3),
+            "etaSeconds": self.eta_seconds(),
+        }
+        if status:
+            update["status"] = status
+            update["finishedAt"] = datetime.utcnow()
+        self.runs.update_one({"_id": self.run_id}, {"$set": update})
+
+    def finish(self, status="completed"):
+        self.flush(status)
+
+
+def backlog_summary(queue):
+    """Where the embedding backlog stands: claimable, backing off, poisoned"""
+    return {
+        "claimable": queue.count_claimable(),
+        "waiting_retry": queue.count_waiting(),
+        "poisoned": queue.count_poisoned(),
+    }
+
+
+def recent_runs(db, limit=5):
+    return list(db[RUNS_COLLECTION].find({}, sort=[("startedAt", -1)], limit=limit))
@@ -0,0 +1,259 @@
+"""
+Multi-process CPU embedding backfill
+Shards pending products across worker processes - each worker loads CLIP once
+and pins its torch thread count, the coordinator claims leased id ranges,
+hands them out and merges progress
+"""
+
+import multiprocessing as mp
+import os
+import time
+from io import BytesIO
+from queue import Queue
+
+import requests
+from pymongo import MongoClient, UpdateOne
+
+from embedding_ledger import RunProgress
+from leases import LeaseQueue
+
+MONGO_URI = "mongodb://localhost:27017/"
+PROJECTION = {"_id": 1, "productName": 1, "imageUrl": 1}
+
+# Per-process state, set up by _init_worker
+_queue = None
+
+
+def _pin_threads(threads):
+    """Must run before torch is imported in the worker process"""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    import torch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+
+def _init_worker(threads, queue_config=None):
+    """
+    Pool initializer: pin threads, open a private Mongo client bound to the
+    coordinator's lease owner, and load CLIP
+    """
+    global _queue
+    _pin_threads(threads)
+    if queue_config is not None:
+        collection = MongoClient(MONGO_URI)["value_scout"]["products"]
+        _queue = LeaseQueue(collection, **queue_config)
+
+    from embeddings import get_model
+
+    get_model()
+
+
+def _embed_range(ids):
+    """Worker task: embed one leased range of product ids and write it back in bulk"""
+    from embeddings import generate_embeddings
+
+    started = time.time()
+    ops = []
+    successful = failed = poisoned = 0
+    projection = dict(PROJECTION, **{_queue.field: 1})
+    for doc in _queue.collection.find({"_id": {"$in": ids}}, projection):
+        image_url = doc.get("imageUrl", "")
+        fields, error = None, "no image URL"
+        if image_url:
+            fields, error = generate_embeddings(doc.get("productName", "Unnamed Product"), image_url)
+        if fields is None:
+            attempts = (doc.get(_queue.field) or {}).get("attempts", 0)
+            update = _queue.fail_update(attempts, error, permanent=not image_url)
+            ops.append(UpdateOne({"_id": doc["_id"], f"{_queue.field}.owner": _queue.owner}, update))
+            failed += 1
+            poisoned += update["$set"][f"{_queue.field}.status"] == "poisoned"
+            continue
+        ops.append(UpdateOne(*_queue.complete_op(doc["_id"], fields)))
+        successful += 1
+
+    if ops:
+        _queue.collection.bulk_write(ops, ordered=False)
+    return {
+        "pid": os.getpid(),
+        "ids": ids,
+        "successful": successful,
+        "failed": failed,
+        "poisoned": poisoned,
+        "seconds": time.time() - started,
+    }
+
+
+def default_split(workers=None):
+    """workers x threads that uses every core exactly once"""
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, cores))
+    return workers, max(1, cores // workers)
+
+
+def run_sharded(queue, workers=None, threads=None, chunk_size=32):
+    """
+    Drain the lease queue with a pool of worker processes
+    The coordinator claims one range per free slot (at most two in flight per
+    worker), so other machines can still claim the rest of the backlog
+    """
+    workers, default_threads = default_split(workers)
+    threads = threads or default_threads
+    total = queue.count_claimable()
+
+    print("=" * 60)
+    print(f"🚀 SHARDED EMBEDDING BACKFILL ({workers} workers x {threads} threads)")
+    print("=" * 60)
+    if total == 0:
+        print("\n✅ All products already have embeddings!")
+        return {"total": 0, "successful": 0, "failed": 0}
+    print(f"\n📊 Found {total} products to process (coordinator {queue.owner})\n")
+
+    progress = RunProgress(queue.collection.database, queue.owner, total,
+                           mode=f"sharded {workers}x{threads}")
+    per_worker = {}
+    queue_config = {
+        "pending_query": queue.pending_query,
+        "field": queue.field,
+        "lease_seconds": queue.lease_seconds,
+        "max_attempts": queue.max_attempts,
+        "retry_base_seconds": queue.retry_base_seconds,
+        "retry_max_seconds": queue.retry_max_seconds,
+        "owner": queue.owner,
+    }
+    done = Queue()
+    in_flight = 0
+    exhausted = False
+    status = "completed"
+
+    # spawn: fresh interpreters, so torch threads and Mongo clients are per process
+    ctx = mp.get_context("spawn")
+    try:
+        with queue.heartbeat(), ctx.Pool(workers, initializer=_init_worker,
+                                         initargs=(threads, queue_config)) as pool:
+            while True:
+                while not exhausted and in_flight < workers * 2:
+                    ids = [d["_id"] for d in queue.claim(chunk_size, {"_id": 1})]
+                    if not ids:
+                        exhausted = True
+                        break
+                    pool.apply_async(_embed_range, (ids,), callback=done.put,
+                                     error_callback=lambda e, ids=ids: done.put({"error": e, "ids": ids}))
+                    in_flight += 1
+                if in_flight == 0:
+                    break
+
+                res = done.get()
+                in_flight -= 1
+                queue.forget(res["ids"])
+                if "error" in res:
+                    # Worker crashed mid-range: leases expire and the range is retried
+                    print(f"   ❌ Worker error on {len(res['ids'])} products: {res['error']}")
+                    progress.record(failed=len(res["ids"]))
+                    continue
+
+                progress.record(res["successful"], res["failed"], res["poisoned"])
+                per_worker[res["pid"]] = per_worker.get(res["pid"], 0) + len(res["ids"])
+                print(progress.line())
+    except KeyboardInterrupt:
+        status = "interrupted"
+        released = queue.release(list(queue.held))
+        print(f"\n⏸️  Interrupted - released {released} claimed products; rerun to resume")
+    finally:
+        progress.finish(status)
+
+    stats = dict(progress.counts, total=total, run_id=progress.run_id,
+                 products_per_second=round(progress.rate(), 2))
+
+    print("\n" + "=" * 60)
+    print("📊 SHARDED BACKFILL COMPLETE" if status == "completed" else "📊 SHARDED BACKFILL INTERRUPTED")
+    print("=" * 60)
+    print(f"Total processed:  {stats['processed']}")
+    print(f"Successful:       {stats['successful']}")
+    print(f"Failed:           {stats['failed']}")
+    print(f"Poisoned:         {stats['poisoned']}")
+    print(f"Throughput:       {stats['products_per_second']} products/s")
+    print(f"Per worker:       {sorted(per_worker.values(), reverse=True)}")
+    print("=" * 60)
+    return stats
+
+
+# ---------- Calibration ----------
+def _encode_sample(task):
+    """Worker task for calibration: encode (name, image bytes) without touching Mongo"""
+    from PIL import Image
+
+    from embeddings import encode_product
+
+    name, payload = task
+    image = Image.open(BytesIO(payload)).convert("RGB")
+    encode_product(name, image)
+    return 1
+
+
+def _download_samples(collection, sample_size):
+    samples = []
+    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+    cursor = collection.find(
+        {"imageUrl": {"$nin": ["", None]}}, PROJECTION, batch_size=sample_size
+    ).limit(sample_size * 2)
+    for doc in cursor:
+        url = doc["imageUrl"]
+        if url.startswith("//"):
+            url = "https:" + url
+        try:
+            resp = requests.get(url, timeout=10, headers=headers)
+            resp.raise_for_status()
+        except Exception:
+            continue
+        samples.append((doc.get("productName", ""), resp.content))
+        if len(samples) >= sample_size:
+            break
+    return samples
+
+
+def calibrate(collection, sample_size=64, rounds=4):
+    """
+    Measure encode throughput for each workers x threads split of the cores
+    Images are downloaded once up front so only CPU inference is compared
+    """
+    cores = os.cpu_count() or 1
+    samples = _download_samples(collection, sample_size)
+    if not samples:
+        print("⚠️  No downloadable sample images - cannot calibrate")
+        return None
+    workload = samples * rounds
+
+    splits = []
+    workers = 1
+    while workers <= cores:
+        splits.append((workers, max(1, cores // workers)))
+        workers *= 2
+    if splits[-1][0] != cores:
+        splits.append((cores, 1))
+
+    print("=" * 60)
+    print(f"⏱️  CALIBRATING on {len(workload)} encodes ({cores} cores)")
+    print("=" * 60)
+    ctx = mp.get_context("spawn")
+    results = []
+    for workers, threads in splits:
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(threads, None)) as pool:
+            # Warm-up so model load time is not counted
+            pool.map(_encode_sample, samples[:workers])
+            started = time.time()
+            done = sum(pool.imap_unordered(_encode_sample, workload, chunksize=4))
+            elapsed = time.time() - started
+        rate = done / elapsed if elapsed else 0.0
+        results.append({"workers": workers, "threads": threads, "encodes_per_second": round(rate, 2)})
+        print(f"  {workers:>3} workers x {threads:>2} threads → {rate:7.2f} encodes/s")
+
+    best = max(results, key=lambda r: r["encodes_per_second"])
+    baseline = results[0]["encodes_per_second"] or 1.0
+    print("-" * 60)
+    print(
+        f"✅ Best split: --workers {best['workers']} --threads {best['threads']} "
+        f"({best['encodes_per_second'] / baseline:.1f}x vs single process)"
+    )
+    return {"cores": cores, "results": results, "best": best}
@@ -0,0 +1,262 @@
+"""
+Always-on embedding worker
+Keeps the CLIP model loaded and embeds new, re-scraped or stale products
+within seconds of them landing in MongoDB.
+
+Wake-ups come from a change stream on products (replica set / Atlas) or,
+on a standalone mongod, from polling a scrapedAt watermark. Work is claimed
+through the same lease queue as process_embeddings.py, so the daemon and
+manual runs never duplicate each other.
+
+Latency vs throughput: a batch is embedded as soon as --max-batch products
+are claimed or --max-wait-ms has passed since the first one was claimed.
+
+A batch that fails as a whole (model error, lost database connection) is
+logged, its claims are failed (counting an attempt, so a poison batch is
+eventually parked) or released, and the loop backs off and carries on;
+only a stop signal ends it.
+"""
+
+import argparse
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import PyMongoError
+
+from db_schema import ensure_product_indexes
+from embedding_ledger import RunProgress
+from embeddings import (
+    JOB_FIELD,
+    MODEL_NAME,
+    NEEDS_EMBEDDING_QUERY,
+    embedding_fields,
+    encode_batch,
+    fetch_image,
+    get_model,
+)
+from leases import LeaseQueue
+
+# MongoDB Connection
+client = MongoClient("mongodb://localhost:27017/")
+db = client["value_scout"]
+products_collection = db["products"]
+
+PROJECTION = {"_id": 1, "productName": 1, "imageUrl": 1, JOB_FIELD: 1}
+
+
+class EmbeddingWorker:
+    def __init__(self, collection, max_batch=16, max_wait_ms=2000, poll_seconds=5,
+                 sweep_seconds=60, download_threads=8, lease_seconds=300, max_attempts=5,
+                 error_backoff_seconds=1.0, error_backoff_max_seconds=60.0):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.poll_seconds = poll_seconds
+        self.sweep_seconds = sweep_seconds
+        self.error_backoff = error_backoff_seconds
+        self.error_backoff_max = error_backoff_max_seconds
+        self.queue = LeaseQueue(collection, NEEDS_EMBEDDING_QUERY, JOB_FIELD,
+                                lease_seconds=lease_seconds, max_attempts=max_attempts)
+        self.downloads = ThreadPoolExecutor(max_workers=download_threads)
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.watermark = datetime.utcnow()
+        self.mode = "starting"
+
+    # ---------- wake-up sources ----------
+    def _watch_changes(self):
+        """
+        Change stream thread: inserts, replaces and scraper upserts wake the main loop
+        (our own lease/embedding writes don't touch scrapedAt, so they are ignored)
+        """
+        pipeline = [{"$match": {"$or": [
+            {"operationType": {"$in": ["insert", "replace"]}},
+            {"updateDescription.updatedFields.scrapedAt": {"$exists": True}},
+            {"updateDescription.removedFields": "imageEmbedding"},
+        ]}}]
+        try:
+            with self.collection.watch(pipeline, max_await_time_ms=1000) as stream:
+                self.mode = "change-stream"
+                print("👀 Watching products via change stream")
+                while not self.stopping.is_set():
+                    if stream.try_next() is not None:
+                        self.wakeup.set()
+        except PyMongoError as e:
+            # Standalone mongod has no oplog - fall back to watermark polling
+            self.mode = "polling"
+            print(f"ℹ️  Change streams unavailable ({e.__class__.__name__}); polling every {self.poll_seconds}s")
+            self._poll_watermark()
+
+    def _poll_watermark(self):
+        """Wake when anything has been scraped since the last watermark"""
+        while not self.stopping.wait(self.poll_seconds):
+            try:
+                newest = self.collection.find_one(
+                    {"scrapedAt": {"$gt": self.watermark}}, {"scrapedAt": 1},
+                    sort=[("scrapedAt", -1)],
+                )
+            except PyMongoError as e:
+                print(f"   ⚠️  Watermark poll failed: {e}")
+                continue
+            if newest:
+                self.watermark = newest["scrapedAt"]
+                self.wakeup.set()
+
+    # ---------- batching ----------
+    def _collect_batch(self):
+        """Claim up to max_batch products, waiting at most max_wait after the first"""
+        batch = self.queue.claim(self.max_batch, PROJECTION)
+        if not batch:
+            return batch
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch and not self.stopping.is_set():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            self.wakeup.wait(remaining)
+            self.wakeup.clear()
+            batch += self.queue.claim(self.max_batch - len(batch), PROJECTION)
+        return batch
+
+    def _embed_batch(self, batch, progress):
+        started = time.time()
+        ops = []
+        failed = poisoned = 0
+
+        # Downloads are I/O bound - fetch the whole batch concurrently
+        urls = [doc.get("imageUrl") or "" for doc in batch]
+        fetched = list(self.downloads.map(
+            lambda url: fetch_image(url) if url else (None, "no image URL"), urls
+        ))
+
+        ready = []
+        for doc, (image, error) in zip(batch, fetched):
+            if image is None:
+                attempts = (doc.get(JOB_FIELD) or {}).get("attempts", 0)
+                update = self.queue.fail_update(attempts, error, permanent=not doc.get("imageUrl"))
+                ops.append(UpdateOne({"_id": doc["_id"], f"{JOB_FIELD}.owner": self.queue.owner}, update))
+                failed += 1
+                poisoned += update["$set"][f"{JOB_FIELD}.status"] == "poisoned"
+            else:
+                ready.append((doc, image))
+
+        if ready:
+            names = [doc.get("productName", "Unnamed Product") for doc, _ in ready]
+            image_vecs, text_vecs = encode_batch(names, [image for _, image in ready])
+            for (doc, image), image_vec, text_vec in zip(ready, image_vecs, text_vecs):
+                fields = embedding_fields(image_vec, text_vec, image)
+                ops.append(UpdateOne(*self.queue.complete_op(doc["_id"], fields)))
+
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+        self.queue.forget([doc["_id"] for doc in batch])
+        progress.record(successful=len(ready), failed=failed, poisoned=poisoned)
+        print(f"⚡ Embedded {len(ready)}/{len(batch)} in {time.time() - started:.2f}s | {progress.line()}")
+
+    def _fail_batch(self, batch, error, progress):
+        """
+        Hand back the claims of a batch that failed as a whole: claimed products
+        count an attempt (and back off, or are poisoned after max_attempts);
+        claims taken while collecting a batch that never arrived are released
+        """
+        held = list(self.queue.held)
+        try:
+            if batch:
+                ops = []
+                poisoned = 0
+                for doc in batch:
+                    attempts = (doc.get(JOB_FIELD) or {}).get("attempts", 0)
+                    update = self.queue.fail_update(attempts, error)
+                    ops.append(UpdateOne({"_id": doc["_id"], f"{JOB_FIELD}.owner": self.queue.owner}, update))
+                    poisoned += update["$set"][f"{JOB_FIELD}.status"] == "poisoned"
+                self.collection.bulk_write(ops, ordered=False)
+                progress.record(failed=len(batch), poisoned=poisoned)
+            held = [pid for pid in held if pid not in {doc["_id"] for doc in batch}]
+            self.queue.release(held)
+        except Exception as e:
+            # The leases expire on their own and the products are claimed again
+            print(f"   ⚠️  Could not hand back the claims: {e}")
+        finally:
+            self.queue.forget([doc["_id"] for doc in batch] + held)
+
+    # ---------- main loop ----------
+    def stop(self, *_):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def run(self):
+        print("=" * 60)
+        print(f"🤖 EMBEDDING WORKER ({MODEL_NAME}) - worker {self.queue.owner}")
+        print(f"   batch ≤ {self.max_batch} | max wait {self.max_wait * 1000:.0f} ms")
+        print("=" * 60)
+        get_model()
+
+        threading.Thread(target=self._watch_changes, name="embedding-watch", daemon=True).start()
+        progress = RunProgress(self.collection.database, self.queue.owner, total=0, mode="daemon")
+        last_sweep = 0.0
+        errors = 0
+
+        with self.queue.heartbeat():
+            try:
+                while not self.stopping.is_set():
+                    # Clear before claiming so a wake-up during the claim is not lost
+                    self.wakeup.clear()
+                    batch = []
+                    try:
+                        batch = self._collect_batch()
+                        if batch:
+                            progress.total += len(batch)
+                            self._embed_batch(batch, progress)
+                            errors = 0
+                            continue
+
+                        # Idle: sleep until woken, with a periodic sweep for retries coming due
+                        timeout = max(0.0, self.sweep_seconds - (time.time() - last_sweep))
+                        self.wakeup.wait(timeout)
+                        if time.time() - last_sweep >= self.sweep_seconds:
+                            last_sweep = time.time()
+                            self.queue.poison_exhausted()
+                    except Exception as e:
+                        errors += 1
+                        delay = min(self.error_backoff_max, self.error_backoff * 2 ** (errors - 1))
+                        print(f"❌ Batch of {len(batch)} failed ({e.__class__.__name__}: {e}); "
+                              f"retrying in {delay:.0f}s")
+                        self._fail_batch(batch, e, progress)
+                        self.stopping.wait(delay)
+            finally:
+                released = self.queue.release(list(self.queue.held))
+                progress.finish("stopped")
+                self.downloads.shutdown(wait=False)
+                print(f"\n🛑 Worker stopped ({self.mode}); released {released} claims")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-running embedding worker")
+    parser.add_argument("--max-batch", type=int, default=16,
+                        help="Embed as soon as this many products are claimed (default: 16)")
+    parser.add_argument("--max-wait-ms", type=int, default=2000,
+                        help="Max time to wait for a batch to fill after the first claim (default: 2000)")
+    parser.add_argument("--poll-seconds", type=float, default=5,
+                        help="Watermark poll interval when change streams are unavailable")
+    parser.add_argument("--sweep-seconds", type=float, default=60,
+                        help="Idle re-check for retries that came due (default: 60)")
+    parser.add_argument("--download-threads", type=int, default=8,
+                        help="Concurrent image downloads per batch")
+    args = parser.parse_args()
+
+    ensure_product_indexes(products_collection)
+    worker = EmbeddingWorker(
+        products_collection,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        poll_seconds=args.poll_seconds,
+        sweep_seconds=args.sweep_seconds,
+        download_threads=args.download_threads,
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
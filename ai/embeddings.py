@@ -0,0 +1,149 @@
+"""
+Shared CLIP embedding helpers
+Encodes products into separate image and text vectors (stored as-is) and
+fuses them on demand, so changing the fusion weights never needs a re-encode
+"""
+
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import requests
+from PIL import Image
+
+from image_hash import hash_hex, phash
+
+MODEL_NAME = "clip-ViT-B-32"
+# Bump when the encoder, preprocessing or stored vector layout changes
+MODEL_VERSION = "1"
+
+# Default fusion used for the stored styleEmbedding (kept for older readers)
+DEFAULT_FUSION = {"image": 0.7, "text": 0.3}
+
+# Every field written by the embedding pipeline (unset together on invalidation)
+EMBEDDING_FIELDS = [
+    "styleEmbedding",
+    "imageEmbedding",
+    "textEmbedding",
+    "embeddingModel",
+    "embeddingModelVersion",
+    "embeddedAt",
+    "imageHash",
+]
+
+# Products still missing the separately stored vectors
+# (embeddingModelVersion is set and unset together with them, and unlike the
+# vector arrays it can be indexed - see db_schema.py)
+PENDING_QUERY = {"embeddingModelVersion": None}
+
+# Pending plus anything embedded by a different model/version ($ne also matches a missing field)
+NEEDS_EMBEDDING_QUERY = {"$or": [
+    {"embeddingModelVersion": {"$ne": MODEL_VERSION}},
+    {"embeddingModel": {"$ne": MODEL_NAME}},
+]}
+
+# Lease sub-document used to share the embedding backlog between workers
+JOB_FIELD = "embeddingJob"
+
+_model = None
+
+
+def get_model():
+    """Load the CLIP model once per process"""
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+
+        print(f"🔄 Loading CLIP model ({MODEL_NAME})...")
+        _model = SentenceTransformer(MODEL_NAME)
+        print("✅ Model loaded successfully\n")
+    return _model
+
+
+def fetch_image(image_url, timeout=10):
+    """
+    Download image from URL and convert to RGB PIL Image
+    Returns (image, None) or (None, error message)
+    """
+    try:
+        # Handle protocol-relative URLs
+        if image_url.startswith("//"):
+            image_url = "https:" + image_url
+
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+        }
+        response = requests.get(image_url, timeout=timeout, headers=headers)
+        response.raise_for_status()
+
+        image = Image.open(BytesIO(response.content))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image, None
+    except Exception as e:
+        print(f"   ⚠️  Image download failed: {e}")
+        return None, f"image download failed: {e}"
+
+
+def download_image(image_url, timeout=10):
+    """Download image from URL and convert to RGB PIL Image (None on failure)"""
+    return fetch_image(image_url, timeout)[0]
+
+
+def encode_product(product_name, image):
+    """Return the raw (image_vector, text_vector) pair for one product"""
+    model = get_model()
+    image_vec = model.encode(image, convert_to_numpy=True)
+    text_vec = model.encode(product_name, convert_to_numpy=True)
+    return image_vec, text_vec
+
+
+def encode_batch(product_names, images, batch_size=32):
+    """Encode many products in one forward pass per modality -> two (n, d) arrays"""
+    model = get_model()
+    image_vecs = model.encode(images, batch_size=batch_size, convert_to_numpy=True)
+    text_vecs = model.encode(product_names, batch_size=batch_size, convert_to_numpy=True)
+    return image_vecs, text_vecs
+
+
+def fuse_vectors(image_vecs, text_vecs, weights=None):
+    """
+    Weighted sum of image and text vectors
+    Works on single vectors or (n, d) matrices
+    """
+    weights = weights or DEFAULT_FUSION
+    image_vecs = np.asarray(image_vecs, dtype=np.float32)
+    text_vecs = np.asarray(text_vecs, dtype=np.float32)
+    return image_vecs * weights["image"] + text_vecs * weights["text"]
+
+
+def embedding_fields(image_vec, text_vec, image=None):
+    """Build the $set document stored on a product (with the image's perceptual hash when given)"""
+    fields = {
+        "imageEmbedding": np.asarray(image_vec, dtype=np.float32).tolist(),
+        "textEmbedding": np.asarray(text_vec, dtype=np.float32).tolist(),
+        "styleEmbedding": fuse_vectors(image_vec, text_vec).tolist(),
+        "embeddingModel": MODEL_NAME,
+        "embeddingModelVersion": MODEL_VERSION,
+        "embeddedAt": datetime.utcnow(),
+    }
+    if image is not None:
+        # Near-duplicate detection across retailers (product_clusters.py)
+        fields["imageHash"] = hash_hex(phash(image))
+    return fields
+
+
+def generate_embeddings(product_name, image_url):
+    """
+    Download + encode one product
+    Returns (fields to $set, None) or (None, error message)
+    """
+    try:
+        image, error = fetch_image(image_url)
+        if image is None:
+            return None, error
+        image_vec, text_vec = encode_product(product_name, image)
+        return embedding_fields(image_vec, text_vec, image), None
+    except Exception as e:
+        print(f"   ❌ Embedding generation failed: {e}")
+        return None, f"embedding generation failed: {e}"
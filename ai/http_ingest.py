@@ -0,0 +1,237 @@
+"""
+Browser-free ingestion over plain HTTP
+Shopify stores (SuperKicks) publish a paginated product feed at
+<collection>/products.json - one request returns up to 250 products with
+title, handle, images and variant prices. Sites without a feed (or when the
+feed is unavailable) fall back to fetching the static listing HTML and
+reading cards with the same card spec as the browser scrapers.
+
+Both paths produce raw card records, so documents go through the site's
+usual parser and ProductWriter and come out identical to a Playwright crawl.
+
+    python http_ingest.py --site SuperKicks
+    python http_ingest.py --site VegNonVeg --mode html
+    python http_ingest.py --site SuperKicks --base-url http://127.0.0.1:8765
+"""
+
+import argparse
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crawl_state import CrawlState, run_scope
+from crawl_telemetry import ITEMS, PAGES, Attempts, CrawlTelemetry
+from ingest import ProductWriter
+from politeness import PolitenessScheduler, Throttled, TransientError, check_status
+from scrape_sites import MAX_EMPTY_PAGES, MAX_FAILED_PAGES, SITES, USER_AGENT, build_docs, domain_of, fetch_base, listing_url
+from static_html import extract_cards_html
+
+# Shopify caps products.json at 250 per page
+JSON_PAGE_LIMIT = 250
+
+# Feed and static HTML requests are cheap for the server; start faster than a browser crawl
+HTTP_POLICY = {"rate": 1.8}
+
+
+def make_session(pool_size=8):
+    """
+    Keep-alive session with a connection pool
+    Retries/backoff on 429/5xx are left to the politeness scheduler, so the
+    domain's rate adapts to them
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "en-IN,en;q=0.9"})
+    return session
+
+
+def feed_url(site, query, page_num, base_url=None):
+    base = (base_url or site["base_url"]).rstrip("/")
+    return f"{base}/{query}/products.json?limit={JSON_PAGE_LIMIT}&page={page_num}"
+
+
+def shopify_records(payload):
+    """products.json -> raw card records with the HTML card fields (name, href, img, price)"""
+    records = []
+    for product in payload.get("products") or []:
+        variants = product.get("variants") or []
+        # Lowest price among in-stock variants (all variants if none are flagged available)
+        priced = [v for v in variants if v.get("available", True)] or variants
+        prices = [float(v["price"]) for v in priced if v.get("price")]
+        images = product.get("images") or []
+        records.append({
+            "name": product.get("title") or "",
+            "href": f"/products/{product.get('handle')}" if product.get("handle") else "",
+            "img": images[0].get("src", "") if images else "",
+            "price": str(int(min(prices))) if prices else "0",
+        })
+    return records
+
+
+class HttpIngest:
+    def __init__(self, session=None, base_url=None, mode="auto", scheduler=None, verbosity=0):
+        self.session = session or make_session()
+        self.base_url = base_url
+        self.mode = mode
+        self.scheduler = scheduler or PolitenessScheduler(HTTP_POLICY)
+        self.verbosity = verbosity
+        self.telemetry = None
+        self.stats = {}
+
+    def _get(self, site, url, stats):
+        """GET through the domain's rate limit; 429/5xx are retried with backoff (counted in stats)"""
+
+        def fetch():
+            started = time.time()
+            resp = self.session.get(url, timeout=30)
+            elapsed = time.time() - started
+            stats["requests"] += 1
+            stats["bytes"] += len(resp.content)
+            stats["seconds"] += elapsed
+            check_status(resp.status_code, resp.headers.get("Retry-After"))
+            if self.telemetry is not None:
+                self.telemetry.site(site["label"]).observe_load(elapsed)
+            return resp
+
+        fetch = Attempts(fetch)
+        try:
+            return self.scheduler.call(domain_of(site["base_url"]), fetch)
+        finally:
+            stats["retries"] = stats.get("retries", 0) + fetch.retries
+
+    def _read(self, site, parse):
+        """parse() -> raw card records, timed as the site's extraction"""
+        started = time.perf_counter()
+        records = parse()
+        self.telemetry.site(site["label"]).observe_extract(time.perf_counter() - started)
+        return records
+
+    def _save(self, site, query, page_num, records, seen, writer, stats, retries):
+        errors = []
+        docs = build_docs(site, records, seen, errors)
+        added = 0
+        for doc in docs:
+            if writer.add(doc):
+                added += 1
+                self.telemetry.say(ITEMS, f"  ✓ [{site['label']}] {doc['productName'][:50]}")
+        stats["products"] += added
+        self.telemetry.page(site["label"], query, page_num, len(records), added, len(docs) - added,
+                            len(errors), retries)
+        return added
+
+    def crawl_feed(self, site, query, writer, stats, cursor):
+        """Walk products.json pages; returns False if the store has no usable feed"""
+        seen = set()
+        base = fetch_base(site, self.base_url)
+        query_added = cursor["added"]
+        page_num = cursor["page"]
+        for page_num in range(cursor["page"] + 1, site["max_pages"] + 1):
+            retries = stats["retries"]
+            try:
+                resp = self._get(site, feed_url(site, query, page_num, base), stats)
+                resp.raise_for_status()
+                records = self._read(site, lambda: shopify_records(resp.json()))
+            except (requests.RequestException, Throttled, TransientError, ValueError) as e:
+                if page_num == 1:
+                    print(f"  ℹ️  No product feed for {site['label']} ({e.__class__.__name__}) - using HTML")
+                    return False
+                self.telemetry.page_failed(site["label"], query, page_num, e, stats["retries"] - retries)
+                writer.mark_partial(site["source"])
+                break
+            if not records:
+                break
+            added = self._save(site, query, page_num, records, seen, writer, stats, stats["retries"] - retries)
+            query_added += added
+            writer.page_done(site["label"], query, page_num, 0, query_added)
+            self.telemetry.say(PAGES, f"➡ [{site['label']}] feed page {page_num}: {len(records)} products, +{added}")
+        writer.page_done(site["label"], query, page_num, 0, query_added, done=True)
+        return True
+
+    def crawl_html(self, site, query, writer, stats, cursor):
+        seen = set() if site["dedupe_urls"] else None
+        base = fetch_base(site, self.base_url)
+        empty_pages = cursor["empty_pages"]
+        query_added = cursor["added"]
+        page_num = cursor["page"]
+        failed_pages = 0
+        for page_num in range(cursor["page"] + 1, site["max_pages"] + 1):
+            retries = stats["retries"]
+            try:
+                resp = self._get(site, listing_url(site, query, page_num, base), stats)
+                resp.raise_for_status()
+            except (requests.RequestException, Throttled, TransientError) as e:
+                # Failed loads don't count as empty pages, but a run of them ends the listing
+                self.telemetry.page_failed(site["label"], query, page_num, e, stats["retries"] - retries)
+                failed_pages += 1
+                if failed_pages >= MAX_FAILED_PAGES or self.scheduler.is_open(domain_of(site["base_url"])):
+                    print(f"  🛑 [{site['label']}] {query}: giving up after {failed_pages} failed pages in a row")
+                    writer.mark_partial(site["source"])
+                    break
+                writer.page_done(site["label"], query, page_num, empty_pages, query_added)
+                continue
+            failed_pages = 0
+            records = self._read(site, lambda: extract_cards_html(resp.text, site["card"]))
+            added = self._save(site, query, page_num, records, seen, writer, stats, stats["retries"] - retries)
+            query_added += added
+            self.telemetry.say(PAGES, f"➡ [{site['label']}] html page {page_num}: {len(records)} cards, +{added}")
+            if added:
+                empty_pages = 0
+            else:
+                empty_pages += 1
+                if empty_pages >= MAX_EMPTY_PAGES:
+                    break
+            writer.page_done(site["label"], query, page_num, empty_pages, query_added)
+        writer.page_done(site["label"], query, page_num, empty_pages, query_added, done=True)
+
+    def ingest_site(self, site, writer):
+        stats = self.stats[site["label"]] = {"requests": 0, "bytes": 0, "seconds": 0.0, "retries": 0, "products": 0}
+        started = time.time()
+        for query in site["queries"]:
+            cursor = writer.state.cursor(site["label"], query)
+            if cursor["done"]:
+                continue
+            use_feed = self.mode == "json" or (self.mode == "auto" and site.get("shopify"))
+            if not (use_feed and self.crawl_feed(site, query, writer, stats, cursor)):
+                self.crawl_html(site, query, writer, stats, cursor)
+        stats["wall_seconds"] = round(time.time() - started, 2)
+        print(
+            f"✅ {site['label']}: {stats['products']} products | {stats['requests']} requests, "
+            f"{stats['bytes'] / 1024:.0f} KB, {stats['wall_seconds']}s"
+        )
+        return stats["products"]
+
+    def run(self, sites, state=None):
+        """Ingest sites one after another; an unfinished crawl run is resumed"""
+        if state is None:
+            state = CrawlState()
+            state.start_run("http", scope=run_scope([site["label"] for site in sites]))
+        writer = ProductWriter(state=state)
+        self.telemetry = CrawlTelemetry(state.run_id, "http", self.verbosity)
+        try:
+            res = {site["label"]: self.ingest_site(site, writer) for site in sites}
+        finally:
+            writer.flush()
+            writer.summary()
+            self.scheduler.print_summary()
+            self.session.close()
+        state.finish_run("completed", writer.counts)
+        self.telemetry.save_report(writer=writer, scheduler=self.scheduler, requests=self.stats)
+        return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest store listings over HTTP (no browser)")
+    parser.add_argument("--site", action="append", choices=list(SITES),
+                        help="Site to ingest (repeatable; default: Shopify stores)")
+    parser.add_argument("--mode", choices=["auto", "json", "html"], default="auto",
+                        help="auto: products.json for Shopify stores, static HTML otherwise")
+    parser.add_argument("--base-url", help="Stand-in server root (sites served under /<site>)")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="-v: a line per page, -vv: a line per product (default: periodic summaries)")
+    args = parser.parse_args()
+
+    labels = args.site or [label for label, site in SITES.items() if site.get("shopify")]
+    HttpIngest(base_url=args.base_url, mode=args.mode, verbosity=args.verbose).run([SITES[label] for label in labels])
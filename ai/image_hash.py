@@ -0,0 +1,90 @@
+"""
+Perceptual image hashes and a BK-tree for Hamming-radius lookups
+pHash: the image in greyscale at 32x32, its 2-D DCT, and the 8x8 lowest
+frequencies compared with their median -> 64 bits. Resized, re-encoded or
+re-compressed copies of one product photo stay a few bits apart, so
+"same photo at another retailer" is a Hamming-radius query.
+
+The BK-tree only visits subtrees whose edge distance can still hold a match
+(triangle inequality), so a small-radius lookup touches a fraction of the
+hashes instead of all of them.
+"""
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+# The DCT runs on HASH_SIZE * HIGHFREQ_FACTOR pixels per side
+HIGHFREQ_FACTOR = 4
+
+
+def _dct_rows(n, rows):
+    """First `rows` rows of the orthonormal DCT-II matrix of size n"""
+    k = np.arange(rows)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+# Only the lowest frequencies are kept, so two small matrix products replace a full 2-D DCT
+_DCT = _dct_rows(HASH_SIZE * HIGHFREQ_FACTOR, HASH_SIZE)
+
+
+def phash(image):
+    """64-bit perceptual hash of a PIL image, as an int"""
+    size = HASH_SIZE * HIGHFREQ_FACTOR
+    pixels = np.asarray(image.convert("L").resize((size, size), Image.Resampling.LANCZOS), dtype=np.float64)
+    low = _DCT @ pixels @ _DCT.T
+    bits = (low > np.median(low)).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hash_hex(value):
+    """Stored form (Mongo integers are signed 64-bit)"""
+    return f"{value:016x}"
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over distinct hashes; a node is (hash, {distance: child})"""
+
+    def __init__(self, hashes=()):
+        self.root = None
+        self.size = 0
+        for value in hashes:
+            self.add(value)
+
+    def add(self, value):
+        if self.root is None:
+            self.root = (value, {})
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = (value, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, value, radius):
+        """[(hash, distance)] of every stored hash within `radius` bits of value"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_value, children = stack.pop()
+            d = hamming(value, node_value)
+            if d <= radius:
+                found.append((node_value, d))
+            for edge, child in children.items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return found
@@ -0,0 +1,292 @@
+"""
+Product ingest shared by every scraper (browser-based or HTTP)
+MongoDB connection and the buffered product writer (crawl progress is kept
+in crawl_state.py).
+
+Every product carries a contentFingerprint over the fields the embedding is
+computed from (imageUrl, productName). A re-scrape only drops the stored
+embedding (and marks the detail page for re-enrichment) when that fingerprint
+changes; price/scrapedAt refreshes keep it. Prices are appended to the
+bucketed price_history collection (price_history.py) in the same flush.
+
+Products also carry a canonicalUrl (canonical_urls.py): a product already
+stored under another id with the same canonical URL is written to that
+document instead of a second one.
+
+The catalog is never wiped: each write stamps lastSeenRun (and the listing
+page that showed the product), and products the crawl of their source no
+longer finds for DELIST_AFTER_RUNS runs are flagged delisted (and come back
+as soon as they are seen again). A listing that stopped early only vouches
+for the pages it crawled.
+"""
+
+import hashlib
+from datetime import datetime
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from canonical_urls import canonical_url
+from db_schema import ensure_product_indexes
+from embeddings import EMBEDDING_FIELDS, JOB_FIELD
+from price_history import PriceHistory, price_value
+
+# MongoDB
+client = MongoClient("mongodb://127.0.0.1:27017")
+db = client["value_scout"]
+products = db["products"]
+
+# Fields the embedding depends on
+FINGERPRINT_FIELDS = ("imageUrl", "productName")
+
+# Complete crawls of a source that may miss a product before it is delisted
+DELIST_AFTER_RUNS = 3
+
+
+def content_fingerprint(doc):
+    payload = "\x1f".join(str(doc.get(f) or "") for f in FINGERPRINT_FIELDS)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ProductWriter:
+    """
+    Buffers scraped products and writes them as unordered bulk upserts
+    Before each write the stored fingerprints of the batch (and any product
+    already stored under one of its canonical URLs) are read in one query;
+    only products whose fingerprint changed get their embedding
+    (and embedding lease state) unset. With a CrawlState, written ids and the
+    listing cursors they complete are recorded after every bulk write, and
+    the batch's price observations are appended to the price history with
+    one more bulk write
+    """
+
+    INVALIDATE = {**{f: "" for f in EMBEDDING_FIELDS}, JOB_FIELD: ""}
+    # Changed products get their detail page re-read (detail_enrich.py); the old details stay until then
+    DETAIL_STALE = {"enrichedAt": ""}
+    # A category moved by verify_categories.py sticks until the content changes (then it is re-checked)
+    CATEGORY_STALE = {"categoryOverride": "", "categoryCheck": ""}
+    RELIST = {"delisted": "", "delistedAt": "", "missedRuns": ""}
+
+    def __init__(self, collection=None, state=None, batch_size=200, history=None):
+        self.collection = collection if collection is not None else products
+        self.state = state
+        # Price observations live next to the products they belong to
+        self.history = history if history is not None else PriceHistory(self.collection.database["price_history"])
+        ensure_product_indexes(self.collection)
+        self.batch_size = batch_size
+        self.buffer = {}
+        self.cursors = {}
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0, "merged": 0, "duplicates": 0}
+        self.by_source = {}
+        # Sources not to sweep at all in this run (e.g. a listing given up after failed pages)
+        self.partial = set()
+        # {source: {query: last page crawled, None if the listing was crawled to its end}}
+        self.listings = {}
+
+    def known(self, ids, this_run=False):
+        """
+        Ids already in the catalog before this run (one query per listing page)
+        this_run=True: only those already written in this crawl run, by any worker
+        """
+        if not ids:
+            return set()
+        query = {"_id": {"$in": list(ids)}}
+        run_id = self.state.run_id if self.state is not None else None
+        if this_run:
+            query["lastSeenRun"] = run_id
+            return {d["_id"] for d in self.collection.find(query, {"_id": 1})}
+        if run_id:
+            query["lastSeenRun"] = {"$ne": run_id}
+        # Queued (not yet written) products of this run are not catalogued before it either
+        return {d["_id"] for d in self.collection.find(query, {"_id": 1})} - set(self.buffer)
+
+    def mark_partial(self, source):
+        """The crawl of this source is not trustworthy (failed pages, blocked domain); skip it when delisting"""
+        self.partial.add(source)
+
+    def listing_done(self, source, query, last_page=None):
+        """
+        A listing ended: crawled to its end (last_page None), or stopped early after
+        last_page (target, known streak, page cap), in which case delisting only
+        covers products it last showed on pages up to last_page
+        """
+        self.listings.setdefault(source, {})[query] = last_page
+
+    def add(self, doc, query=None, page=None):
+        """
+        Queue a product; False if it was already written (or queued) in this run
+        query/page: the listing page that showed it (stored as `listing` for delisting)
+        """
+        pid = doc["_id"]
+        if pid in self.buffer or (self.state is not None and self.state.is_seen(pid)):
+            return False
+        if query is not None:
+            doc["listing"] = {"query": query, "page": page}
+        self.buffer[pid] = doc
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        return True
+
+    def page_done(self, site, query, page, empty_pages, added, done=False):
+        """Advance a listing cursor once everything on the page has been written"""
+        self.cursors[(site, query)] = {"page": page, "empty_pages": empty_pages, "added": added, "done": done}
+        if not self.buffer:
+            self._commit([])
+
+    def _commit(self, ids):
+        if self.state is not None and (ids or self.cursors):
+            self.state.commit(ids, self.cursors)
+        self.cursors = {}
+
+    def _count(self, doc, kind):
+        self.counts[kind] += 1
+        source = self.by_source.setdefault(doc.get("source"), {"new": 0, "changed": 0, "unchanged": 0})
+        source[kind] += 1
+
+    def flush(self):
+        if not self.buffer:
+            self._commit([])
+            return
+        batch, self.buffer = self.buffer, {}
+        for doc in batch.values():
+            if doc.get("productUrl"):
+                doc["canonicalUrl"] = canonical_url(doc["productUrl"])
+        urls = [doc["canonicalUrl"] for doc in batch.values() if doc.get("canonicalUrl")]
+
+        stored, overrides, prices, owners = {}, {}, {}, {}
+        for d in self.collection.find(
+            # $type repeats the unique index's partial filter, which the planner needs to use it
+            {"$or": [{"_id": {"$in": list(batch)}}, {"canonicalUrl": {"$in": urls, "$type": "string"}}]},
+            {"contentFingerprint": 1, "categoryOverride": 1, "price": 1, "priceObservedAt": 1, "canonicalUrl": 1,
+             **{f: 1 for f in FINGERPRINT_FIELDS}},
+        ):
+            stored[d["_id"]] = d.get("contentFingerprint") or content_fingerprint(d)
+            if d.get("categoryOverride"):
+                overrides[d["_id"]] = d["categoryOverride"]
+            prices[d["_id"]] = (price_value(d.get("price")), d.get("priceObservedAt"))
+            if d.get("canonicalUrl"):
+                owners.setdefault(d["canonicalUrl"], d["_id"])
+
+        ops, pids, observations = [], [], []
+        now = datetime.utcnow()
+        run_id = self.state.run_id if self.state is not None else None
+        for pid, doc in self._resolve(batch, stored, owners).items():
+            doc["contentFingerprint"] = content_fingerprint(doc)
+            if run_id:
+                doc["lastSeenRun"] = run_id
+            # At most one observation per product per day unless the price moves
+            price = price_value(doc.get("price"))
+            old_price, observed_at = prices.get(pid, (None, None))
+            if price and (price != old_price or observed_at is None or observed_at.date() < now.date()):
+                observations.append((pid, price))
+                doc["priceObservedAt"] = now
+            update = {"$set": doc, "$unset": dict(self.RELIST)}
+            if pid not in stored:
+                self._count(doc, "new")
+            elif stored[pid] == doc["contentFingerprint"]:
+                self._count(doc, "unchanged")
+                if pid in overrides:
+                    doc["category"] = overrides[pid]
+            else:
+                self._count(doc, "changed")
+                update["$unset"].update(self.INVALIDATE)
+                update["$unset"].update(self.DETAIL_STALE)
+                update["$unset"].update(self.CATEGORY_STALE)
+            ops.append(UpdateOne({"_id": pid}, update, upsert=True))
+            pids.append(pid)
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Another worker inserted the same canonical URL under a different id first
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+            self.counts["duplicates"] += len(errors)
+            # Those products were not written, so their prices have no product to belong to
+            dropped = {pids[err["index"]] for err in errors}
+            observations = [(pid, price) for pid, price in observations if pid not in dropped]
+        self.history.record(observations, now)
+        self._commit(list(batch))
+
+    def _resolve(self, batch, stored, owners):
+        """
+        {id to write: doc}: products not stored under their own id go to the
+        stored (or earlier queued) product with the same canonical URL
+        """
+        writes, claimed = {}, dict(owners)
+        for pid, doc in batch.items():
+            if pid in stored and doc.get("canonicalUrl"):
+                claimed.setdefault(doc["canonicalUrl"], pid)
+        for pid, doc in batch.items():
+            target = pid
+            url = doc.get("canonicalUrl")
+            if pid not in stored and url:
+                target = claimed.setdefault(url, pid)
+            if target in writes:
+                self.counts["merged"] += 1
+                continue
+            if target != pid:
+                self.counts["merged"] += 1
+                doc["_id"] = target
+            writes[target] = doc
+        return writes
+
+    def _sweep_scope(self, source):
+        """Filter of the products of a source this run should have seen"""
+        listings = self.listings.get(source)
+        if not listings or all(page is None for page in listings.values()):
+            return {"source": source}
+        shown = [
+            {"listing.query": query} if page is None else {"listing.query": query, "listing.page": {"$lte": page}}
+            for query, page in listings.items() if page != 0
+        ]
+        return {"source": source, "$or": shown} if shown else None
+
+    def sweep_delisted(self, after_runs=DELIST_AFTER_RUNS):
+        """
+        After a fresh, finished crawl run: count a missed run for every product of
+        a crawled source that this run did not see, and flag products missed for
+        `after_runs` runs as delisted. A listing that stopped early (target, known
+        streak) only covers the pages it crawled: products it last showed further
+        down are left alone. Sources marked partial (and sources that produced
+        nothing, e.g. a broken scraper) are not swept
+        """
+        run_id = self.state.run_id if self.state is not None else None
+        if self.state is not None and self.state.resumed:
+            # Which listings stopped early before the crash is not known; the next fresh run sweeps
+            print("🗂️  Delisting skipped (resumed crawl run)")
+            return {"missed": 0, "delisted": 0, "sources": []}
+        scopes = {}
+        for source in sorted(s for s in self.by_source if s and s not in self.partial):
+            scope = self._sweep_scope(source)
+            if scope is not None:
+                scopes[source] = scope
+        if not run_id or not scopes:
+            print("🗂️  Delisting skipped (no crawled sources)")
+            return {"missed": 0, "delisted": 0, "sources": []}
+        scope = {"$or": list(scopes.values()), "delisted": {"$ne": True}}
+        missed = self.collection.update_many(
+            {**scope, "lastSeenRun": {"$ne": run_id}}, {"$inc": {"missedRuns": 1}}
+        ).modified_count
+        delisted = self.collection.update_many(
+            {**scope, "missedRuns": {"$gte": after_runs}},
+            {"$set": {"delisted": True, "delistedAt": datetime.utcnow()}},
+        ).modified_count
+        sources = list(scopes)
+        print(f"🗂️  {missed} products missing from {', '.join(sources)}; "
+              f"{delisted} delisted after {after_runs} runs")
+        if self.partial:
+            print(f"   not swept (crawled partially): {', '.join(sorted(self.partial))}")
+        return {"missed": missed, "delisted": delisted, "sources": sources}
+
+    def line(self):
+        c = self.counts
+        line = f"🧾 new {c['new']} | changed {c['changed']} (re-embed) | unchanged {c['unchanged']}"
+        if c["merged"] or c["duplicates"]:
+            line += f" | merged {c['merged']} by URL, {c['duplicates']} duplicates dropped"
+        return line
+
+    def summary(self):
+        print(self.line())
+        for source, c in sorted(self.by_source.items(), key=lambda kv: str(kv[0])):
+            print(f"   {source}: new {c['new']} | changed {c['changed']} | unchanged {c['unchanged']}")
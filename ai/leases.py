@@ -0,0 +1,240 @@
+"""
+Mongo-backed work leases
+Workers atomically claim batches of documents with a tokenised update_many, keep their claims
+alive with heartbeats, and release them on success or failure. Documents that
+keep failing are marked poisoned after max_attempts and never claimed again.
+
+Lease state lives in one sub-document per job type, e.g. products.embeddingJob:
+    {owner, token, claimedAt, expiresAt, attempts, lastError, failedAt, nextRetryAt, status}
+This doubles as the per-document failure ledger: failed documents are not
+claimable again until nextRetryAt, which backs off exponentially per attempt.
+"""
+
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+def make_worker_id():
+    """Unique, human-readable lease owner id (host:pid:random)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaseQueue:
+    """Cooperative work queue over any collection + pending filter"""
+
+    def __init__(self, collection, pending_query, field, lease_seconds=300,
+                 max_attempts=5, sort=None, owner=None,
+                 retry_base_seconds=1800, retry_max_seconds=86400):
+        self.collection = collection
+        self.pending_query = pending_query
+        self.field = field
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.sort = sort or [("_id", 1)]
+        self.owner = owner or make_worker_id()
+        self.held = set()
+        self._held_lock = threading.Lock()
+
+    def _f(self, name):
+        return f"{self.field}.{name}"
+
+    def claimable_query(self, now=None):
+        now = now or datetime.utcnow()
+        return {"$and": [
+            self.pending_query,
+            {self._f("status"): {"$ne": "poisoned"}},
+            {"$or": [
+                {self._f("attempts"): {"$exists": False}},
+                {self._f("attempts"): {"$lt": self.max_attempts}},
+            ]},
+            {"$or": [
+                {self._f("expiresAt"): {"$exists": False}},
+                {self._f("expiresAt"): {"$lt": now}},
+            ]},
+            {"$or": [
+                {self._f("nextRetryAt"): {"$exists": False}},
+                {self._f("nextRetryAt"): {"$lte": now}},
+            ]},
+        ]}
+
+    def poison_exhausted(self, scope=None):
+        """
+        Mark expired leases that already used every attempt as poisoned
+        (documents that crashed their worker instead of failing cleanly)
+        scope: extra filter, e.g. one crawl run's documents of a shared collection
+        """
+        res = self.collection.update_many(
+            {
+                **(scope or {}),
+                self._f("status"): {"$ne": "poisoned"},
+                self._f("attempts"): {"$gte": self.max_attempts},
+                self._f("expiresAt"): {"$lt": datetime.utcnow()},
+            },
+            {
+                "$set": {self._f("status"): "poisoned", self._f("lastError"): "lease expired on final attempt"},
+                "$unset": {self._f("owner"): "", self._f("expiresAt"): ""},
+            },
+        )
+        return res.modified_count
+
+    def count_claimable(self):
+        return self.collection.count_documents(self.claimable_query())
+
+    def count_poisoned(self):
+        return self.collection.count_documents({
+            "$and": [self.pending_query, {self._f("status"): "poisoned"}]
+        })
+
+    def count_waiting(self):
+        """Failed documents still backing off (e.g. known-dead image URLs)"""
+        return self.collection.count_documents({
+            "$and": [self.pending_query, {self._f("nextRetryAt"): {"$gt": datetime.utcnow()}}]
+        })
+
+    def retry_delay(self, attempts):
+        """Exponential backoff: base, 2x base, 4x base ... capped at retry_max_seconds"""
+        exponent = max((attempts or 1) - 1, 0)
+        return min(self.retry_base_seconds * (2 ** exponent), self.retry_max_seconds)
+
+    def claim(self, batch_size, projection=None, max_rounds=5):
+        """
+        Atomically claim up to batch_size documents for this owner
+        One round = read candidate ids, update_many them with a claim token
+        (each document only flips if it is still claimable), then fetch the
+        documents carrying our token - three round trips per batch instead of
+        one find_one_and_update per document. Workers racing for the same
+        candidates simply retry on the next ids.
+        """
+        claimed = []
+        for _ in range(max_rounds):
+            want = batch_size - len(claimed)
+            if want <= 0:
+                break
+            now = datetime.utcnow()
+            claimable = self.claimable_query(now)
+            ids = [d["_id"] for d in self.collection.find(claimable, {"_id": 1}, sort=self.sort, limit=want)]
+            if not ids:
+                break
+            token = uuid.uuid4().hex
+            self.collection.update_many(
+                {"$and": [claimable, {"_id": {"$in": ids}}]},
+                {
+                    "$set": {
+                        self._f("owner"): self.owner,
+                        self._f("token"): token,
+                        self._f("claimedAt"): now,
+                        self._f("expiresAt"): now + timedelta(seconds=self.lease_seconds),
+                        self._f("status"): "leased",
+                    },
+                    "$inc": {self._f("attempts"): 1},
+                },
+            )
+            won = list(self.collection.find({self._f("token"): token}, projection, sort=self.sort))
+            claimed.extend(won)
+            if len(ids) < want:
+                # Backlog exhausted for now
+                break
+        with self._held_lock:
+            self.held.update(d["_id"] for d in claimed)
+        return claimed
+
+    def forget(self, ids):
+        with self._held_lock:
+            self.held.difference_update(ids)
+
+    def heartbeat_once(self):
+        """Extend every lease this owner still holds; returns how many were extended"""
+        with self._held_lock:
+            ids = list(self.held)
+        if not ids:
+            return 0
+        res = self.collection.update_many(
+            {"_id": {"$in": ids}, self._f("owner"): self.owner},
+            {"$set": {self._f("expiresAt"): datetime.utcnow() + timedelta(seconds=self.lease_seconds)}},
+        )
+        return res.modified_count
+
+    @contextmanager
+    def heartbeat(self, interval=None):
+        """Background thread that keeps held leases alive while the block runs"""
+        interval = interval or max(1.0, self.lease_seconds / 3)
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    self.heartbeat_once()
+                except Exception as e:
+                    print(f"   ⚠️  Lease heartbeat failed: {e}")
+
+        thread = threading.Thread(target=beat, name="lease-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join(timeout=interval)
+
+    def complete_op(self, doc_id, fields):
+        """Filter + update that stores results and drops the lease (for bulk_write)"""
+        return (
+            {"_id": doc_id, self._f("owner"): self.owner},
+            {"$set": fields, "$unset": {self.field: ""}},
+        )
+
+    def complete(self, doc_id, fields):
+        """Store results and release; False if the lease was lost to another worker"""
+        flt, update = self.complete_op(doc_id, fields)
+        res = self.collection.update_one(flt, update)
+        self.forget([doc_id])
+        return res.matched_count == 1
+
+    def fail_update(self, attempts, error, permanent=False):
+        """
+        Update releasing a failed lease, poisoning it after max_attempts
+        Otherwise the document is skipped until nextRetryAt (exponential backoff)
+        """
+        now = datetime.utcnow()
+        poisoned = permanent or (attempts or 0) >= self.max_attempts
+        update = {
+            "$set": {
+                self._f("status"): "poisoned" if poisoned else "failed",
+                self._f("lastError"): str(error)[:500],
+                self._f("failedAt"): now,
+            },
+            "$unset": {self._f("owner"): "", self._f("expiresAt"): ""},
+        }
+        if poisoned:
+            update["$unset"][self._f("nextRetryAt")] = ""
+        else:
+            update["$set"][self._f("nextRetryAt")] = now + timedelta(seconds=self.retry_delay(attempts))
+        return update
+
+    def fail(self, doc, error, permanent=False):
+        """Release a claimed document after a failure; returns True if it is now poisoned"""
+        attempts = (doc.get(self.field) or {}).get("attempts", 0)
+        update = self.fail_update(attempts, error, permanent)
+        self.collection.update_one({"_id": doc["_id"], self._f("owner"): self.owner}, update)
+        self.forget([doc["_id"]])
+        return update["$set"][self._f("status")] == "poisoned"
+
+    def release(self, ids):
+        """Hand claims back untouched (e.g. on shutdown) without counting an attempt"""
+        if not ids:
+            return 0
+        res = self.collection.update_many(
+            {"_id": {"$in": list(ids)}, self._f("owner"): self.owner},
+            {
+                "$unset": {self._f("owner"): "", self._f("expiresAt"): ""},
+                "$inc": {self._f("attempts"): -1},
+                "$set": {self._f("status"): "released"},
+            },
+        )
+        self.forget(ids)
+        return res.modified_count
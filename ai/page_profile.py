@@ -0,0 +1,226 @@
+"""
+Page load profiles for the scrapers
+"light" (default) runs headless and aborts requests for images, media, fonts
+and third-party trackers - listings only need the card markup and the img
+src attribute, not the pixels. "full" is the old behaviour: headed browser,
+everything downloaded.
+
+Every scraped page gets a PageMeter that counts transferred bytes (from
+Content-Length, so chunked responses are undercounted equally in both
+profiles), requests and blocked requests; LoadStats aggregates them per site.
+
+    python page_profile.py --site Nike --pages 3     # full vs light on the same pages
+"""
+
+import argparse
+import time
+
+from politeness import check_status
+
+PROFILES = {
+    "full": {"headless": False, "block": False},
+    "light": {"headless": True, "block": True},
+}
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+# Analytics / ads / session replay hosts seen on the scraped sites
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "branch.io",
+    "moengage.com",
+    "criteo.com",
+    "bing.com/bat",
+    "newrelic.com",
+    "nr-data.net",
+    "sentry.io",
+)
+
+
+def is_tracker(url: str) -> bool:
+    return any(host in url for host in TRACKER_HOSTS)
+
+
+class PageMeter:
+    """Request accounting (and optional blocking) for one page"""
+
+    def __init__(self, block):
+        self.block = block
+        self.reset()
+
+    def reset(self):
+        self.bytes = 0
+        self.requests = 0
+        self.blocked = 0
+
+    def should_block(self, request):
+        return self.block and (request.resource_type in BLOCKED_RESOURCE_TYPES or is_tracker(request.url))
+
+    def on_response(self, response):
+        self.requests += 1
+        self.bytes += int(response.headers.get("content-length") or 0)
+
+    def route(self, route):
+        if self.should_block(route.request):
+            self.blocked += 1
+            route.abort()
+        else:
+            route.continue_()
+
+    async def route_async(self, route):
+        if self.should_block(route.request):
+            self.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+
+def attach(page, profile="light"):
+    meter = PageMeter(PROFILES[profile]["block"])
+    if meter.block:
+        page.route("**/*", meter.route)
+    page.on("response", meter.on_response)
+    return meter
+
+
+async def attach_async(page, profile="light"):
+    meter = PageMeter(PROFILES[profile]["block"])
+    if meter.block:
+        await page.route("**/*", meter.route_async)
+    page.on("response", meter.on_response)
+    return meter
+
+
+def goto(page, url, wait_until="load"):
+    """page.goto that raises Throttled/TransientError on 429/5xx for the politeness scheduler"""
+    response = page.goto(url, timeout=90000, wait_until=wait_until)
+    if response is not None:
+        check_status(response.status, response.headers.get("retry-after"))
+    return response
+
+
+async def goto_async(page, url, wait_until="load"):
+    response = await page.goto(url, timeout=90000, wait_until=wait_until)
+    if response is not None:
+        check_status(response.status, response.headers.get("retry-after"))
+    return response
+
+
+class LoadStats:
+    """Per-site page load time and bandwidth"""
+
+    def __init__(self, label, profile):
+        self.label = label
+        self.profile = profile
+        self.pages = 0
+        self.load_seconds = 0.0
+        self.bytes = 0
+        self.requests = 0
+        self.blocked = 0
+
+    def record(self, meter, seconds):
+        self.pages += 1
+        self.load_seconds += seconds
+        self.bytes += meter.bytes
+        self.requests += meter.requests
+        self.blocked += meter.blocked
+
+    def summary(self):
+        pages = max(self.pages, 1)
+        return {
+            "site": self.label,
+            "profile": self.profile,
+            "pages": self.pages,
+            "avg_load_ms": round(self.load_seconds / pages * 1000, 1),
+            "kb_per_page": round(self.bytes / pages / 1024, 1),
+            "requests_per_page": round(self.requests / pages, 1),
+            "blocked_per_page": round(self.blocked / pages, 1),
+        }
+
+    def line(self):
+        s = self.summary()
+        return (
+            f"📦 {s['site']} ({s['profile']}): {s['pages']} pages, {s['avg_load_ms']} ms/page, "
+            f"{s['kb_per_page']} KB/page, {s['requests_per_page']} req/page, {s['blocked_per_page']} blocked/page"
+        )
+
+
+def savings(full, light):
+    """Relative savings of the light profile over full for one site"""
+    f, l = full.summary(), light.summary()
+
+    def pct(a, b):
+        return round((1 - b / a) * 100, 1) if a else None
+
+    return {
+        "site": f["site"],
+        "load_ms": (f["avg_load_ms"], l["avg_load_ms"]),
+        "kb_per_page": (f["kb_per_page"], l["kb_per_page"]),
+        "load_saved_pct": pct(f["avg_load_ms"], l["avg_load_ms"]),
+        "bandwidth_saved_pct": pct(f["kb_per_page"], l["kb_per_page"]),
+    }
+
+
+def compare_profiles(sites, pages=3, base_url=None):
+    """Load the same listing pages under both profiles and report savings per site"""
+    from playwright.sync_api import sync_playwright
+
+    from scrape_sites import fetch_base, listing_url
+    from scraper import get_browser, get_context
+
+    results = []
+    with sync_playwright() as p:
+        stats = {}
+        for profile in ("full", "light"):
+            browser = get_browser(p, headless=PROFILES[profile]["headless"])
+            for site in sites:
+                ctx = get_context(browser)
+                page = ctx.new_page()
+                meter = attach(page, profile)
+                site_stats = stats[(site["label"], profile)] = LoadStats(site["label"], profile)
+                for page_num in range(1, pages + 1):
+                    url = listing_url(site, site["queries"][0], page_num, fetch_base(site, base_url))
+                    meter.reset()
+                    started = time.time()
+                    try:
+                        page.goto(url, timeout=90000, wait_until=site["wait_until"])
+                        if site["wait_for"]:
+                            page.wait_for_selector(site["wait_for"], timeout=20000)
+                    except Exception as e:
+                        print(f"  ❌ {site['label']} ({profile}) page {page_num}: {e}")
+                        continue
+                    site_stats.record(meter, time.time() - started)
+                print(site_stats.line())
+                ctx.close()
+            browser.close()
+
+    print("\n" + "=" * 60)
+    print("📊 LIGHT vs FULL PROFILE")
+    print("=" * 60)
+    for site in sites:
+        s = savings(stats[(site["label"], "full")], stats[(site["label"], "light")])
+        results.append(s)
+        print(
+            f"{s['site']:<12} load {s['load_ms'][0]:>8} → {s['load_ms'][1]:>8} ms ({s['load_saved_pct']}% saved) | "
+            f"{s['kb_per_page'][0]:>8} → {s['kb_per_page'][1]:>8} KB/page ({s['bandwidth_saved_pct']}% saved)"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    from scrape_sites import SITES
+
+    parser = argparse.ArgumentParser(description="Compare full vs light page load profiles")
+    parser.add_argument("--site", action="append", choices=list(SITES),
+                        help="Only this site (repeatable; default: all)")
+    parser.add_argument("--pages", type=int, default=3, help="Listing pages per site and profile")
+    parser.add_argument("--base-url", help="Stand-in server root (see scrape_engine.py)")
+    args = parser.parse_args()
+    compare_profiles([SITES[label] for label in (args.site or SITES)], args.pages, args.base_url)
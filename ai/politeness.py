@@ -0,0 +1,260 @@
+"""
+Per-domain politeness scheduler
+Every page fetch (browser or HTTP) goes through here instead of a fixed
+sleep between pages:
+
+  - token bucket per domain: requests start at `rate` per second with a
+    small burst allowance
+  - adaptive rate (AIMD): healthy, fast responses raise the rate a little;
+    errors, 429/503 and slow responses cut it in half (down to min_rate)
+  - retries with exponential backoff and full jitter; Retry-After is honoured
+  - circuit breaker: after `breaker_threshold` consecutive failures the
+    domain is paused for a cooldown (doubling up to breaker_max_cooldown),
+    then a single probe request decides whether it closes again
+
+The same scheduler serves threads (acquire/call) and asyncio (acquire_async/
+call_async).
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+DEFAULT_POLICY = {
+    "rate": 0.75,               # requests/second to start with (~old 0.8-1.8s sleep)
+    "burst": 2,
+    "min_rate": 0.1,
+    "max_rate": 4.0,
+    "increase": 0.05,           # additive increase per healthy response
+    "decrease": 0.5,            # multiplicative decrease per failure
+    "target_latency": 3.0,      # seconds; slower responses count against the rate
+    "retries": 3,
+    "backoff_base": 2.0,
+    "backoff_cap": 60.0,
+    "breaker_threshold": 5,
+    "breaker_cooldown": 60.0,
+    "breaker_max_cooldown": 600.0,
+}
+
+
+class Throttled(Exception):
+    """Server asked us to slow down (429/503)"""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TransientError(Exception):
+    """Server-side failure worth retrying (5xx)"""
+
+
+def check_status(status, retry_after=None):
+    """Raise Throttled/TransientError for statuses the scheduler should react to"""
+    if status in (429, 503):
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        raise Throttled(status, retry_after)
+    if status is not None and status >= 500:
+        raise TransientError(f"HTTP {status}")
+
+
+class _Domain:
+    def __init__(self, policy):
+        self.policy = policy
+        self.rate = policy["rate"]
+        self.tokens = float(policy["burst"])
+        self.updated = time.monotonic()
+        self.latency = None
+        self.failures = 0
+        self.blocked_until = 0.0
+        self.cooldown = policy["breaker_cooldown"]
+        self.probing = False
+        self.counts = {"requests": 0, "failures": 0, "throttled": 0, "breaker_opens": 0}
+
+
+class PolitenessScheduler:
+    def __init__(self, policy=None):
+        self.policy = {**DEFAULT_POLICY, **(policy or {})}
+        self.domains = {}
+        self._lock = threading.Lock()
+
+    def _state(self, domain):
+        if domain not in self.domains:
+            self.domains[domain] = _Domain(self.policy)
+        return self.domains[domain]
+
+    # ---------- admission ----------
+    def _reserve(self, domain):
+        """
+        (wait, probe): wait is 0 if a request may start now, otherwise seconds
+        to wait before asking again; probe is True for the half-open probe
+        """
+        with self._lock:
+            d = self._state(domain)
+            now = time.monotonic()
+            if now < d.blocked_until:
+                return d.blocked_until - now, False
+            if d.failures >= d.policy["breaker_threshold"]:
+                # Half-open: exactly one probe until it reports back
+                if d.probing:
+                    return 0.5, False
+                d.probing = True
+                d.counts["requests"] += 1
+                return 0, True
+            d.tokens = min(float(d.policy["burst"]), d.tokens + (now - d.updated) * d.rate)
+            d.updated = now
+            if d.tokens >= 1:
+                d.tokens -= 1
+                d.counts["requests"] += 1
+                return 0, False
+            return (1 - d.tokens) / d.rate, False
+
+    def acquire(self, domain):
+        """Wait for a slot; True when the caller holds the half-open probe and must report back"""
+        while True:
+            wait, probe = self._reserve(domain)
+            if wait <= 0:
+                return probe
+            time.sleep(wait)
+
+    async def acquire_async(self, domain):
+        while True:
+            wait, probe = self._reserve(domain)
+            if wait <= 0:
+                return probe
+            await asyncio.sleep(wait)
+
+    def release_probe(self, domain):
+        """The probe ended without an outcome (cancelled, interrupted): the next request probes instead"""
+        with self._lock:
+            self._state(domain).probing = False
+
+    def is_open(self, domain):
+        """True while the domain's circuit breaker is open or half-open"""
+        with self._lock:
+            d = self._state(domain)
+            return d.failures >= d.policy["breaker_threshold"]
+
+    # ---------- feedback ----------
+    def record(self, domain, ok, latency=None, throttled=False, retry_after=None):
+        with self._lock:
+            d = self._state(domain)
+            p = d.policy
+            now = time.monotonic()
+            d.probing = False
+            if latency is not None:
+                d.latency = latency if d.latency is None else 0.8 * d.latency + 0.2 * latency
+
+            if ok:
+                if d.failures >= p["breaker_threshold"]:
+                    print(f"   🟢 {domain}: circuit closed")
+                    d.cooldown = p["breaker_cooldown"]
+                d.failures = 0
+                if d.latency is not None and d.latency > p["target_latency"]:
+                    d.rate = max(p["min_rate"], d.rate * p["decrease"])
+                else:
+                    d.rate = min(p["max_rate"], d.rate + p["increase"])
+                return
+
+            d.failures += 1
+            d.counts["failures"] += 1
+            d.rate = max(p["min_rate"], d.rate * p["decrease"])
+            if throttled:
+                d.counts["throttled"] += 1
+                if retry_after:
+                    d.blocked_until = max(d.blocked_until, now + retry_after)
+            if d.failures >= p["breaker_threshold"]:
+                d.counts["breaker_opens"] += 1
+                d.blocked_until = max(d.blocked_until, now + d.cooldown)
+                print(f"   🔴 {domain}: circuit open for {d.cooldown:.0f}s after {d.failures} failures")
+                d.cooldown = min(p["breaker_max_cooldown"], d.cooldown * 2)
+                d.tokens = 0.0
+
+    def backoff(self, domain, attempt):
+        """Full jitter: uniform(0, min(cap, base * 2^attempt))"""
+        p = self._state(domain).policy
+        return random.uniform(0, min(p["backoff_cap"], p["backoff_base"] * 2 ** attempt))
+
+    def _outcome(self, domain, started, error):
+        latency = time.monotonic() - started
+        if error is None:
+            self.record(domain, True, latency)
+        elif isinstance(error, Throttled):
+            self.record(domain, False, latency, throttled=True, retry_after=error.retry_after)
+        else:
+            self.record(domain, False, latency)
+
+    # ---------- wrapped calls ----------
+    def call(self, domain, fn, retries=None):
+        """Run fn() under the domain's rate limit, retrying failures with backoff"""
+        retries = self._state(domain).policy["retries"] if retries is None else retries
+        for attempt in range(retries + 1):
+            probe = self.acquire(domain)
+            started = time.monotonic()
+            error, reported = None, False
+            try:
+                result = fn()
+                reported = True
+            except Exception as e:
+                error, reported = e, True
+            finally:
+                # KeyboardInterrupt and friends report nothing; the probe must not stay taken
+                if probe and not reported:
+                    self.release_probe(domain)
+            self._outcome(domain, started, error)
+            if error is None:
+                return result
+            if attempt == retries:
+                raise error
+            time.sleep(self.backoff(domain, attempt))
+
+    async def call_async(self, domain, fn, retries=None):
+        """Async twin of call(); fn is a coroutine function"""
+        retries = self._state(domain).policy["retries"] if retries is None else retries
+        for attempt in range(retries + 1):
+            probe = await self.acquire_async(domain)
+            started = time.monotonic()
+            error, reported = None, False
+            try:
+                result = await fn()
+                reported = True
+            except Exception as e:
+                error, reported = e, True
+            finally:
+                # A cancelled probe (CancelledError is a BaseException) would hold the domain half-open forever
+                if probe and not reported:
+                    self.release_probe(domain)
+            self._outcome(domain, started, error)
+            if error is None:
+                return result
+            if attempt == retries:
+                raise error
+            await asyncio.sleep(self.backoff(domain, attempt))
+
+    # ---------- reporting ----------
+    def summary(self):
+        out = {}
+        with self._lock:
+            for domain, d in self.domains.items():
+                out[domain] = dict(d.counts, rate=round(d.rate, 3),
+                                   latency=round(d.latency, 3) if d.latency is not None else None)
+        return out
+
+    def line(self, domain):
+        s = self.summary().get(domain)
+        if s is None:
+            return f"🚦 {domain}: no requests"
+        return (
+            f"🚦 {domain}: {s['requests']} requests, {s['failures']} failed "
+            f"({s['throttled']} throttled), {s['breaker_opens']} breaker opens, "
+            f"rate now {s['rate']}/s, latency {s['latency']}s"
+        )
+
+    def print_summary(self):
+        for domain in list(self.domains):
+            print(self.line(domain))
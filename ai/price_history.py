@@ -0,0 +1,167 @@
+"""
+Price history
+Bucketed time series of product prices: one document per product per month
+in the price_history collection, holding packed arrays of observations
+
+    {_id: "<productId>:2026-10", productId, month: "2026-10", start: <month start>,
+     t: [seconds since start, ...], p: [price, ...],
+     n, sum, min, max, last, lastAt}
+
+ProductWriter appends the observations of each flushed batch with one
+unordered bulk_write ($push into the month's bucket, running n/sum/min/max
+updated in the same upsert). A product is observed when it is new, its
+price changed, or it was last observed on an earlier day, so daily crawls
+add at most one point per product per day.
+
+Reads take one or many products and run at most two queries: whole months
+inside the window are answered from the bucket summaries, only the first
+(partial) month is unpacked.
+"""
+
+import re
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from db_schema import PRICE_HISTORY_INDEXES, ensure_indexes
+
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+# Ids accepted per read (API requests for many products)
+MAX_IDS = 200
+
+SUMMARY_PROJECTION = {"t": 0, "p": 0}
+
+
+def price_value(raw):
+    """Rupee price as an int from a number or text like "Rs. 2,999" (None when missing or zero)"""
+    if isinstance(raw, str):
+        match = NUMBER_RE.search(raw.replace(",", ""))
+        raw = float(match.group(0)) if match else None
+    if raw is None or isinstance(raw, bool):
+        return None
+    value = int(round(raw))
+    return value or None
+
+
+def month_start(at):
+    return datetime(at.year, at.month, 1)
+
+
+def bucket_id(product_id, at):
+    return f"{product_id}:{at:%Y-%m}"
+
+
+class PriceHistory:
+    def __init__(self, collection, create_indexes=True):
+        """create_indexes=False when the caller ensures them itself (the API does at startup)"""
+        self.collection = collection
+        if create_indexes:
+            ensure_indexes(self.collection, PRICE_HISTORY_INDEXES)
+
+    # ---------- writes ----------
+    def record(self, observations, at=None):
+        """Append (product_id, price) observations taken at `at`: one upsert per product, one bulk_write"""
+        if not observations:
+            return 0
+        at = at or datetime.utcnow()
+        start = month_start(at)
+        offset = int((at - start).total_seconds())
+        ops = [
+            UpdateOne(
+                {"_id": bucket_id(pid, at)},
+                {
+                    "$setOnInsert": {"productId": pid, "month": f"{at:%Y-%m}", "start": start},
+                    "$push": {"t": offset, "p": price},
+                    "$inc": {"n": 1, "sum": price},
+                    "$min": {"min": price},
+                    "$max": {"max": price},
+                    "$set": {"last": price, "lastAt": at},
+                },
+                upsert=True,
+            )
+            for pid, price in observations
+        ]
+        self.collection.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    # ---------- reads ----------
+    @staticmethod
+    def _points(bucket, since=None):
+        """Unpacked (datetime, price) observations of a bucket, optionally from `since` on"""
+        start = bucket["start"]
+        points = ((start + timedelta(seconds=t), p) for t, p in zip(bucket.get("t", []), bucket.get("p", [])))
+        return [(at, p) for at, p in points if since is None or at >= since]
+
+    def history(self, ids, days=None):
+        """{product_id: [(datetime, price), ...]} oldest first"""
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        query = {"productId": {"$in": list(ids)}}
+        if since:
+            query["start"] = {"$gte": month_start(since)}
+        result = {pid: [] for pid in ids}
+        for bucket in self.collection.find(query).sort([("productId", 1), ("start", 1)]):
+            result[bucket["productId"]].extend(self._points(bucket, since))
+        return result
+
+    def stats(self, ids, days=None):
+        """
+        {product_id: {count, min, max, avg, current, currentAt}} over the last
+        `days` days (all history when None); products without history map to None
+        """
+        ids = list(ids)
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        acc = {}
+
+        def add(pid, n, total, low, high, last, last_at):
+            s = acc.get(pid)
+            if s is None:
+                acc[pid] = {"count": n, "sum": total, "min": low, "max": high, "current": last, "currentAt": last_at}
+                return
+            s["count"] += n
+            s["sum"] += total
+            s["min"] = min(s["min"], low)
+            s["max"] = max(s["max"], high)
+            if last_at >= s["currentAt"]:
+                s["current"], s["currentAt"] = last, last_at
+
+        full = {"productId": {"$in": ids}}
+        if since:
+            # The month `since` falls in is partly outside the window: unpack it
+            first = month_start(since)
+            full["start"] = {"$gt": first}
+            for bucket in self.collection.find({"productId": {"$in": ids}, "start": first}):
+                points = self._points(bucket, since)
+                if points:
+                    prices = [p for _, p in points]
+                    last_at, last = points[-1]
+                    add(bucket["productId"], len(prices), sum(prices), min(prices), max(prices), last, last_at)
+        for bucket in self.collection.find(full, SUMMARY_PROJECTION):
+            add(bucket["productId"], bucket["n"], bucket["sum"], bucket["min"], bucket["max"],
+                bucket["last"], bucket["lastAt"])
+
+        result = {}
+        for pid in ids:
+            s = acc.get(pid)
+            if s:
+                s["avg"] = round(s.pop("sum") / s["count"], 2)
+            result[pid] = s
+        return result
+
+    def lowest(self, ids, days=30):
+        """{product_id: {current, lowest, highest, isLowest, aboveLowestPercent}} for the last `days` days"""
+        result = {}
+        for pid, s in self.stats(ids, days).items():
+            if s is None:
+                result[pid] = None
+                continue
+            result[pid] = {
+                "current": s["current"],
+                "currentAt": s["currentAt"],
+                "lowest": s["min"],
+                "highest": s["max"],
+                "isLowest": s["current"] <= s["min"],
+                "aboveLowestPercent": round((s["current"] - s["min"]) / s["min"] * 100, 1),
+                "days": days,
+            }
+        return result
@@ -1,160 +1,300 @@
 """
 CLIP-based Style Embedding Generator
-Generates multi-modal embeddings for products without styleEmbedding
-Uses: 70% image embedding + 30% text embedding
+Single entry point for embedding jobs: selects products by category, source,
+brand, scrape date or an ids file, and embeds the pending ones (or recomputes
+them with --force). Stores the raw image and text vectors plus the default
+70/30 fused styleEmbedding.
 """
 
-from sentence_transformers import SentenceTransformer
+import argparse
+import uuid
+from datetime import datetime
+from itertools import islice
+
 from pymongo import MongoClient
-from PIL import Image
-import requests
-from io import BytesIO
-import numpy as np
+
+from db_schema import ensure_product_indexes
+from embedding_shards import calibrate, run_sharded
+from embeddings import JOB_FIELD, PENDING_QUERY, generate_embeddings, get_model
+from embedding_ledger import RunProgress, backlog_summary
+from leases import LeaseQueue
 
 # MongoDB Connection
 client = MongoClient("mongodb://localhost:27017/")
 db = client["value_scout"]
 products_collection = db["products"]
 
-# Load CLIP Model
-print("🔄 Loading CLIP model (clip-ViT-B-32)...")
-model = SentenceTransformer("clip-ViT-B-32")
-print("✅ Model loaded successfully\n")
+PROJECTION = {"_id": 1, "productName": 1, "imageUrl": 1, "brand": 1, JOB_FIELD: 1}
 
-def download_image(image_url):
-    """Download image from URL and convert to PIL Image"""
-    try:
-        # Handle protocol-relative URLs
-        if image_url.startswith("//"):
-            image_url = "https:" + image_url
-        
-        # Add timeout and headers
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        }
-        response = requests.get(image_url, timeout=10, headers=headers)
-        response.raise_for_status()
-        
-        # Convert to PIL Image
-        image = Image.open(BytesIO(response.content))
-        
-        # Convert to RGB if needed
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        
-        return image
-    except Exception as e:
-        print(f"   ⚠️  Image download failed: {e}")
-        return None
-
-def generate_style_embedding(product_name, image_url):
+# Ids read from an --ids-file per round trip (keeps memory bounded)
+IDS_CHUNK = 1000
+
+def build_selector(categories=None, sources=None, brands=None, scraped_after=None):
+    """Mongo filter for the products a job should look at"""
+    selector = {}
+    if categories:
+        selector["category"] = {"$in": categories}
+    if sources:
+        selector["source"] = {"$in": sources}
+    if brands:
+        selector["brand"] = {"$in": brands}
+    if scraped_after:
+        selector["scrapedAt"] = {"$gte": scraped_after}
+    return selector
+
+def pending_filter(force_before=None):
     """
-    Generate combined style embedding
-    70% image + 30% text
+    Products that still need work
+    With --force everything embedded before the cutoff is recomputed; every
+    finished product gets a newer embeddedAt, so cooperating workers that share
+    the cutoff never redo each other's work
     """
-    try:
-        # Download image
-        image = download_image(image_url)
-        if image is None:
-            return None
-        
-        # Generate image embedding
-        image_embedding = model.encode(image, convert_to_numpy=True)
-        
-        # Generate text embedding
-        text_embedding = model.encode(product_name, convert_to_numpy=True)
-        
-        # Combine: 70% image + 30% text
-        combined_embedding = (image_embedding * 0.7) + (text_embedding * 0.3)
-        
-        # Convert to Python list for MongoDB
-        embedding_list = combined_embedding.tolist()
-        
-        return embedding_list
-        
-    except Exception as e:
-        print(f"   ❌ Embedding generation failed: {e}")
-        return None
-
-def process_all_embeddings():
+    if force_before is None:
+        return PENDING_QUERY
+    return {"$or": [
+        {"embeddedAt": {"$exists": False}},
+        {"embeddedAt": {"$lt": force_before}},
+    ]}
+
+def combine(*filters):
+    filters = [f for f in filters if f]
+    if not filters:
+        return {}
+    return filters[0] if len(filters) == 1 else {"$and": filters}
+
+def iter_id_chunks(path, size=IDS_CHUNK):
+    """Stream product ids from a file (one per line, # comments allowed)"""
+    with open(path, encoding="utf-8") as f:
+        ids = (line.strip() for line in f)
+        ids = (i for i in ids if i and not i.startswith("#"))
+        while True:
+            chunk = list(islice(ids, size))
+            if not chunk:
+                return
+            yield chunk
+
+def count_ids_selection(path, selector, pending):
+    """(matching, pending) counts for an ids file without writing anything"""
+    matching = pending_count = 0
+    for chunk in iter_id_chunks(path):
+        chunk_filter = combine(selector, {"_id": {"$in": chunk}})
+        matching += products_collection.count_documents(chunk_filter)
+        pending_count += products_collection.count_documents(combine(chunk_filter, pending))
+    return matching, pending_count
+
+def tag_ids_selection(path, selector, pending):
     """
-    Process all products without styleEmbedding
-    Uses cursor to avoid memory issues
+    Tag the pending products listed in an ids file with a selection token
+    Streams the file in chunks; the token then acts as a single queue filter
+    """
+    token = uuid.uuid4().hex
+    tagged = 0
+    for chunk in iter_id_chunks(path):
+        res = products_collection.update_many(
+            combine(selector, pending, {"_id": {"$in": chunk}}),
+            {"$set": {f"{JOB_FIELD}.selection": token}},
+        )
+        tagged += res.modified_count
+    print(f"🏷️  Tagged {tagged} pending products from {path}")
+    return {f"{JOB_FIELD}.selection": token}
+
+def make_queue(selector=None, force_before=None, lease_seconds=300, max_attempts=5,
+               retry_base_seconds=1800):
+    """Lease queue over the selected backlog, shared by every worker/machine"""
+    return LeaseQueue(
+        products_collection, combine(selector, pending_filter(force_before)), JOB_FIELD,
+        lease_seconds=lease_seconds, max_attempts=max_attempts,
+        retry_base_seconds=retry_base_seconds,
+    )
+
+def dry_run(selector, ids_file=None, force_before=None):
+    """Report what a job would touch without embedding anything"""
+    pending = pending_filter(force_before)
+    if ids_file:
+        matching, pending_count = count_ids_selection(ids_file, selector, pending)
+    else:
+        matching = products_collection.count_documents(selector)
+        pending_count = products_collection.count_documents(combine(selector, pending))
+    backlog = backlog_summary(make_queue(selector, force_before)) if not ids_file else None
+
+    print("="*60)
+    print("🔎 EMBEDDING DRY RUN")
+    print("="*60)
+    print(f"Selector:         {selector or 'all products'}{' + ' + ids_file if ids_file else ''}")
+    print(f"Force before:     {force_before or '-'}")
+    print(f"Matching:         {matching}")
+    print(f"Pending:          {pending_count}")
+    if backlog:
+        print(f"Claimable now:    {backlog['claimable']}")
+        print(f"Waiting retry:    {backlog['waiting_retry']}")
+        print(f"Poisoned:         {backlog['poisoned']}")
+    print("="*60)
+    return {"matching": matching, "pending": pending_count, "backlog": backlog}
+
+def drain(queue, progress, batch_size):
+    """Claim leased batches until nothing is claimable, embedding each product"""
+    with queue.heartbeat():
+        while True:
+            # Claim the next batch atomically; other workers skip these until the lease expires
+            batch = queue.claim(batch_size, PROJECTION)
+            if not batch:
+                break
+
+            for product in batch:
+                product_id = product.get("_id")
+                product_name = product.get("productName", "Unnamed Product")
+                image_url = product.get("imageUrl", "")
+
+                # Progress indicator
+                print(f"{progress.line()} Processing: {product_name[:50]}...")
+
+                # Skip if no image URL
+                if not image_url:
+                    print("   ⚠️  No image URL - skipped")
+                    progress.record(failed=1, poisoned=queue.fail(product, "no image URL", permanent=True))
+                    continue
+
+                # Generate embedding
+                try:
+                    fields, error = generate_embeddings(product_name, image_url)
+
+                    if fields is None:
+                        progress.record(failed=1, poisoned=queue.fail(product, error))
+                        continue
+
+                    # Save image/text components + fused vector, dropping the lease
+                    if not queue.complete(product_id, fields):
+                        print("   ⚠️  Lease lost - result discarded")
+                        progress.record(failed=1)
+                        continue
+
+                    progress.record(successful=1)
+                    print(f"   ✅ Saved embedding (dim: {len(fields['styleEmbedding'])})")
+
+                except Exception as e:
+                    print(f"   ❌ Error: {e}")
+                    progress.record(failed=1, poisoned=queue.fail(product, e))
+                    continue
+
+def process_all_embeddings(selector=None, force_before=None, lease_seconds=300, max_attempts=5,
+                           retry_base_seconds=1800, batch_size=16):
+    """
+    Process every selected product without stored image/text components
+    (new products and legacy fused-only embeddings), or all of them with force_before
+    Work is claimed in leased batches, so several runs can drain the backlog together.
+    Failures are recorded per product and backed off, and an interrupted run
+    simply resumes from whatever is still pending.
     """
     print("="*60)
     print("🚀 STARTING EMBEDDING GENERATION")
     print("="*60)
-    
+
+    queue = make_queue(selector, force_before, lease_seconds, max_attempts, retry_base_seconds)
+    reaped = queue.poison_exhausted()
+    if reaped:
+        print(f"☠️  {reaped} products poisoned after {max_attempts} crashed attempts")
+
     # Count total products to process
-    total_count = products_collection.count_documents({
-        "styleEmbedding": {"$exists": False}
-    })
-    
+    backlog = backlog_summary(queue)
+    total_count = backlog["claimable"]
+
     if total_count == 0:
         print("\n✅ All products already have embeddings!")
+        if backlog["waiting_retry"] or backlog["poisoned"]:
+            print(f"   ({backlog['waiting_retry']} waiting for retry, {backlog['poisoned']} poisoned)")
         return
-    
-    print(f"\n📊 Found {total_count} products without embeddings\n")
-    
-    # Use cursor to iterate (memory efficient)
-    cursor = products_collection.find(
-        {"styleEmbedding": {"$exists": False}},
-        {"_id": 1, "productName": 1, "imageUrl": 1, "brand": 1}
-    )
-    
-    processed = 0
-    successful = 0
-    failed = 0
-    
-    for product in cursor:
-        product_id = product.get("_id")
-        product_name = product.get("productName", "Unnamed Product")
-        image_url = product.get("imageUrl", "")
-        brand = product.get("brand", "Unknown")
-        
-        # Progress indicator
-        processed += 1
-        print(f"[{processed}/{total_count}] Processing: {product_name[:50]}...")
-        
-        # Skip if no image URL
-        if not image_url:
-            print(f"   ⚠️  No image URL - skipped")
-            failed += 1
-            continue
-        
-        # Generate embedding
-        try:
-            embedding = generate_style_embedding(product_name, image_url)
-            
-            if embedding is None:
-                failed += 1
-                continue
-            
-            # Save to database
-            products_collection.update_one(
-                {"_id": product_id},
-                {"$set": {"styleEmbedding": embedding}}
-            )
-            
-            successful += 1
-            print(f"   ✅ Saved embedding (dim: {len(embedding)})")
-            
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
-            failed += 1
-            continue
-    
+
+    print(f"\n📊 Found {total_count} products to embed (worker {queue.owner})")
+    print(f"   Skipping {backlog['waiting_retry']} failed products until their retry time\n")
+    get_model()
+
+    progress = RunProgress(db, queue.owner, total_count)
+    status = "completed"
+
+    try:
+        drain(queue, progress, batch_size)
+    except KeyboardInterrupt:
+        # Hand unfinished claims straight back instead of waiting for lease expiry
+        status = "interrupted"
+        released = queue.release(list(queue.held))
+        print(f"\n⏸️  Interrupted - released {released} claimed products; rerun to resume")
+    finally:
+        progress.finish(status)
+
+    processed = progress.counts["processed"]
+    successful = progress.counts["successful"]
+
     # Final summary
     print("\n" + "="*60)
-    print("📊 EMBEDDING GENERATION COMPLETE")
+    print("📊 EMBEDDING GENERATION COMPLETE" if status == "completed" else "📊 EMBEDDING GENERATION INTERRUPTED")
     print("="*60)
     print(f"Total processed:  {processed}")
     print(f"Successful:       {successful}")
-    print(f"Failed:           {failed}")
-    print(f"Success rate:     {(successful/processed*100):.1f}%")
+    print(f"Failed:           {progress.counts['failed']}")
+    print(f"Poisoned:         {progress.counts['poisoned']} (total in backlog: {queue.count_poisoned()})")
+    print(f"Throughput:       {progress.rate():.2f} products/s")
+    print(f"Success rate:     {(successful/processed*100):.1f}%" if processed else "Success rate:     n/a")
+    print(f"Run id:           {progress.run_id}")
     print("="*60)
-    
-    print(f"\n✅ All embeddings generated. {successful} products ready for AI recommendations!")
+
+    print(f"\n✅ {successful} products ready for AI recommendations!")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate CLIP embeddings for products")
+    select = parser.add_argument_group("selection")
+    select.add_argument("--category", action="append", help="Only this category (repeatable)")
+    select.add_argument("--source", action="append", help="Only this source, e.g. superkicks (repeatable)")
+    select.add_argument("--brand", action="append", help="Only this brand, exact match (repeatable)")
+    select.add_argument("--scraped-after", type=datetime.fromisoformat,
+                        help="Only products scraped at/after this ISO date, e.g. 2025-11-01")
+    select.add_argument("--ids-file", help="File with one product _id per line")
+    parser.add_argument("--force", action="store_true",
+                        help="Recompute embeddings even if they exist (cutoff: now)")
+    parser.add_argument("--force-before", type=datetime.fromisoformat,
+                        help="Recompute embeddings older than this ISO timestamp "
+                             "(share it between cooperating --force workers)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only count matching and pending products")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for a sharded CPU backfill (default: 1, in-process)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Torch threads per worker (default: cores / workers)")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Benchmark workers x threads splits on a sample and report the best")
+    parser.add_argument("--batch-size", type=int, default=16,
+                        help="Products claimed per lease batch (default: 16)")
+    parser.add_argument("--lease-seconds", type=int, default=300,
+                        help="Lease length before an unfinished claim is handed to another worker")
+    parser.add_argument("--max-attempts", type=int, default=5,
+                        help="Attempts before a product is marked poisoned")
+    parser.add_argument("--retry-base-seconds", type=int, default=1800,
+                        help="First retry delay after a failure; doubles per attempt (default: 30 min)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.calibrate:
+        calibrate(products_collection)
+        return
+
+    ensure_product_indexes(products_collection)
+    selector = build_selector(args.category, args.source, args.brand, args.scraped_after)
+    force_before = args.force_before or (datetime.utcnow() if args.force else None)
+    if force_before:
+        print(f"♻️  Recomputing embeddings older than {force_before.isoformat()}")
+
+    if args.dry_run:
+        dry_run(selector, args.ids_file, force_before)
+        return
+    if args.ids_file:
+        selector = tag_ids_selection(args.ids_file, selector, pending_filter(force_before))
+
+    queue_args = (selector, force_before, args.lease_seconds, args.max_attempts, args.retry_base_seconds)
+    if args.workers > 1:
+        run_sharded(make_queue(*queue_args), workers=args.workers, threads=args.threads,
+                    chunk_size=args.batch_size)
+    else:
+        process_all_embeddings(*queue_args, batch_size=args.batch_size)
 
 if __name__ == "__main__":
-    process_all_embeddings()
+    main()
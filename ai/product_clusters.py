@@ -0,0 +1,236 @@
+"""Cluster the same product listed by several retailers (near-duplicate images).
+1. Hashes: every embedded product has a 64-bit pHash of its image (imageHash, written
+   by the embedding pipeline; --hash-missing backfills older products)
+2. Candidates: the distinct hashes go into a BK-tree (image_hash.py) and each one is
+   looked up within --radius bits, so no product is compared with every other one
+3. Confirm: candidate pairs must also have close CLIP image vectors (--min-similarity,
+   off with 0), which rules out different shoes shot the same way
+4. Store: pairs are joined with union-find; clusters go to product_clusters and the
+   members get clusterId (the API compares their prices, recommendations keep one each)
+
+    python product_clusters.py --dry-run --samples 5
+    python product_clusters.py --radius 6 --min-similarity 0.92
+    python product_clusters.py --hash-missing --limit 2000
+"""
+import argparse
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+
+from db_schema import ensure_product_indexes
+from embeddings import fetch_image
+from image_hash import BKTree, hash_hex, phash
+
+client = MongoClient("mongodb://localhost:27017/")
+db = client["value_scout"]
+coll = db["products"]
+clusters_coll = db["product_clusters"]
+
+BATCH_SIZE = 1000
+DEFAULT_RADIUS = 8
+DEFAULT_MIN_SIMILARITY = 0.9
+# A hash shared by more products than this is a placeholder/logo image, not one product
+MAX_SHARED_HASH = 25
+
+
+# ---------- 1. hashes ----------
+def hash_missing(limit=None, workers=8):
+    """Download and pHash products that were embedded before imageHash existed"""
+    query = {"imageHash": {"$exists": False}, "imageUrl": {"$nin": [None, ""]}, "delisted": {"$ne": True}}
+    cursor = coll.find(query, {"imageUrl": 1}, batch_size=BATCH_SIZE)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    def one(doc):
+        image, _ = fetch_image(doc["imageUrl"])
+        return doc["_id"], hash_hex(phash(image)) if image is not None else None
+
+    def flush(docs):
+        ops = [UpdateOne({"_id": pid}, {"$set": {"imageHash": value}})
+               for pid, value in pool.map(one, docs) if value is not None]
+        if ops:
+            coll.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    done = failed = 0
+    docs = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # One batch of downloads in flight at a time
+        for doc in cursor:
+            docs.append(doc)
+            if len(docs) >= BATCH_SIZE:
+                hashed = flush(docs)
+                done, failed, docs = done + hashed, failed + len(docs) - hashed, []
+        if docs:
+            hashed = flush(docs)
+            done, failed = done + hashed, failed + len(docs) - hashed
+    print(f"🖼️  Hashed {done} product images ({failed} downloads failed)")
+
+
+def load_hashes():
+    """{hash: [(product id, source)]} for every listed product with an image hash"""
+    by_hash = defaultdict(list)
+    query = {"imageHash": {"$exists": True}, "delisted": {"$ne": True}}
+    for doc in coll.find(query, {"imageHash": 1, "source": 1}, batch_size=BATCH_SIZE):
+        by_hash[int(doc["imageHash"], 16)].append((doc["_id"], doc.get("source")))
+    return by_hash
+
+
+# ---------- 2. candidates ----------
+def candidate_pairs(by_hash, radius, same_source=False):
+    """
+    {(id_a, id_b): hamming distance} for products whose hashes are within
+    `radius` bits; only across sources unless same_source
+    """
+    shared = {h for h, members in by_hash.items() if len(members) > MAX_SHARED_HASH}
+    tree = BKTree(h for h in by_hash if h not in shared)
+    pairs = {}
+    for h, members in by_hash.items():
+        if h in shared:
+            continue
+        for other, distance in tree.search(h, radius):
+            # Each unordered pair of hashes once (and a hash with itself)
+            if other < h:
+                continue
+            for a, source_a in members:
+                for b, source_b in by_hash[other]:
+                    if a == b or (source_a == source_b and not same_source):
+                        continue
+                    key = (a, b) if a < b else (b, a)
+                    pairs[key] = distance
+    return pairs, shared
+
+
+# ---------- 3. confirm ----------
+def image_vectors(ids):
+    """Normalised imageEmbedding (or styleEmbedding) per id, fetched in batches"""
+    ids = list(ids)
+    vectors = {}
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start:start + BATCH_SIZE]
+        for doc in coll.find({"_id": {"$in": chunk}}, {"imageEmbedding": 1, "styleEmbedding": 1}):
+            vec = doc.get("imageEmbedding") or doc.get("styleEmbedding")
+            if vec:
+                vec = np.asarray(vec, dtype=np.float32)
+                norm = np.linalg.norm(vec)
+                vectors[doc["_id"]] = vec / norm if norm else vec
+    return vectors
+
+
+def confirm(pairs, min_similarity):
+    """Pairs whose image vectors have cosine >= min_similarity (pairs without vectors are dropped)"""
+    if not min_similarity:
+        return dict(pairs)
+    vectors = image_vectors({pid for pair in pairs for pid in pair})
+    confirmed = {}
+    for (a, b), distance in pairs.items():
+        va, vb = vectors.get(a), vectors.get(b)
+        if va is not None and vb is not None and len(va) == len(vb) and float(va @ vb) >= min_similarity:
+            confirmed[(a, b)] = distance
+    return confirmed
+
+
+# ---------- 4. clusters ----------
+def union_find(pairs):
+    """Connected components of the pair graph -> list of sorted member lists"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    groups = defaultdict(list)
+    for x in parent:
+        groups[find(x)].append(x)
+    return [sorted(members) for members in groups.values()]
+
+
+def store(clusters, sources, radius, min_similarity):
+    """Replace product_clusters and the members' clusterId; clusters of the previous run are removed"""
+    run, built_at = uuid.uuid4().hex, datetime.utcnow()
+    cluster_ops, product_ops = [], []
+    for members in clusters:
+        cid = f"cluster_{members[0]}"
+        cluster_ops.append(ReplaceOne({"_id": cid}, {
+            "_id": cid,
+            "members": members,
+            "sources": sorted({str(sources[m]) for m in members}),
+            "size": len(members),
+            "radius": radius,
+            "minSimilarity": min_similarity,
+            "run": run,
+            "builtAt": built_at,
+        }, upsert=True))
+        product_ops += [UpdateOne({"_id": m}, {"$set": {"clusterId": cid, "clusterRun": run}}) for m in members]
+    for ops, target in ((cluster_ops, clusters_coll), (product_ops, coll)):
+        for start in range(0, len(ops), BATCH_SIZE):
+            target.bulk_write(ops[start:start + BATCH_SIZE], ordered=False)
+    clusters_coll.delete_many({"run": {"$ne": run}})
+    coll.update_many({"clusterId": {"$exists": True}, "clusterRun": {"$ne": run}},
+                     {"$unset": {"clusterId": "", "clusterRun": ""}})
+
+
+def build(radius=DEFAULT_RADIUS, min_similarity=DEFAULT_MIN_SIMILARITY, same_source=False, dry_run=False,
+          samples=3):
+    started = time.time()
+    by_hash = load_hashes()
+    products = sum(len(m) for m in by_hash.values())
+    sources = {pid: source for members in by_hash.values() for pid, source in members}
+    print(f"🔎 {products} hashed products, {len(by_hash)} distinct hashes")
+
+    pairs, shared = candidate_pairs(by_hash, radius, same_source)
+    if shared:
+        print(f"⚠️  Skipped {len(shared)} hashes shared by more than {MAX_SHARED_HASH} products (placeholder images)")
+    confirmed = confirm(pairs, min_similarity)
+    print(f"🔗 {len(pairs)} candidate pairs within {radius} bits; {len(confirmed)} confirmed"
+          + (f" (image cosine >= {min_similarity})" if min_similarity else ""))
+
+    clusters = union_find(confirmed)
+    sizes = Counter(len(c) for c in clusters)
+    mixes = Counter(" + ".join(sorted({str(sources[m]) for m in c})) for c in clusters)
+    clustered = sum(len(c) for c in clusters)
+    print(f"🧩 {len(clusters)} clusters covering {clustered} products in {time.time() - started:.1f}s")
+    if sizes:
+        print("   sizes: " + ", ".join(f"{size}: {n}" for size, n in sorted(sizes.items())))
+    for mix, n in mixes.most_common(10):
+        print(f"   {n:>6}  {mix}")
+    for members in sorted(clusters, key=len, reverse=True)[:samples]:
+        print(f"    e.g. {', '.join(members[:6])}{' ...' if len(members) > 6 else ''}")
+
+    if not dry_run:
+        store(clusters, sources, radius, min_similarity)
+        print(f"💾 Clusters saved to {clusters_coll.name}")
+    return clusters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate products across retailers")
+    parser.add_argument("--radius", type=int, default=DEFAULT_RADIUS,
+                        help=f"Max pHash Hamming distance of 64 bits (default: {DEFAULT_RADIUS})")
+    parser.add_argument("--min-similarity", type=float, default=DEFAULT_MIN_SIMILARITY,
+                        help=f"Min image-embedding cosine to confirm a pair, 0 = off (default: {DEFAULT_MIN_SIMILARITY})")
+    parser.add_argument("--same-source", action="store_true", help="Also cluster products of the same source")
+    parser.add_argument("--hash-missing", action="store_true", help="First hash products without imageHash")
+    parser.add_argument("--limit", type=int, help="With --hash-missing: at most this many downloads")
+    parser.add_argument("--dry-run", action="store_true", help="Report clusters without saving them")
+    parser.add_argument("--samples", type=int, default=3, help="Example clusters to print (default: 3)")
+    args = parser.parse_args()
+
+    # Offers lookups (ai_api.py) read a cluster's members by clusterId
+    ensure_product_indexes(coll)
+    if args.hash_missing:
+        hash_missing(args.limit)
+    build(args.radius, args.min_similarity, args.same_source, args.dry_run, args.samples)
+    print("Done.")
@@ -1,36 +1,93 @@
-"""Reclassify product categories in MongoDB to correct shoe mislabels.
-Run after improving scraper logic to fix existing documents where footwear was tagged as shirt/pants/etc.
+"""Reclassify product categories in MongoDB with the shared classifier (categories.py).
+Run after changing the rule table: streams every product, recomputes its category the way
+ingest does (store sources keep their fixed site category; categories moved by
+verify_categories.py --fix are kept), writes only the changes with unordered
+bulk_write and prints a diff report of what moved where.
+
+    python reclassify_categories.py --dry-run
+    python reclassify_categories.py --source myntra_nike --samples 5
 """
-from pymongo import MongoClient
+import argparse
+from collections import Counter, defaultdict
+
+from pymongo import MongoClient, UpdateOne
+
+from categories import CLASSIFIER
+from scrape_sites import SITES
 
 client = MongoClient("mongodb://localhost:27017/")
 db = client["value_scout"]
 coll = db["products"]
 
-# Broad footwear indicators
-SHOE_KEYWORDS = [
-    "shoe", "shoes", "sneaker", "sneakers", "trainer", "trainers", "basketball", "running",
-    "football", "golf", "boot", "boots", "court", "jordan"
-]
-
-query = {
-    "$and": [
-        {"category": {"$ne": "shoes"}},
-        {"$or": [
-            {"productName": {"$regex": "|".join(SHOE_KEYWORDS), "$options": "i"}},
-            {"productUrl": {"$regex": "|".join(SHOE_KEYWORDS), "$options": "i"}},
-        ]}
-    ]
-}
-
-candidates = list(coll.find(query, {"_id": 1, "productName": 1, "category": 1}))
-print(f"Found {len(candidates)} potential misclassified footwear items.")
-
-updated = 0
-for doc in candidates:
-    res = coll.update_one({"_id": doc["_id"]}, {"$set": {"category": "shoes"}})
-    if res.modified_count:
-        updated += 1
-
-print(f"Updated {updated} documents to category 'shoes'.")
-print("Done.")
+BATCH_SIZE = 1000
+
+# Sources whose listings only hold one category (e.g. footwear stores)
+FIXED_CATEGORIES = {site["source"]: site["category"] for site in SITES.values() if site.get("category")}
+
+
+def expected_category(doc):
+    """(category, keyword, where) as ingest would assign it today"""
+    fixed = FIXED_CATEGORIES.get(doc.get("source"))
+    if fixed:
+        return fixed, doc.get("source"), "source"
+    if doc.get("categoryOverride"):
+        return doc["categoryOverride"], "clip", "override"
+    # Myntra names are stored as "<brand> <name>"; the brand never holds garment words
+    return CLASSIFIER.explain(doc.get("productName") or "", doc.get("productUrl") or "")
+
+
+def reclassify(sources=None, dry_run=False, samples=3, batch_size=BATCH_SIZE):
+    query = {"source": {"$in": sources}} if sources else {}
+    moves = Counter()
+    examples = defaultdict(list)
+    ops = []
+    scanned = changed = 0
+
+    fields = {"productName": 1, "productUrl": 1, "category": 1, "source": 1, "categoryOverride": 1}
+    cursor = coll.find(query, fields, batch_size=batch_size)
+    for doc in cursor:
+        scanned += 1
+        new, keyword, where = expected_category(doc)
+        old = doc.get("category")
+        if new == old:
+            continue
+        changed += 1
+        moves[(old, new)] += 1
+        if len(examples[(old, new)]) < samples:
+            examples[(old, new)].append(f"{(doc.get('productName') or '')[:60]} [{where}: {keyword}]")
+        if not dry_run:
+            ops.append(UpdateOne({"_id": doc["_id"], "category": old}, {"$set": {"category": new}}))
+            if len(ops) >= batch_size:
+                coll.bulk_write(ops, ordered=False)
+                ops = []
+    if ops:
+        coll.bulk_write(ops, ordered=False)
+
+    print(f"Scanned {scanned} products; {changed} {'would change' if dry_run else 'reclassified'}.")
+    if moves:
+        print(f"\n{'from':<12} {'to':<12} {'count':>7}")
+        print("-" * 33)
+        for (old, new), count in moves.most_common():
+            print(f"{str(old):<12} {new:<12} {count:>7}")
+            for example in examples[(old, new)]:
+                print(f"    e.g. {example}")
+
+    # Net change per category
+    net = Counter()
+    for (old, new), count in moves.items():
+        net[old] -= count
+        net[new] += count
+    if net:
+        print("\nNet: " + ", ".join(f"{c} {n:+d}" for c, n in sorted(net.items(), key=lambda kv: str(kv[0])) if n))
+    return moves
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute product categories with the shared rule table")
+    parser.add_argument("--source", action="append", help="Only this source (repeatable; default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would move")
+    parser.add_argument("--samples", type=int, default=3, help="Example products per move (default: 3)")
+    args = parser.parse_args()
+
+    reclassify(args.source, args.dry_run, args.samples)
+    print("Done.")
@@ -0,0 +1,318 @@
+"""
+Async scraping engine
+Crawls every site in parallel on one shared Chromium (headless under the
+default light load profile, see page_profile.py). Pages come from a fixed
+pool of contexts/pages (the global concurrency limit), each domain has its
+own semaphore, and pagination is pipelined: the next listing pages are
+already loading while the current one is parsed.
+
+Results are processed in page order, so stop rules (target reached, three
+pages without new products) behave exactly like the sync scrapers in
+scraper.py. Site definitions and card parsing live in scrape_sites.py.
+Request pacing, retries and the per-domain circuit breaker come from the
+politeness scheduler (politeness.py); the semaphores only cap concurrency.
+
+    python scrape_engine.py                        # all sites, live
+    python scrape_engine.py --site Nike --site SuperKicks
+    python scrape_engine.py --base-url http://127.0.0.1:8765   # local fixtures
+"""
+
+import argparse
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+from card_extract import ASYNC_EXTRACTORS, ExtractionTimer
+from page_profile import PROFILES, LoadStats, attach_async, goto_async
+from politeness import PolitenessScheduler
+from scrape_sites import (
+    KNOWN_STREAK,
+    MAX_EMPTY_PAGES,
+    MAX_FAILED_PAGES,
+    SITES,
+    build_docs,
+    domain_of,
+    fetch_base,
+    known_streak,
+    listing_url,
+)
+from crawl_state import CrawlState, run_scope
+from crawl_telemetry import ITEMS, PAGES, Attempts, CrawlTelemetry
+from ingest import ProductWriter
+from scraper import CONTEXT_OPTIONS, LAUNCH_ARGS
+
+
+class PagePool:
+    """Fixed set of pages spread over a few browser contexts; size = global concurrency"""
+
+    def __init__(self, browser, size, profile="light", pages_per_context=2):
+        self.browser = browser
+        self.size = size
+        self.profile = profile
+        self.pages_per_context = pages_per_context
+        self.contexts = []
+        self.meters = {}
+        self._idle = asyncio.Queue()
+
+    async def start(self):
+        for _ in range(math.ceil(self.size / self.pages_per_context)):
+            self.contexts.append(await self.browser.new_context(**CONTEXT_OPTIONS))
+        for i in range(self.size):
+            ctx = self.contexts[i // self.pages_per_context]
+            page = await ctx.new_page()
+            self.meters[page] = await attach_async(page, self.profile)
+            await self._idle.put(page)
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self._idle.get()
+        try:
+            yield page
+        finally:
+            self._idle.put_nowait(page)
+
+    async def close(self):
+        for ctx in self.contexts:
+            await ctx.close()
+
+
+class ScrapeEngine:
+    def __init__(self, sites, global_limit=6, domain_limit=2, lookahead=2, base_url=None,
+                 headless=None, scheduler=None, extraction="evaluate", profile="light", state=None,
+                 incremental=False, telemetry=None, verbosity=0):
+        self.sites = sites
+        self.global_limit = global_limit
+        self.lookahead = lookahead
+        self.base_url = base_url
+        self.profile = profile
+        self.headless = PROFILES[profile]["headless"] if headless is None else headless
+        self.scheduler = scheduler or PolitenessScheduler()
+        # Newest-first listings, each stopped after KNOWN_STREAK already-catalogued products
+        self.incremental = incremental
+        self.extract = ASYNC_EXTRACTORS[extraction]
+        self.timer = ExtractionTimer(extraction)
+        self.load_stats = {site["label"]: LoadStats(site["label"], profile) for site in sites}
+        # Keyed by the real domain, so limits are the same against a stand-in server
+        self.domain_limits = {
+            domain_of(site["base_url"]): asyncio.Semaphore(domain_limit) for site in sites
+        }
+        self.state = state
+        # A caller-provided telemetry is reported by the caller (run_all_scrapers)
+        self.telemetry = telemetry
+        self.own_telemetry = telemetry is None
+        self.verbosity = verbosity
+        self.writer = None
+        self.pool = None
+        self.pages_fetched = 0
+
+    async def fetch_listing(self, site, query, page_num):
+        """Load one listing page; returns (raw card records or None on load error, retries)"""
+        url = listing_url(site, query, page_num, fetch_base(site, self.base_url), newest=self.incremental)
+        domain = domain_of(site["base_url"])
+        metrics = self.telemetry.site(site["label"])
+
+        async def load():
+            # A pool page is only held while loading, not during backoff
+            async with self.pool.page() as page:
+                meter = self.pool.meters[page]
+                meter.reset()
+                load_started = time.time()
+                await goto_async(page, url, site["wait_until"])
+                if site["wait_for"]:
+                    try:
+                        await page.wait_for_selector(site["wait_for"], timeout=20000)
+                    except Exception:
+                        return []  # page loaded, but has no cards
+                load_seconds = time.time() - load_started
+                self.load_stats[site["label"]].record(meter, load_seconds)
+                started = self.timer.start()
+                records = await self.extract(page, site["card"])
+                self.timer.stop(started, len(records))
+                metrics.observe_load(load_seconds)
+                metrics.observe_extract(time.perf_counter() - started)
+                return records
+
+        fetch = Attempts(load)
+        async with self.domain_limits[domain]:
+            try:
+                records = await self.scheduler.call_async(domain, fetch)
+            except Exception as e:
+                self.telemetry.page_failed(site["label"], query, page_num, e, fetch.retries)
+                records = None
+            self.pages_fetched += 1
+        return records, fetch.retries
+
+    async def crawl_query(self, site, query, totals):
+        """Pipelined pagination: keep `lookahead` pages in flight, consume them in order"""
+        label = site["label"]
+        target = site["target"]
+        seen_in_listing = set() if site["dedupe_urls"] else None
+        cursor = self.state.cursor(label, query)
+        if cursor["done"]:
+            return
+        first_page = cursor["page"] + 1
+        if first_page > 1:
+            print(f"↩️  [{label}] {query}: resuming at page {first_page}")
+        in_flight = {}
+        next_page = first_page
+        empty_pages = cursor["empty_pages"]
+        query_added = cursor["added"]
+        page_num = first_page
+        stop_at_known = self.incremental and bool(site.get("newest"))
+        streak = 0
+        failed_pages = 0
+        last_page = first_page - 1
+        complete = False
+
+        try:
+            for page_num in range(first_page, site["max_pages"] + 1):
+                if target and totals[label] >= target:
+                    break
+                while next_page <= site["max_pages"] and len(in_flight) < self.lookahead:
+                    in_flight[next_page] = asyncio.create_task(self.fetch_listing(site, query, next_page))
+                    next_page += 1
+
+                records, retries = await in_flight.pop(page_num)
+                if records is None:
+                    # Failed loads don't count as empty pages, but a run of them ends the listing
+                    failed_pages += 1
+                    if failed_pages >= MAX_FAILED_PAGES or self.scheduler.is_open(domain_of(site["base_url"])):
+                        print(f"  🛑 [{label}] {query}: giving up after {failed_pages} failed pages in a row")
+                        self.writer.mark_partial(site["source"])
+                        break
+                    self.writer.page_done(label, query, page_num, empty_pages, query_added)
+                    continue
+                failed_pages = 0
+                errors = []
+                docs = build_docs(site, records, seen_in_listing, errors)
+                if stop_at_known:
+                    streak = known_streak(docs, self.writer.known([d["_id"] for d in docs]), streak)
+                added = 0
+                for doc in docs:
+                    if self.writer.add(doc, query, page_num):
+                        totals[label] += 1
+                        added += 1
+                        self.telemetry.say(ITEMS, f"  ✓ [{label}] {doc['productName'][:50]}")
+                query_added += added
+                last_page = page_num
+                self.telemetry.page(label, query, page_num, len(records), added, len(docs) - added,
+                                    len(errors), retries)
+                self.telemetry.say(PAGES, f"➡ [{label}] {query} | page {page_num}: {len(records)} cards, "
+                                          f"+{added} (site total: {totals[label]})")
+
+                if added:
+                    empty_pages = 0
+                else:
+                    empty_pages += 1
+                    if empty_pages >= MAX_EMPTY_PAGES:
+                        print(f"  🛑 [{label}] {query}: no new products in {MAX_EMPTY_PAGES} consecutive pages")
+                        complete = True
+                        break
+                if streak >= KNOWN_STREAK:
+                    print(f"  ⏹️ [{label}] {query}: caught up ({streak} consecutive products already in the catalog)")
+                    break
+                self.writer.page_done(label, query, page_num, empty_pages, query_added)
+            # Stopped by the target, the known streak or the page cap: only the crawled pages count
+            self.writer.listing_done(site["source"], query, None if complete else last_page)
+            self.writer.page_done(label, query, page_num, empty_pages, query_added, done=True)
+        finally:
+            # Pages fetched ahead of a stop are discarded
+            for task in in_flight.values():
+                task.cancel()
+            await asyncio.gather(*in_flight.values(), return_exceptions=True)
+
+    async def crawl_site(self, site, totals):
+        # Queries run one after another so the site target applies across them
+        for query in site["queries"]:
+            if site["target"] and totals[site["label"]] >= site["target"]:
+                # Target met before this listing started: none of its pages were crawled
+                self.writer.listing_done(site["source"], query, 0)
+                continue
+            await self.crawl_query(site, query, totals)
+        print(f"✅ {site['label']}: {totals[site['label']]}")
+
+    async def run(self):
+        """
+        Crawl all sites concurrently; returns {label: products saved}
+        The crawl run stays open if this raises, so the next run resumes it
+        """
+        if self.state is None:
+            self.state = CrawlState()
+            self.state.start_run("async", scope=run_scope([site["label"] for site in self.sites], self.incremental))
+        self.writer = ProductWriter(state=self.state)
+        if self.telemetry is None:
+            self.telemetry = CrawlTelemetry(self.state.run_id, "async", self.verbosity)
+        totals = {site["label"]: self.state.site_total(site["label"]) for site in self.sites}
+        started = time.time()
+
+        print("=" * 60)
+        print(f"🚀 ASYNC SCRAPE: {len(self.sites)} sites | {self.global_limit} pages "
+              f"| {len(self.domain_limits)} domains")
+        if self.base_url:
+            print(f"   Fetching from stand-in server {self.base_url}")
+        print("=" * 60)
+
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+            self.pool = PagePool(browser, self.global_limit, self.profile)
+            try:
+                await self.pool.start()
+                await asyncio.gather(*(self.crawl_site(site, totals) for site in self.sites))
+            finally:
+                self.writer.flush()
+                await self.pool.close()
+                await browser.close()
+
+        elapsed = max(time.time() - started, 1e-6)
+        print(f"\n⏱️  {self.pages_fetched} pages, {sum(totals.values())} products in {elapsed:.1f}s "
+              f"({self.pages_fetched / elapsed:.2f} pages/s)")
+        self.writer.summary()
+        self.state.finish_run("completed", self.writer.counts)
+        print(self.timer.line())
+        for stats in self.load_stats.values():
+            print(stats.line())
+        self.scheduler.print_summary()
+        if self.own_telemetry:
+            self.telemetry.save_report(writer=self.writer, scheduler=self.scheduler)
+        return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl sites in parallel with async Playwright")
+    parser.add_argument("--site", action="append", choices=list(SITES),
+                        help="Only this site (repeatable; default: all)")
+    parser.add_argument("--global-limit", type=int, default=6,
+                        help="Pages open at once across all sites (default: 6)")
+    parser.add_argument("--domain-limit", type=int, default=2,
+                        help="Pages open at once per domain (default: 2)")
+    parser.add_argument("--lookahead", type=int, default=2,
+                        help="Listing pages loaded ahead per listing (default: 2)")
+    parser.add_argument("--base-url",
+                        help="Stand-in server root; each site is fetched from <base-url>/<site>")
+    parser.add_argument("--extraction", choices=["evaluate", "per-element"], default="evaluate",
+                        help="Card reading: one page.evaluate per page, or the old per-element calls")
+    parser.add_argument("--profile", choices=list(PROFILES), default="light",
+                        help="light: headless, no images/media/fonts/trackers; full: old headed load")
+    parser.add_argument("--headed", action="store_true", help="Show the browser")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Newest-first listings, stopped once they reach products already in the catalog")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="-v: a line per page, -vv: a line per product (default: periodic summaries)")
+    args = parser.parse_args()
+
+    engine = ScrapeEngine(
+        [SITES[label] for label in (args.site or SITES)],
+        global_limit=args.global_limit,
+        domain_limit=args.domain_limit,
+        lookahead=args.lookahead,
+        base_url=args.base_url,
+        headless=False if args.headed else None,
+        extraction=args.extraction,
+        profile=args.profile,
+        incremental=args.incremental,
+        verbosity=args.verbose,
+    )
+    asyncio.run(engine.run())
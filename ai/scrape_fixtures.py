@@ -0,0 +1,227 @@
+"""
+Record / replay fixtures for the scrapers
+capture: loads the first listing pages of each site live and stores the
+rendered listing HTML (scripts stripped, so replay never calls the live
+site) plus, for Shopify stores, the products.json feed pages. The manifest
+keeps each page's URL, card count and the product ids parsed at capture
+time, so a replay can check extraction correctness as well as speed.
+
+serve: replays the corpus from a local HTTP server using the stand-in URL
+layout of fetch_base (<server>/<site slug>/<query>?<page param>=N and
+<server>/<slug>/<query>/products.json?page=N), so scrape_engine.py,
+http_ingest.py and page_profile.py run against it with --base-url.
+
+    python scrape_fixtures.py capture --site Nike --site SuperKicks --pages 3
+    python scrape_fixtures.py serve --port 8765
+    python scrape_engine.py --site Nike --base-url http://127.0.0.1:8765
+
+See bench_extraction.py for the benchmark suite built on top of this.
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from scrape_sites import SITES, build_docs, domain_of, listing_url, site_slug
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "scrape")
+MANIFEST = "manifest.json"
+DEFAULT_PORT = 8765
+
+_SCRIPT_RE = re.compile(r"<script\b[^>]*>.*?</script\s*>", re.IGNORECASE | re.DOTALL)
+
+
+def strip_scripts(html):
+    """Rendered DOM without scripts: replayed pages show the same cards and stay offline"""
+    return _SCRIPT_RE.sub("", html)
+
+
+def fixture_path(slug, query, page_num, kind="html"):
+    """Relative corpus path of one page, e.g. hm/H%26M-men/1.html"""
+    return f"{slug}/{quote(query, safe='')}/{page_num}.{kind}"
+
+
+# ---------- corpus ----------
+class Corpus:
+    def __init__(self, root=CORPUS_DIR):
+        self.root = root
+        path = os.path.join(root, MANIFEST)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"captured_at": None, "pages": []}
+        self._index = {(p["slug"], p["query"], p["page"], p["kind"]): p for p in self.manifest["pages"]}
+
+    def entries(self, kind="html", labels=None):
+        return [p for p in self.manifest["pages"]
+                if p["kind"] == kind and (labels is None or p["site"] in labels)]
+
+    def lookup(self, slug, query, page_num, kind="html"):
+        return self._index.get((slug, query, page_num, kind))
+
+    def read(self, entry):
+        with open(os.path.join(self.root, entry["file"]), encoding="utf-8") as f:
+            return f.read()
+
+    def add(self, entry, body):
+        path = os.path.join(self.root, entry["file"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        key = (entry["slug"], entry["query"], entry["page"], entry["kind"])
+        if key in self._index:
+            self.manifest["pages"].remove(self._index[key])
+        self._index[key] = entry
+        self.manifest["pages"].append(entry)
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        self.manifest["captured_at"] = datetime.utcnow().isoformat()
+        self.manifest["pages"].sort(key=lambda p: (p["slug"], p["query"], p["kind"], p["page"]))
+        with open(os.path.join(self.root, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+
+
+# ---------- capture ----------
+def capture(sites, pages=3, root=CORPUS_DIR):
+    """Record the first `pages` listing pages of every query (and Shopify feed pages) live"""
+    from playwright.sync_api import sync_playwright
+
+    from card_extract import extract_cards
+    from http_ingest import HttpIngest, feed_url, shopify_records
+    from page_profile import attach, goto
+    from politeness import PolitenessScheduler
+    from scraper import get_browser, get_context
+
+    corpus = Corpus(root)
+    scheduler = PolitenessScheduler()
+    with sync_playwright() as p:
+        browser = get_browser(p, headless=True)
+        ctx = get_context(browser)
+        page = ctx.new_page()
+        attach(page, "light")
+        for site in sites:
+            slug = site_slug(site["label"])
+            domain = domain_of(site["base_url"])
+            for query in site["queries"]:
+                for page_num in range(1, pages + 1):
+                    url = listing_url(site, query, page_num)
+                    try:
+                        scheduler.call(domain, lambda: goto(page, url, site["wait_until"]))
+                        if site["wait_for"]:
+                            page.wait_for_selector(site["wait_for"], timeout=20000)
+                        records = extract_cards(page, site["card"])
+                        html = strip_scripts(page.content())
+                    except Exception as e:
+                        print(f"  ❌ {site['label']} {query} p{page_num}: {e}")
+                        continue
+                    ids = [d["_id"] for d in build_docs(site, records)]
+                    corpus.add({
+                        "site": site["label"], "slug": slug, "query": query, "page": page_num,
+                        "kind": "html", "url": url, "file": fixture_path(slug, query, page_num),
+                        "cards": len(records), "ids": ids,
+                    }, html)
+                    print(f"📼 {site['label']} {query} p{page_num}: {len(records)} cards, {len(html) // 1024} KB")
+        ctx.close()
+        browser.close()
+
+    # Shopify feeds go over plain HTTP, as in http_ingest.py
+    ingest = HttpIngest()
+    for site in sites:
+        if not site.get("shopify"):
+            continue
+        slug = site_slug(site["label"])
+        stats = {"requests": 0, "bytes": 0, "seconds": 0.0}
+        for query in site["queries"]:
+            for page_num in range(1, pages + 1):
+                url = feed_url(site, query, page_num)
+                try:
+                    resp = ingest._get(site, url, stats)
+                    resp.raise_for_status()
+                    payload = resp.json()
+                except Exception as e:
+                    print(f"  ❌ {site['label']} feed p{page_num}: {e}")
+                    break
+                records = shopify_records(payload)
+                corpus.add({
+                    "site": site["label"], "slug": slug, "query": query, "page": page_num,
+                    "kind": "json", "url": url, "file": fixture_path(slug, query, page_num, "json"),
+                    "cards": len(records), "ids": [d["_id"] for d in build_docs(site, records)],
+                }, resp.text)
+                print(f"📼 {site['label']} feed p{page_num}: {len(records)} products")
+                if not records:
+                    break
+
+    corpus.save()
+    print(f"✅ Corpus at {root}: {len(corpus.manifest['pages'])} pages")
+    return corpus
+
+
+# ---------- replay ----------
+class ReplayHandler(BaseHTTPRequestHandler):
+    corpus = None
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        slug, _, rest = unquote(parts.path).lstrip("/").partition("/")
+        params = parse_qs(parts.query)
+        kind = "html"
+        if rest.endswith("/products.json"):
+            kind, rest = "json", rest[: -len("/products.json")]
+        page_values = params.get("p") or params.get("page") or ["1"]
+        try:
+            entry = self.corpus.lookup(slug, rest, int(page_values[0]), kind)
+        except ValueError:
+            entry = None
+        if entry is None:
+            self.send_error(404, "Not in fixture corpus")
+            return
+        body = self.corpus.read(entry).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json" if kind == "json" else "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(root=CORPUS_DIR, port=DEFAULT_PORT, background=False):
+    """Replay server; background=True returns (server, base_url) with the server on a thread"""
+    handler = type("CorpusHandler", (ReplayHandler,), {"corpus": Corpus(root)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    if background:
+        threading.Thread(target=server.serve_forever, name="fixture-replay", daemon=True).start()
+        return server, base_url
+    print(f"▶️  Replaying {len(handler.corpus.manifest['pages'])} pages at {base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record listing pages into a fixture corpus, or replay it")
+    parser.add_argument("command", choices=["capture", "serve"])
+    parser.add_argument("--site", action="append", choices=list(SITES),
+                        help="capture: only this site (repeatable; default: all)")
+    parser.add_argument("--pages", type=int, default=3, help="capture: listing pages per query (default: 3)")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="Corpus directory")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="serve: port (default: 8765)")
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        capture([SITES[label] for label in (args.site or SITES)], args.pages, args.corpus)
+    else:
+        serve(args.corpus, args.port)
@@ -0,0 +1,303 @@
+"""
+Site registry shared by the sync scrapers and the async scrape engine
+Declares, per site, where its listing pages live, which selectors hold each
+field on a product card, and how a raw card record becomes a product document.
+Parsing works on plain dicts, so it is independent of how the fields were read.
+"""
+
+import hashlib
+import re
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+from categories import classify
+
+# Brand whitelist (lowercase)
+ALLOWED_BRANDS = {"h&m", "hm", "nike", "snitch", "mango", "zara", "superkicks", "vegnonveg"}
+
+# First number, optionally after the rupee sign; thousands separators ("8,695.00", "1,00,000") are part of it
+PRICE_RE = re.compile(r'₹?\s*(\d{1,3}(?:,\d{2,3})+(?!\d)|\d{1,6})')
+MAX_PRICE = 50000
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+# Consecutive empty / no-new-product pages before a listing is abandoned
+MAX_EMPTY_PAGES = 3
+
+# Consecutive pages that still fail after retries before a listing is given up
+# (sooner if the domain's circuit breaker opens); the listing counts as partial
+MAX_FAILED_PAGES = 3
+
+# Incremental crawls: consecutive already-catalogued products (newest-first)
+# after which the rest of a listing is assumed unchanged
+KNOWN_STREAK = 40
+
+
+def allowed_brand(name: str) -> bool:
+    if not name:
+        return False
+    b = name.strip().lower()
+    return any(x in b for x in ALLOWED_BRANDS)
+
+
+def gen_id(source: str, unique: str) -> str:
+    return f"{source}_" + hashlib.md5(unique.encode(), usedforsecurity=False).hexdigest()
+
+
+def absolute_url(href: str, base_url: str) -> str:
+    """Make a card link absolute against the site's base URL"""
+    if not href:
+        return ""
+    if href.startswith("//"):
+        return "https:" + href
+    if href.startswith("http"):
+        return href
+    if not href.startswith("/"):
+        href = "/" + href
+    return base_url.rstrip("/") + href
+
+
+def absolute_image(src: str) -> str:
+    if src and src.startswith("//"):
+        return "https:" + src
+    return src or ""
+
+
+def parse_price(text: str) -> int:
+    match = PRICE_RE.search(text or "")
+    return int(match.group(1).replace(",", "")) if match else 0
+
+
+def domain_of(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+# =============================================================
+# Card specs: container selector + per-field selector/attribute
+# A field without "attr" reads the element's inner text; "attr" may
+# list fallbacks (first non-empty wins)
+# =============================================================
+MYNTRA_CARD = {
+    "container": "li.product-base",
+    "fields": {
+        "brand": {"selector": "h3.product-brand"},
+        "name": {"selector": "h4.product-product"},
+        "href": {"selector": "a", "attr": ["href"]},
+        "img": {"selector": "img", "attr": ["src"]},
+        "price": {"selector": ".product-discountedPrice, .product-price"},
+    },
+    "required": ["brand", "name"],
+}
+
+SUPERKICKS_CARD = {
+    # common Shopify grids
+    "container": ".product-item, .grid-product, .product-card, .grid__item, .card-wrapper",
+    "fields": {
+        "name": {"selector": ".product-title, .product-name, h3 a, .grid-product__title, .card__heading"},
+        "price": {"selector": ".price, .product-price, .money, .price-item"},
+        "href": {"selector": "a[href*='/products/']", "attr": ["href"]},
+        "img": {"selector": "img", "attr": ["src", "data-src"]},
+    },
+    "required": ["name", "price", "href", "img"],
+}
+
+VEGNONVEG_CARD = {
+    "container": ".product-item, .product-card, .grid-item, .grid__item, .card-wrapper",
+    "fields": {
+        "name": {"selector": ".product-name, .product-title, h3 a, .card__heading"},
+        "price": {"selector": ".price, .product-price, .price-item, .money"},
+        "href": {"selector": "a[href*='/product/'], a[href*='/footwear/'], a[href*='/products/']", "attr": ["href"]},
+        "img": {"selector": "img", "attr": ["src", "data-src"]},
+    },
+    "required": ["name", "price", "href", "img"],
+}
+
+
+# =============================================================
+# Raw card record -> product document (None = skip card)
+# Links are resolved against the site's real base URL even when pages
+# come from a stand-in server, so ids match a live crawl
+# =============================================================
+def myntra_doc(raw, site):
+    btxt = (raw.get("brand") or "").strip()
+    ntxt = (raw.get("name") or "").strip()
+    if not btxt or not ntxt or not allowed_brand(btxt):
+        return None
+
+    href = absolute_url(raw.get("href") or "", site["base_url"])
+    if not href:
+        return None
+
+    img = absolute_image(raw.get("img") or "")
+    # Skip products with no image
+    if not img or "placeholder" in img.lower():
+        return None
+
+    price = parse_price((raw.get("price") or "0").strip())
+    # Sanity check: skip if price is unrealistic
+    if price > MAX_PRICE:
+        return None
+
+    return {
+        "_id": gen_id("myntra", href),
+        "productName": f"{btxt} {ntxt}",
+        "brand": btxt,
+        "category": classify(ntxt, href),
+        "price": price,
+        "imageUrl": img,
+        "productUrl": href,
+        "source": site["source"],
+        "scrapedAt": datetime.utcnow(),
+    }
+
+
+def store_doc(raw, site):
+    """Single-brand footwear stores (SuperKicks, VegNonVeg); every product gets the site's category"""
+    name = (raw.get("name") or "").strip()
+    href = absolute_url(raw.get("href") or "", site["base_url"])
+    if not name or not href:
+        return None
+
+    img = absolute_image(raw.get("img") or "")
+    if not img or "placeholder" in img.lower():
+        return None
+
+    price = parse_price(raw.get("price") or "0")
+    if price > MAX_PRICE:
+        return None
+
+    return {
+        "_id": gen_id(site["source"], href),
+        "productName": name,
+        "brand": site["brand"],
+        "category": site["category"],
+        "price": price,
+        "imageUrl": img,
+        "productUrl": href,
+        "source": site["source"],
+        "scrapedAt": datetime.utcnow(),
+    }
+
+
+# =============================================================
+# Sites
+# =============================================================
+def myntra_site(brand: str, target: int):
+    """Myntra brand listing (men & women, all clothing)"""
+    return {
+        "label": brand,
+        "base_url": "https://www.myntra.com",
+        "queries": [f"{brand}-men", f"{brand}-women"],
+        "page_param": "p",
+        "max_pages": 100,
+        "target": target,
+        "card": MYNTRA_CARD,
+        "wait_until": "domcontentloaded",
+        "wait_for": "li.product-base",
+        "to_doc": myntra_doc,
+        "source": f"myntra_{brand.lower()}",
+        # None: classified per product from name and URL (categories.py)
+        "category": None,
+        "dedupe_urls": True,
+        # Listing order for incremental crawls (None: no newest-first sort, always crawled fully)
+        "newest": {"sort": "new"},
+        # Detail page parser for enrichment (see detail_enrich.py)
+        "detail": "myntra",
+    }
+
+
+def store_site(label, base_url, query, card, source, brand, shopify=False, newest=None, detail="jsonld"):
+    return {
+        "label": label,
+        "base_url": base_url,
+        "queries": [query],
+        "page_param": "page",
+        "max_pages": 60,
+        "target": None,
+        "card": card,
+        "wait_until": "domcontentloaded",
+        "wait_for": None,
+        "to_doc": store_doc,
+        "source": source,
+        "brand": brand,
+        # Footwear collections only
+        "category": "shoes",
+        "dedupe_urls": False,
+        # Shopify stores also serve <query>/products.json (see http_ingest.py)
+        "shopify": shopify,
+        "newest": newest,
+        "detail": detail,
+    }
+
+
+SITES = {
+    "H&M": myntra_site("H&M", 1500),
+    "Nike": myntra_site("Nike", 500),
+    "Snitch": myntra_site("Snitch", 500),
+    "Mango": myntra_site("Mango", 500),
+    "SuperKicks": store_site("SuperKicks", "https://www.superkicks.in", "collections/footwear",
+                             SUPERKICKS_CARD, "superkicks", "SuperKicks", shopify=True,
+                             newest={"sort_by": "created-descending"}, detail="shopify"),
+    "VegNonVeg": store_site("VegNonVeg", "https://www.vegnonveg.com", "footwear",
+                            VEGNONVEG_CARD, "vegnonveg", "VegNonVeg"),
+}
+
+
+def site_slug(label: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", label.lower())
+
+
+def fetch_base(site, override=None):
+    """
+    Host to fetch a site's pages from
+    override is a stand-in server root (e.g. a local fixture server); each site
+    is then served under /<slug>, e.g. http://127.0.0.1:8765/hm/H&M-men?p=1
+    """
+    if not override:
+        return site["base_url"]
+    return f"{override.rstrip('/')}/{site_slug(site['label'])}"
+
+
+def listing_url(site, query, page_num, base_url=None, newest=False):
+    base = (base_url or site["base_url"]).rstrip("/")
+    url = f"{base}/{query}?{site['page_param']}={page_num}"
+    if newest and site.get("newest"):
+        url += "&" + urlencode(site["newest"])
+    return url
+
+
+def build_docs(site, records, seen_urls=None, errors=None):
+    """
+    Parse raw card records into product docs, dropping repeats within a listing
+    Pass a list as errors to collect parse exceptions instead of printing them
+    (crawl telemetry and the benchmarks count them)
+    """
+    docs = []
+    for raw in records:
+        try:
+            doc = site["to_doc"](raw, site)
+        except Exception as e:
+            if errors is None:
+                print(f"  ⚠️ Parse error: {e}")
+            else:
+                errors.append(e)
+            continue
+        if doc is None:
+            continue
+        if seen_urls is not None:
+            if doc["productUrl"] in seen_urls:
+                continue
+            seen_urls.add(doc["productUrl"])
+        docs.append(doc)
+    return docs
+
+
+def known_streak(docs, known, streak=0):
+    """Extend a run of consecutive already-catalogued products over one page (listing order)"""
+    for doc in docs:
+        streak = streak + 1 if doc["_id"] in known else 0
+    return streak
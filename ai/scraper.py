@@ -1,245 +1,214 @@
 from playwright.sync_api import sync_playwright
-from pymongo import MongoClient
-from datetime import datetime
+import argparse
+import asyncio
 import time
-import random
-import hashlib
-import json
-import os
 
-# MongoDB
-client = MongoClient("mongodb://127.0.0.1:27017")
-db = client["value_scout"]
-products = db["products"]
+from card_extract import EXTRACTORS, ExtractionTimer
+from crawl_state import CrawlState, run_scope
+from crawl_telemetry import ITEMS, PAGES, Attempts, CrawlTelemetry
+from ingest import ProductWriter, products
+from page_profile import PROFILES, LoadStats, attach, goto
+from politeness import PolitenessScheduler
+from scrape_sites import (
+    KNOWN_STREAK,
+    MAX_EMPTY_PAGES,
+    MAX_FAILED_PAGES,
+    SITES,
+    USER_AGENT,
+    build_docs,
+    domain_of,
+    known_streak,
+    listing_url,
+    myntra_site,
+)
+
+# Shared across sites, so the Myntra brands pace against one learned rate
+scheduler = PolitenessScheduler()
 
-# Checkpoint
-CHECKPOINT_FILE = "scraper_checkpoint.json"
 
-# Brand whitelist (lowercase)
-ALLOWED_BRANDS = {"h&m", "hm", "nike", "snitch", "mango", "superkicks", "vegnonveg"}
-
-
-def load_checkpoint():
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return {"scraped_ids": set(data.get("scraped_ids", []))}
-    return {"scraped_ids": set()}
-
-
-def save_checkpoint(cp):
-    tmp = {"scraped_ids": list(cp["scraped_ids"]) }
-    with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
-        json.dump(tmp, f)
-
-
-def allowed_brand(name: str) -> bool:
-    if not name:
-        return False
-    b = name.strip().lower()
-    return any(x in b for x in ALLOWED_BRANDS)
-
-
-def gen_id(source: str, unique: str) -> str:
-    return f"{source}_" + hashlib.md5(unique.encode(), usedforsecurity=False).hexdigest()
-
-
-def rand_sleep(a=0.8, b=1.8):
-    time.sleep(random.uniform(a, b))
-
-
-def save_product(doc, cp):
-    pid = doc["_id"]
-    if pid in cp["scraped_ids"]:
-        return False
+# ---------- Playwright helpers ----------
+LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+]
 
-    # Remove any old embedding on insert/update
-    products.update_one({"_id": pid}, {"$set": doc, "$unset": {"styleEmbedding": ""}}, upsert=True)
-    cp["scraped_ids"].add(pid)
-    if len(cp["scraped_ids"]) % 50 == 0:
-        save_checkpoint(cp)
-        print(f"💾 Checkpoint saved ({len(cp['scraped_ids'])})")
-    return True
+CONTEXT_OPTIONS = {
+    "viewport": {"width": 1280, "height": 900},
+    "user_agent": USER_AGENT,
+}
 
 
-# ---------- Playwright helpers ----------
-def get_browser(p):
-    return p.chromium.launch(
-        headless=False,
-        args=[
-            "--disable-blink-features=AutomationControlled",
-            "--disable-dev-shm-usage",
-            "--no-sandbox",
-        ],
-    )
+def get_browser(p, headless=False):
+    return p.chromium.launch(headless=headless, args=LAUNCH_ARGS)
 
 
 def get_context(browser):
-    return browser.new_context(
-        viewport={"width": 1280, "height": 900},
-        user_agent=(
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        ),
-    )
+    return browser.new_context(**CONTEXT_OPTIONS)
+
+
+def load_listing(page, meter, site, url, extract, timer, load_stats, metrics=None):
+    """
+    Load one listing page and read its cards
+    Navigation errors and 429/5xx raise (run it under scheduler.call);
+    a page that loads without any cards returns []. Load and extraction
+    times also go to the site's telemetry metrics when given
+    """
+    meter.reset()
+    load_started = time.time()
+    goto(page, url, site["wait_until"])
+    if site["wait_for"]:
+        try:
+            page.wait_for_selector(site["wait_for"], timeout=20000)
+        except Exception:
+            return []  # page loaded, but has no cards
+    load_seconds = time.time() - load_started
+    load_stats.record(meter, load_seconds)
+    started = timer.start()
+    records = extract(page, site["card"])
+    timer.stop(started, len(records))
+    if metrics is not None:
+        metrics.observe_load(load_seconds)
+        metrics.observe_extract(time.perf_counter() - started)
+    return records
 
 
 # =============================================================
-# Myntra brand scraper (men & women, all clothing)
+# Generic listing crawler (one site, one page)
 # =============================================================
-def scrape_myntra_brand(brand: str, target: int):
+def scrape_site(site, extraction="evaluate", profile="light", writer=None, incremental=False, telemetry=None):
+    """
+    Crawl one site
+    extraction="per-element" uses the old round-trip-per-field reader,
+    profile="full" the old headed browser that downloads every resource;
+    pass a shared writer and telemetry to batch several sites into one crawl
+    run / report.
+    Listings continue after their saved cursor when an unfinished run is resumed.
+    incremental=True walks listings newest-first and stops a listing after
+    KNOWN_STREAK consecutive products that are already in the catalog
+    """
+    target = site["target"]
     print("\n" + "=" * 60)
-    print(f"🔍 Myntra: {brand} (target {target}+)")
+    print(f"🔍 {site['label']}" + (f" (target {target}+)" if target else ""))
     print("=" * 60)
 
-    cp = load_checkpoint()
-    total = 0
-    
-    # Scrape men and women general listings
-    queries = [
-        f"{brand}-men",
-        f"{brand}-women"
-    ]
+    own_writer = writer is None
+    if own_writer:
+        state = CrawlState()
+        state.start_run("sync", scope=run_scope([site["label"]], incremental))
+        writer = ProductWriter(state=state)
+        telemetry = telemetry or CrawlTelemetry(state.run_id, "sync")
+    label = site["label"]
+    domain = domain_of(site["base_url"])
+    total = writer.state.site_total(label) if writer.state else 0
+    extract = EXTRACTORS[extraction]
+    timer = ExtractionTimer(extraction)
+    load_stats = LoadStats(site["label"], profile)
+    metrics = telemetry.site(label)
+    # Sites without a newest-first sort are always crawled to the end
+    stop_at_known = incremental and bool(site.get("newest"))
 
     with sync_playwright() as p:
-        browser = get_browser(p)
+        browser = get_browser(p, headless=PROFILES[profile]["headless"])
         ctx = get_context(browser)
         page = ctx.new_page()
+        meter = attach(page, profile)
 
-        for q in queries:
-            page_num = 1
-            empty_pages = 0
-            seen_in_cat = set()
-
-            while page_num <= 100 and total < target:
-                url = f"https://www.myntra.com/{q}?p={page_num}"
-                print(f"➡ {q} | page {page_num}")
+        for q in site["queries"]:
+            cursor = writer.state.cursor(label, q) if writer.state else None
+            if cursor and cursor["done"]:
+                continue
+            page_num = cursor["page"] + 1 if cursor else 1
+            empty_pages = cursor["empty_pages"] if cursor else 0
+            query_added = cursor["added"] if cursor else 0
+            if page_num > 1:
+                print(f"↩️  {q}: resuming at page {page_num}")
+            seen_in_listing = set() if site["dedupe_urls"] else None
+            streak = 0
+            failed_pages = 0
+            last_page = page_num - 1
+            complete = False
+
+            while page_num <= site["max_pages"] and not (target and total >= target):
+                url = listing_url(site, q, page_num, newest=incremental)
+                telemetry.say(PAGES, f"➡ {q} | page {page_num}")
+
+                # Rate limit, retries with backoff and circuit breaker per domain
+                fetch = Attempts(lambda: load_listing(page, meter, site, url, extract, timer, load_stats, metrics))
                 try:
-                    page.goto(url, timeout=90000, wait_until="domcontentloaded")
-                    page.wait_for_selector("li.product-base", timeout=20000)
+                    records = scheduler.call(domain, fetch)
                 except Exception as e:
-                    print(f"  ❌ Load error: {e}")
-                    empty_pages += 1
-                    if empty_pages >= 3:
-                        print(f"  🛑 Stopping - 3 consecutive empty pages")
-                        break
-                    page_num += 1
-                    continue
-
-                cards = page.query_selector_all("li.product-base")
-                if not cards or len(cards) == 0:
-                    empty_pages += 1
-                    print(f"  ⚠️ Empty page ({empty_pages}/3)")
-                    if empty_pages >= 3:
-                        print(f"  🛑 Stopping - 3 consecutive empty pages")
+                    # Failed loads don't count as empty pages, but a run of them ends the listing
+                    telemetry.page_failed(label, q, page_num, e, fetch.retries)
+                    failed_pages += 1
+                    if failed_pages >= MAX_FAILED_PAGES or scheduler.is_open(domain):
+                        print(f"  🛑 Giving up on {q} - {failed_pages} failed pages in a row")
+                        writer.mark_partial(site["source"])
                         break
+                    writer.page_done(label, q, page_num, empty_pages, query_added)
                     page_num += 1
                     continue
-                
-                # Reset empty counter if we found products
-                empty_pages = 0
+                failed_pages = 0
 
+                errors = []
+                docs = build_docs(site, records, seen_in_listing, errors)
+                if stop_at_known:
+                    streak = known_streak(docs, writer.known([d["_id"] for d in docs]), streak)
                 added = 0
-                for it in cards:
-                    try:
-                        b_el = it.query_selector("h3.product-brand")
-                        n_el = it.query_selector("h4.product-product")
-                        if not b_el or not n_el:
-                            continue
-                        btxt = (b_el.inner_text() or "").strip()
-                        ntxt = (n_el.inner_text() or "").strip()
-                        if not allowed_brand(btxt):
-                            continue
-
-                        a_el = it.query_selector("a")
-                        href = a_el.get_attribute("href") if a_el else ""
-                        if href and not href.startswith("http"):
-                            if not href.startswith("/"):
-                                href = "/" + href
-                            href = "https://www.myntra.com" + href
-                        if not href or href in seen_in_cat:
-                            continue
-                        seen_in_cat.add(href)
-
-                        img_el = it.query_selector("img")
-                        img = img_el.get_attribute("src") if img_el else ""
-                        if img and img.startswith("//"):
-                            img = "https:" + img
-                        # Skip products with no image
-                        if not img or "placeholder" in img.lower():
-                            continue
-
-                        price_el = it.query_selector(".product-discountedPrice, .product-price")
-                        price_txt = price_el.inner_text().strip() if price_el else "0"
-                        # Extract price more carefully - only get the first continuous digit group
-                        import re
-                        price_match = re.search(r'₹?\s*(\d{1,6})', price_txt)
-                        price = int(price_match.group(1)) if price_match else 0
-                        # Sanity check: skip if price is unrealistic
-                        if price > 50000:
-                            continue
-
-                        # Auto-detect category from URL/name (improved ordering & keywords to reduce mislabels)
-                        url_lower = href.lower()
-                        name_lower = ntxt.lower()
-                        category = "clothing"
-
-                        # Shoes first: broaden keyword set (avoid misclassifying performance footwear as shirts)
-                        shoe_kw = ["shoe", "shoes", "sneaker", "sneakers", "boot", "trainer", "basketball", "running", "football", "golf", "court", "jordan"]
-                        if any(k in url_lower or k in name_lower for k in shoe_kw):
-                            category = "shoes"
-                        elif any(x in url_lower or x in name_lower for x in ["tshirt", "t-shirt"]):
-                            category = "tshirt"
-                        elif any(x in url_lower or x in name_lower for x in ["shirt", "shirts", "top", "blouse"]):
-                            # ensure we don't wrongly match 'short' as 'shirt'
-                            if "short" not in name_lower:
-                                category = "shirt"
-                        elif any(x in url_lower or x in name_lower for x in ["jeans", "trouser", "pant"]):
-                            category = "pants"
-                        elif any(x in url_lower or x in name_lower for x in ["short", "shorts"]):
-                            category = "shorts"
-                        elif any(x in url_lower or x in name_lower for x in ["hoodie", "sweatshirt"]):
-                            category = "hoodie"
-                        elif any(x in url_lower or x in name_lower for x in ["jacket", "coat"]):
-                            category = "jacket"
-                        elif any(x in url_lower or x in name_lower for x in ["dress", "skirt"]):
-                            category = "dress"
-
-                        doc = {
-                            "_id": gen_id("myntra", href),
-                            "productName": f"{btxt} {ntxt}",
-                            "brand": btxt,
-                            "category": category,
-                            "price": price,
-                            "imageUrl": img,
-                            "productUrl": href,
-                            "source": f"myntra_{brand.lower()}",
-                            "scrapedAt": datetime.utcnow(),
-                        }
-                        if save_product(doc, cp):
-                            total += 1
-                            added += 1
-                    except Exception as e:
-                        print(f"  ⚠️ Parse error: {e}")
-                        continue
-
-                print(f"  ✅ +{added} (total: {total})")
-                if added == 0:
+                for doc in docs:
+                    if writer.add(doc, q, page_num):
+                        total += 1
+                        added += 1
+                        telemetry.say(ITEMS, f"  ✓ {doc['productName'][:50]}")
+                query_added += added
+                last_page = page_num
+                telemetry.page(label, q, page_num, len(records), added, len(docs) - added, len(errors),
+                               fetch.retries)
+
+                if records:
+                    telemetry.say(PAGES, f"  ✅ +{added} (site total: {total})")
+                if added:
+                    empty_pages = 0
+                else:
                     empty_pages += 1
-                    if empty_pages >= 3:
-                        print(f"  🛑 Stopping - no new products found")
+                    if not records:
+                        telemetry.say(PAGES, f"  ⚠️ Empty page ({empty_pages}/{MAX_EMPTY_PAGES})")
+                    if empty_pages >= MAX_EMPTY_PAGES:
+                        print(f"  🛑 Stopping - no new products in {MAX_EMPTY_PAGES} consecutive pages")
+                        complete = True
                         break
+                if streak >= KNOWN_STREAK:
+                    print(f"  ⏹️ Caught up - {streak} consecutive products already in the catalog")
+                    break
+                writer.page_done(label, q, page_num, empty_pages, query_added)
                 page_num += 1
-                rand_sleep()
+
+            # Stopped by the target, the known streak or the page cap: only the crawled pages count
+            writer.listing_done(site["source"], q, None if complete else last_page)
+            writer.page_done(label, q, page_num, empty_pages, query_added, done=True)
 
         ctx.close()
         browser.close()
 
-    print(f"✅ Myntra {brand}: {total}")
+    writer.flush()
+    if own_writer:
+        writer.summary()
+        state.finish_run("completed", writer.counts)
+        telemetry.save_report(writer=writer, scheduler=scheduler)
+    print(timer.line())
+    print(load_stats.line())
+    print(scheduler.line(domain))
+    print(f"✅ {site['label']}: {total}")
     return total
 
 
+# =============================================================
+# Myntra brand scraper (men & women, all clothing)
+# =============================================================
+def scrape_myntra_brand(brand: str, target: int):
+    return scrape_site(myntra_site(brand, target))
+
+
 def scrape_myntra_hm():
     return scrape_myntra_brand("H&M", target=1500)
 
@@ -257,285 +226,103 @@ def scrape_myntra_mango():
 
 
 # =============================================================
-# SuperKicks footwear (official site)
+# SuperKicks / VegNonVeg footwear (official sites)
 # =============================================================
 def scrape_superkicks():
-    print("\n" + "=" * 60)
-    print("🔍 SuperKicks footwear")
-    print("=" * 60)
-    cp = load_checkpoint()
-    total = 0
-
-    with sync_playwright() as p:
-        browser = get_browser(p)
-        ctx = get_context(browser)
-        page = ctx.new_page()
-
-        base = "https://www.superkicks.in/collections/footwear"
-        page_num = 1
-        empty_pages = 0
-        while page_num <= 60:
-            url = f"{base}?page={page_num}"
-            print(f"➡ page {page_num}")
-            try:
-                page.goto(url, timeout=90000, wait_until="domcontentloaded")
-                # common Shopify grids
-                items = page.query_selector_all(
-                    ".product-item, .grid-product, .product-card, .grid__item, .card-wrapper"
-                )
-            except Exception as e:
-                print(f"  ❌ Load error: {e}")
-                empty_pages += 1
-                if empty_pages >= 3:
-                    break
-                page_num += 1
-                continue
-
-            if not items:
-                empty_pages += 1
-                print(f"  ⚠️ Empty page ({empty_pages}/3)")
-                if empty_pages >= 3:
-                    break
-                page_num += 1
-                continue
-
-            added = 0
-            for it in items:
-                try:
-                    name_el = it.query_selector(
-                        ".product-title, .product-name, h3 a, .grid-product__title, .card__heading"
-                    )
-                    price_el = it.query_selector(".price, .product-price, .money, .price-item")
-                    a_el = it.query_selector("a[href*='/products/']")
-                    img_el = it.query_selector("img")
-                    if not (name_el and price_el and a_el and img_el):
-                        continue
-
-                    name = name_el.inner_text().strip()
-                    href = a_el.get_attribute("href") or ""
-                    if href and not href.startswith("http"):
-                        if not href.startswith("/"):
-                            href = "/" + href
-                        href = "https://www.superkicks.in" + href
-                    img = img_el.get_attribute("src") or img_el.get_attribute("data-src") or ""
-                    if img.startswith("//"):
-                        img = "https:" + img
-                    if not img or "placeholder" in img.lower():
-                        continue
-                    import re
-                    price_txt = price_el.inner_text() or "0"
-                    price_match = re.search(r'₹?\s*(\d{1,6})', price_txt)
-                    price = int(price_match.group(1)) if price_match else 0
-                    if price > 50000:
-                        continue
-
-                    doc = {
-                        "_id": gen_id("superkicks", href),
-                        "productName": name,
-                        "brand": "SuperKicks",
-                        "category": "shoes",
-                        "price": price,
-                        "imageUrl": img,
-                        "productUrl": href,
-                        "source": "superkicks",
-                        "scrapedAt": datetime.utcnow(),
-                    }
-                    if save_product(doc, cp):
-                        total += 1
-                        added += 1
-                except Exception as e:
-                    print(f"  ⚠️ Parse error: {e}")
-                    continue
-
-            print(f"  ✅ +{added} (site total: {total})")
-            if added == 0:
-                empty_pages += 1
-                if empty_pages >= 3:
-                    print(f"  🛑 Stopping - no new products found")
-                    break
-            else:
-                empty_pages = 0
-            page_num += 1
-            rand_sleep()
+    return scrape_site(SITES["SuperKicks"])
 
-        ctx.close()
-        browser.close()
 
-    print(f"✅ SuperKicks: {total}")
-    return total
-
-
-# =============================================================
-# VegNonVeg footwear (official site)
-# =============================================================
 def scrape_vegnonveg():
-    print("\n" + "=" * 60)
-    print("🔍 VegNonVeg footwear")
-    print("=" * 60)
-    cp = load_checkpoint()
-    total = 0
-
-    with sync_playwright() as p:
-        browser = get_browser(p)
-        ctx = get_context(browser)
-        page = ctx.new_page()
-
-        base = "https://www.vegnonveg.com/footwear"
-        page_num = 1
-        empty_pages = 0
-        while page_num <= 60:
-            url = f"{base}?page={page_num}"
-            print(f"➡ page {page_num}")
-            try:
-                page.goto(url, timeout=90000, wait_until="domcontentloaded")
-                items = page.query_selector_all(
-                    ".product-item, .product-card, .grid-item, .grid__item, .card-wrapper"
-                )
-            except Exception as e:
-                print(f"  ❌ Load error: {e}")
-                empty_pages += 1
-                if empty_pages >= 3:
-                    break
-                page_num += 1
-                continue
-
-            if not items:
-                empty_pages += 1
-                print(f"  ⚠️ Empty page ({empty_pages}/3)")
-                if empty_pages >= 3:
-                    break
-                page_num += 1
-                continue
-
-            added = 0
-            for it in items:
-                try:
-                    name_el = it.query_selector(
-                        ".product-name, .product-title, h3 a, .card__heading"
-                    )
-                    price_el = it.query_selector(".price, .product-price, .price-item, .money")
-                    a_el = it.query_selector("a[href*='/product/'], a[href*='/footwear/'], a[href*='/products/']")
-                    img_el = it.query_selector("img")
-                    if not (name_el and price_el and a_el and img_el):
-                        continue
-
-                    name = name_el.inner_text().strip()
-                    href = a_el.get_attribute("href") or ""
-                    if href and not href.startswith("http"):
-                        if not href.startswith("/"):
-                            href = "/" + href
-                        href = "https://www.vegnonveg.com" + href
-                    img = img_el.get_attribute("src") or img_el.get_attribute("data-src") or ""
-                    if img.startswith("//"):
-                        img = "https:" + img
-                    if not img or "placeholder" in img.lower():
-                        continue
-                    import re
-                    price_txt = price_el.inner_text() or "0"
-                    price_match = re.search(r'₹?\s*(\d{1,6})', price_txt)
-                    price = int(price_match.group(1)) if price_match else 0
-                    if price > 50000:
-                        continue
-
-                    doc = {
-                        "_id": gen_id("vegnonveg", href),
-                        "productName": name,
-                        "brand": "VegNonVeg",
-                        "category": "shoes",
-                        "price": price,
-                        "imageUrl": img,
-                        "productUrl": href,
-                        "source": "vegnonveg",
-                        "scrapedAt": datetime.utcnow(),
-                    }
-                    if save_product(doc, cp):
-                        total += 1
-                        added += 1
-                except Exception as e:
-                    print(f"  ⚠️ Parse error: {e}")
-                    continue
-
-            print(f"  ✅ +{added} (site total: {total})")
-            if added == 0:
-                empty_pages += 1
-                if empty_pages >= 3:
-                    print(f"  🛑 Stopping - no new products found")
-                    break
-            else:
-                empty_pages = 0
-            page_num += 1
-            rand_sleep()
-
-        ctx.close()
-        browser.close()
-
-    print(f"✅ VegNonVeg: {total}")
-    return total
+    return scrape_site(SITES["VegNonVeg"])
 
 
 # =============================================================
 # Master runner
 # =============================================================
-def run_all_scrapers():
+def run_all_scrapers(engine="sync", extraction="evaluate", profile="light", mode="incremental", verbosity=0,
+                     resume=True, **engine_options):
+    """
+    engine="sync": sites one after another, each in its own browser
+    engine="async": all sites in parallel on one shared headless browser (scrape_engine.py)
+    mode="incremental": listings newest-first, each stops once it reaches products already in the catalog
+    mode="full": every listing from page 1 to the end
+    The catalog is kept either way; products a complete crawl no longer finds
+    are flagged delisted after DELIST_AFTER_RUNS runs instead of being deleted
+    verbosity: 0 periodic summaries only, 1 a line per page, 2 a line per product
+    resume=True continues an unfinished pipeline run of the same engine and mode;
+    False starts over (seen ids and page cursors empty)
+    """
+    incremental = mode == "incremental"
     print("\n" + "=" * 60)
-    print("🚀 START SCRAPER PIPELINE (DB WILL BE CLEARED)")
+    print(f"🚀 START SCRAPER PIPELINE ({mode} crawl, catalog kept)")
     print("=" * 60)
 
-    # wipe DB
-    products.delete_many({})
-    print("🗑️  products collection cleared")
+    state = CrawlState()
+    state.start_run(engine, resume=resume, scope=f"pipeline {mode}")
+    telemetry = CrawlTelemetry(state.run_id, engine, verbosity)
 
-    # reset checkpoint
-    if os.path.exists(CHECKPOINT_FILE):
-        os.remove(CHECKPOINT_FILE)
-        print("🧹 checkpoint reset")
+    if engine == "async":
+        from scrape_engine import ScrapeEngine
 
-    res = {}
-    res["H&M"] = scrape_myntra_hm()
-    res["Nike"] = scrape_myntra_nike()
-    res["Snitch"] = scrape_myntra_snitch()
-    res["Mango"] = scrape_myntra_mango()
-    res["SuperKicks"] = scrape_superkicks()
-    res["VegNonVeg"] = scrape_vegnonveg()
-
-    total_shoes = res["SuperKicks"] + res["VegNonVeg"]
-    total_all = sum(res.values())
+        scrape = ScrapeEngine(list(SITES.values()), extraction=extraction, profile=profile,
+                              state=state, incremental=incremental, telemetry=telemetry, **engine_options)
+        res = asyncio.run(scrape.run())
+        writer = scrape.writer
+        run_scheduler = scrape.scheduler
+    else:
+        writer = ProductWriter(state=state)
+        res = {label: scrape_site(site, extraction, profile, writer, incremental, telemetry)
+               for label, site in SITES.items()}
+        writer.summary()
+        state.finish_run("completed", writer.counts)
+        run_scheduler = scheduler
+
+    delisting = writer.sweep_delisted()
+    telemetry.save_report(writer=writer, scheduler=run_scheduler, mode=mode, delisting=delisting)
+
+    # Targets apply to the catalog, not to what this (possibly incremental) run touched
+    listed = {
+        label: products.count_documents({"source": site["source"], "delisted": {"$ne": True}})
+        for label, site in SITES.items()
+    }
+    total_shoes = listed["SuperKicks"] + listed["VegNonVeg"]
+    total_all = sum(listed.values())
 
     print("\n" + "=" * 60)
-    print("📊 RESULTS")
+    print("📊 RESULTS (seen this run / listed in catalog)")
     print("=" * 60)
-    print(f"H&M (Myntra):    {res['H&M']}")
-    print(f"Nike (Myntra):   {res['Nike']}")
-    print(f"Snitch (Myntra): {res['Snitch']}")
-    print(f"Mango (Myntra):  {res['Mango']}")
-    print(f"SuperKicks:      {res['SuperKicks']}")
-    print(f"VegNonVeg:       {res['VegNonVeg']}")
+    print(f"H&M (Myntra):    {res['H&M']} / {listed['H&M']}")
+    print(f"Nike (Myntra):   {res['Nike']} / {listed['Nike']}")
+    print(f"Snitch (Myntra): {res['Snitch']} / {listed['Snitch']}")
+    print(f"Mango (Myntra):  {res['Mango']} / {listed['Mango']}")
+    print(f"SuperKicks:      {res['SuperKicks']} / {listed['SuperKicks']}")
+    print(f"VegNonVeg:       {res['VegNonVeg']} / {listed['VegNonVeg']}")
     print("-" * 60)
     print(f"Total Shoes:     {total_shoes}")
     print(f"TOTAL ALL:       {total_all}")
 
     print("\n✅ VALIDATION")
     ok = True
-    if res["H&M"] < 1500:
-        print(f"  ⚠️ H&M below target (got {res['H&M']}, need 1500+)")
+    if listed["H&M"] < 1500:
+        print(f"  ⚠️ H&M below target (got {listed['H&M']}, need 1500+)")
         ok = False
     else:
         print("  ✅ H&M target met")
 
-    if res["Nike"] < 500:
-        print(f"  ⚠️ Nike below target (got {res['Nike']}, need 500+)")
+    if listed["Nike"] < 500:
+        print(f"  ⚠️ Nike below target (got {listed['Nike']}, need 500+)")
         ok = False
     else:
         print("  ✅ Nike target met")
 
-    if res["Snitch"] < 500:
-        print(f"  ⚠️ Snitch below target (got {res['Snitch']}, need 500+)")
+    if listed["Snitch"] < 500:
+        print(f"  ⚠️ Snitch below target (got {listed['Snitch']}, need 500+)")
         ok = False
     else:
         print("  ✅ Snitch target met")
 
-    if res["Mango"] < 500:
-        print(f"  ⚠️ Mango below target (got {res['Mango']}, need 500+)")
+    if listed["Mango"] < 500:
+        print(f"  ⚠️ Mango below target (got {listed['Mango']}, need 500+)")
         ok = False
     else:
         print("  ✅ Mango target met")
@@ -555,4 +342,38 @@ def run_all_scrapers():
 
 
 if __name__ == "__main__":
-    run_all_scrapers()
+    parser = argparse.ArgumentParser(description="Scrape all sites into the catalog")
+    parser.add_argument("--mode", choices=["incremental", "full"], default="incremental",
+                        help="incremental: newest-first, stop at known products; full: crawl every listing to the end")
+    parser.add_argument("--engine", choices=["sync", "async"], default="sync",
+                        help="async: crawl every site in parallel on one headless browser")
+    parser.add_argument("--extraction", choices=["evaluate", "per-element"], default="evaluate",
+                        help="Card reading: one page.evaluate per page, or the old per-element calls")
+    parser.add_argument("--profile", choices=list(PROFILES), default="light",
+                        help="light: headless, no images/media/fonts/trackers; full: old headed load")
+    parser.add_argument("--global-limit", type=int, default=6,
+                        help="async: pages open at once across all sites (default: 6)")
+    parser.add_argument("--domain-limit", type=int, default=2,
+                        help="async: pages open at once per domain (default: 2)")
+    parser.add_argument("--base-url",
+                        help="async: fetch every site from this stand-in server (served under /<site>)")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="-v: a line per page, -vv: a line per product (default: periodic summaries)")
+    parser.add_argument("--enrich", action="store_true",
+                        help="Afterwards read detail pages of new/changed products (MRP, sizes, images)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Start a new crawl run instead of resuming an unfinished one")
+    parser.add_argument("--detail-workers", type=int, default=8,
+                        help="--enrich: detail pages in flight (default: 8)")
+    args = parser.parse_args()
+
+    options = {}
+    if args.engine == "async":
+        options = {"global_limit": args.global_limit, "domain_limit": args.domain_limit,
+                   "base_url": args.base_url}
+    run_all_scrapers(args.engine, args.extraction, args.profile, args.mode, args.verbose,
+                     resume=not args.fresh, **options)
+    if args.enrich:
+        from detail_enrich import DetailEnricher
+
+        DetailEnricher(args.detail_workers, verbosity=args.verbose).run(list(SITES.values()))
@@ -1,8 +1,14 @@
 from playwright.sync_api import sync_playwright
 from pymongo import MongoClient
-import datetime
+import argparse
 import time
-import random
+
+from card_extract import ExtractionTimer, extract_cards
+from crawl_telemetry import ITEMS, PAGES, Attempts, CrawlTelemetry
+from ingest import ProductWriter
+from page_profile import goto
+from politeness import PolitenessScheduler
+from scrape_sites import SITES, build_docs, domain_of, myntra_site
 
 # -----------------------------
 # DB SETUP
@@ -11,14 +17,21 @@ client = MongoClient("mongodb://127.0.0.1:27017")
 db = client["value_scout"]
 products = db["products"]
 
+# Bulk upserts; embeddings are only dropped when image/name change
+writer = ProductWriter(products)
+
+# Page pacing, retries and circuit breaker for myntra.com
+scheduler = PolitenessScheduler()
+
+# Per-listing counters and timings; per-product lines only at -vv
+telemetry = CrawlTelemetry(engine="scraper_v2")
+
 def save(product):
-    """Save product to MongoDB"""
-    products.update_one(
-        {"_id": product["_id"]},
-        {"$set": product, "$unset": {"styleEmbedding": ""}},
-        upsert=True
-    )
-    print(f"  ✓ Saved: {product['productName'][:50]}")
+    """Queue product for the next bulk upsert to MongoDB; False if already queued/written"""
+    added = writer.add(product)
+    if added:
+        telemetry.say(ITEMS, f"  ✓ Saved: {product['productName'][:50]}")
+    return added
 
 def get_browser(p):
     return p.chromium.launch(
@@ -41,74 +54,63 @@ def get_context(browser):
     )
 
 # =============================================================
-# 1) SCRAPE NIKE SHOES FROM MYNTRA
+# Shared listing loop (one page.evaluate per listing page)
 # =============================================================
-def scrape_nike_shoes(pages=10):
-    print("\n🔵 Scraping Nike Shoes from Myntra")
+def scrape_listing(site, query, url_for_page, pages, wait_until="load"):
+    """
+    Walk `pages` listing pages of a SITES entry; cards become documents through
+    the site's parser (scrape_sites.myntra_doc), so they match the main scraper's
+    """
+    label = site["label"]
+    timer = ExtractionTimer("evaluate")
+    metrics = telemetry.site(label)
+    seen_in_listing = set() if site["dedupe_urls"] else None
 
     with sync_playwright() as p:
         browser = get_browser(p)
         context = get_context(browser)
         page = context.new_page()
 
-        for i in range(1, pages+1):
-            url = f"https://www.myntra.com/nike-shoes?p={i}"
-            print(f"\n➡ Page {i}: {url}")
+        for i in range(1, pages + 1):
+            url = url_for_page(i)
+            telemetry.say(PAGES, f"\n➡ Page {i}: {url}")
 
+            fetch = Attempts(lambda: goto(page, url, wait_until))
             try:
-                page.goto(url, timeout=90000, wait_until="domcontentloaded")
-                page.wait_for_selector("li.product-base", timeout=20000)
+                load_started = time.perf_counter()
+                scheduler.call(domain_of(url), fetch)
+                page.wait_for_selector(site["wait_for"], timeout=20000)
+                started = timer.start()
+                metrics.observe_load(started - load_started)
+                items = extract_cards(page, site["card"])
+                timer.stop(started, len(items))
+                metrics.observe_extract(timer.samples[-1][0])
             except Exception as e:
-                print(f"  ❌ Error: {e}")
+                telemetry.page_failed(label, query, i, e, fetch.retries)
                 continue
 
-            items = page.query_selector_all("li.product-base")
-            print(f"  ✔ Found {len(items)} items")
-
-            for item in items:
-                try:
-                    brand = item.query_selector("h3.product-brand")
-                    name = item.query_selector("h4.product-product")
-                    
-                    if not brand or not name:
-                        continue
-                        
-                    brand_text = brand.inner_text().strip()
-                    name_text = name.inner_text().strip()
-
-                    img_elem = item.query_selector("img")
-                    img = img_elem.get_attribute("src") if img_elem else ""
-                    if img and img.startswith("//"):
-                        img = "https:" + img
-
-                    link_elem = item.query_selector("a")
-                    link = link_elem.get_attribute("href") if link_elem else ""
-                    if link and not link.startswith("http"):
-                        link = "https://www.myntra.com" + link
+            telemetry.say(PAGES, f"  ✔ Found {len(items)} items")
 
-                    price_el = item.query_selector(".product-discountedPrice")
-                    price = price_el.inner_text().strip() if price_el else "N/A"
-
-                    if link:  # Only save if we have a valid link
-                        doc = {
-                            "_id": f"myntra_nike_{hash(link)}",
-                            "productName": f"{brand_text} {name_text}",
-                            "brand": brand_text,
-                            "category": "shoes",
-                            "price": price,
-                            "imageUrl": img,
-                            "productUrl": link,
-                            "source": "Myntra",
-                            "scrapedAt": datetime.datetime.utcnow(),
-                        }
-                        save(doc)
-
-                except Exception as e:
-                    print(f"  ⚠ Skip item: {e}")
-
-            time.sleep(random.uniform(2, 3))
+            errors = []
+            docs = build_docs(site, items, seen_in_listing, errors)
+            added = sum(1 for doc in docs if save(doc))
+            telemetry.page(label, query, i, len(items), added, len(docs) - added, len(errors), fetch.retries)
 
         browser.close()
+    writer.flush()
+    print(timer.line())
+
+# =============================================================
+# 1) SCRAPE NIKE SHOES FROM MYNTRA
+# =============================================================
+def scrape_nike_shoes(pages=10):
+    print("\n🔵 Scraping Nike Shoes from Myntra")
+    scrape_listing(
+        SITES["Nike"], "shoes",
+        lambda i: f"https://www.myntra.com/nike-shoes?p={i}",
+        pages,
+        wait_until="domcontentloaded",
+    )
 
 # =============================================================
 # 2) SCRAPE H&M CLOTHING FROM MYNTRA
@@ -116,141 +118,26 @@ def scrape_nike_shoes(pages=10):
 def scrape_hm_clothing(category, pages=20):
     """Scrape H&M clothing from Myntra"""
     print(f"\n🟣 Scraping H&M {category} from Myntra")
-
-    with sync_playwright() as p:
-        browser = get_browser(p)
-        context = get_context(browser)
-        page = context.new_page()
-
-        for i in range(1, pages + 1):
-            url = f"https://www.myntra.com/{category}?f=Brand%3AH%26M&p={i}"
-            print(f"\n➡ Page {i}: {url}")
-
-            try:
-                page.goto(url, timeout=90000)
-                page.wait_for_selector("li.product-base", timeout=20000)
-            except Exception as e:
-                print(f"  ❌ Error: {e}")
-                continue
-
-            items = page.query_selector_all("li.product-base")
-            print(f"  ✔ Found {len(items)} items")
-
-            for item in items:
-                try:
-                    brand = item.query_selector("h3.product-brand")
-                    name = item.query_selector("h4.product-product")
-                    
-                    if not brand or not name:
-                        continue
-                        
-                    brand_text = brand.inner_text().strip()
-                    name_text = name.inner_text().strip()
-
-                    img_elem = item.query_selector("img")
-                    img = img_elem.get_attribute("src") if img_elem else ""
-                    if img and img.startswith("//"):
-                        img = "https:" + img
-
-                    link_elem = item.query_selector("a")
-                    link = link_elem.get_attribute("href") if link_elem else ""
-                    if link and not link.startswith("http"):
-                        link = "https://www.myntra.com" + link
-
-                    price_el = item.query_selector(".product-discountedPrice")
-                    price = price_el.inner_text().strip() if price_el else "N/A"
-
-                    if link:
-                        doc = {
-                            "_id": f"myntra_hm_{category}_{hash(link)}",
-                            "productName": f"{brand_text} {name_text}",
-                            "brand": brand_text,
-                            "category": category,
-                            "price": price,
-                            "imageUrl": img,
-                            "productUrl": link,
-                            "source": "Myntra",
-                            "scrapedAt": datetime.datetime.utcnow(),
-                        }
-                        save(doc)
-
-                except Exception as e:
-                    print(f"  ⚠ Skip item: {e}")
-
-            time.sleep(random.uniform(2, 3))
-
-        browser.close()
+    scrape_listing(
+        SITES["H&M"], category,
+        lambda i: f"https://www.myntra.com/{category}?f=Brand%3AH%26M&p={i}",
+        pages,
+    )
 
 # =============================================================
 # 3) SCRAPE ZARA FROM MYNTRA
 # =============================================================
+# Only crawled here, so not in SITES (the main pipeline); target is unused
+ZARA = myntra_site("Zara", target=None)
+
 def scrape_zara_clothing(category, pages=10):
     """Scrape Zara clothing from Myntra"""
     print(f"\n🟡 Scraping Zara {category} from Myntra")
-
-    with sync_playwright() as p:
-        browser = get_browser(p)
-        context = get_context(browser)
-        page = context.new_page()
-
-        for i in range(1, pages + 1):
-            url = f"https://www.myntra.com/{category}?f=Brand%3AZARA&p={i}"
-            print(f"\n➡ Page {i}: {url}")
-
-            try:
-                page.goto(url, timeout=90000)
-                page.wait_for_selector("li.product-base", timeout=20000)
-            except Exception as e:
-                print(f"  ❌ Error: {e}")
-                continue
-
-            items = page.query_selector_all("li.product-base")
-            print(f"  ✔ Found {len(items)} items")
-
-            for item in items:
-                try:
-                    brand = item.query_selector("h3.product-brand")
-                    name = item.query_selector("h4.product-product")
-                    
-                    if not brand or not name:
-                        continue
-                        
-                    brand_text = brand.inner_text().strip()
-                    name_text = name.inner_text().strip()
-
-                    img_elem = item.query_selector("img")
-                    img = img_elem.get_attribute("src") if img_elem else ""
-                    if img and img.startswith("//"):
-                        img = "https:" + img
-
-                    link_elem = item.query_selector("a")
-                    link = link_elem.get_attribute("href") if link_elem else ""
-                    if link and not link.startswith("http"):
-                        link = "https://www.myntra.com" + link
-
-                    price_el = item.query_selector(".product-discountedPrice")
-                    price = price_el.inner_text().strip() if price_el else "N/A"
-
-                    if link:
-                        doc = {
-                            "_id": f"myntra_zara_{category}_{hash(link)}",
-                            "productName": f"{brand_text} {name_text}",
-                            "brand": brand_text,
-                            "category": category,
-                            "price": price,
-                            "imageUrl": img,
-                            "productUrl": link,
-                            "source": "Myntra",
-                            "scrapedAt": datetime.datetime.utcnow(),
-                        }
-                        save(doc)
-
-                except Exception as e:
-                    print(f"  ⚠ Skip item: {e}")
-
-            time.sleep(random.uniform(2, 3))
-
-        browser.close()
+    scrape_listing(
+        ZARA, category,
+        lambda i: f"https://www.myntra.com/{category}?f=Brand%3AZARA&p={i}",
+        pages,
+    )
 
 # =============================================================
 # 4) SCRAPE SNITCH FROM MYNTRA
@@ -258,78 +145,24 @@ def scrape_zara_clothing(category, pages=10):
 def scrape_snitch_clothing(category, pages=10):
     """Scrape Snitch clothing from Myntra"""
     print(f"\n🟢 Scraping Snitch {category} from Myntra")
-
-    with sync_playwright() as p:
-        browser = get_browser(p)
-        context = get_context(browser)
-        page = context.new_page()
-
-        for i in range(1, pages + 1):
-            url = f"https://www.myntra.com/{category}?f=Brand%3ASNITCH&p={i}"
-            print(f"\n➡ Page {i}: {url}")
-
-            try:
-                page.goto(url, timeout=90000)
-                page.wait_for_selector("li.product-base", timeout=20000)
-            except Exception as e:
-                print(f"  ❌ Error: {e}")
-                continue
-
-            items = page.query_selector_all("li.product-base")
-            print(f"  ✔ Found {len(items)} items")
-
-            for item in items:
-                try:
-                    brand = item.query_selector("h3.product-brand")
-                    name = item.query_selector("h4.product-product")
-                    
-                    if not brand or not name:
-                        continue
-                        
-                    brand_text = brand.inner_text().strip()
-                    name_text = name.inner_text().strip()
-
-                    img_elem = item.query_selector("img")
-                    img = img_elem.get_attribute("src") if img_elem else ""
-                    if img and img.startswith("//"):
-                        img = "https:" + img
-
-                    link_elem = item.query_selector("a")
-                    link = link_elem.get_attribute("href") if link_elem else ""
-                    if link and not link.startswith("http"):
-                        link = "https://www.myntra.com" + link
-
-                    price_el = item.query_selector(".product-discountedPrice")
-                    price = price_el.inner_text().strip() if price_el else "N/A"
-
-                    if link:
-                        doc = {
-                            "_id": f"myntra_snitch_{category}_{hash(link)}",
-                            "productName": f"{brand_text} {name_text}",
-                            "brand": brand_text,
-                            "category": category,
-                            "price": price,
-                            "imageUrl": img,
-                            "productUrl": link,
-                            "source": "Myntra",
-                            "scrapedAt": datetime.datetime.utcnow(),
-                        }
-                        save(doc)
-
-                except Exception as e:
-                    print(f"  ⚠ Skip item: {e}")
-
-            time.sleep(random.uniform(2, 3))
-
-        browser.close()
+    scrape_listing(
+        SITES["Snitch"], category,
+        lambda i: f"https://www.myntra.com/{category}?f=Brand%3ASNITCH&p={i}",
+        pages,
+    )
 
 # =============================================================
 # MAIN
 # =============================================================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape the targeted Myntra brands")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="-v: a line per page, -vv: a line per product (default: periodic summaries)")
+    telemetry.verbosity = parser.parse_args().verbose
+
     print("=" * 60)
     print("VALUE SCOUT SCRAPER - TARGETED BRANDS")
-    print("Brands: Nike, H&M, Zara, Snitch, Superkicks, VegNonVeg")
+    print("Brands: Nike, H&M, Zara, Snitch")
     print("=" * 60)
 
     # Nike shoes (10 pages = ~500 products)
@@ -349,6 +182,10 @@ if __name__ == "__main__":
     for cat in ["tshirts", "shirts", "pants", "jeans"]:
         scrape_snitch_clothing(cat, pages=10)
 
+    writer.summary()
+    scheduler.print_summary()
+    telemetry.save_report(products.database["crawl_reports"], writer=writer, scheduler=scheduler)
+
     # Get total count
     total = products.count_documents({})
     print("\n" + "=" * 60)
@@ -0,0 +1,185 @@
+"""
+Static HTML card extraction (no browser)
+Builds a light element tree with the stdlib HTMLParser and evaluates the same
+card specs as card_extract.EXTRACT_JS. Supports the selector subset the specs
+use: tag, .class, #id, [attr], [attr=v], [attr*=v], [attr^=v], compound
+selectors, the descendant combinator and comma-separated groups.
+"""
+
+import re
+from html.parser import HTMLParser
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+             "param", "source", "track", "wbr"}
+SKIP_TEXT_TAGS = {"script", "style", "noscript", "template"}
+
+_SIMPLE_RE = re.compile(
+    r"""(?P<tag>^[a-zA-Z][\w-]*|^\*)|\.(?P<cls>[\w-]+)|\#(?P<id>[\w-]+)"""
+    r"""|\[(?P<attr>[\w-]+)(?:(?P<op>[*^$]?=)['"]?(?P<val>[^'"\]]*)['"]?)?\]"""
+)
+
+
+class Node:
+    __slots__ = ("tag", "attrs", "children", "parent", "classes")
+
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.children = []
+        self.parent = parent
+        self.classes = set((self.attrs.get("class") or "").split())
+
+    def iter(self):
+        """Descendant elements in document order"""
+        stack = list(reversed([c for c in self.children if isinstance(c, Node)]))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed([c for c in node.children if isinstance(c, Node)]))
+
+    def text(self):
+        parts = []
+
+        def walk(node):
+            for child in node.children:
+                if isinstance(child, str):
+                    parts.append(child)
+                elif child.tag not in SKIP_TEXT_TAGS:
+                    walk(child)
+
+        walk(self)
+        return " ".join("".join(parts).split())
+
+    def get(self, name):
+        return self.attrs.get(name)
+
+    def select(self, selector):
+        groups = [_compile(s) for s in selector.split(",") if s.strip()]
+        return [node for node in self.iter() if any(_matches_chain(node, chain) for chain in groups)]
+
+    def select_one(self, selector):
+        groups = [_compile(s) for s in selector.split(",") if s.strip()]
+        for node in self.iter():
+            if any(_matches_chain(node, chain) for chain in groups):
+                return node
+        return None
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document")
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {k: (v if v is not None else "") for k, v in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        node = Node(tag, {k: (v if v is not None else "") for k, v in attrs}, self.current)
+        self.current.children.append(node)
+
+    def handle_endtag(self, tag):
+        # Close up to the matching open element; stray end tags are ignored
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def parse(html: str) -> Node:
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+# ---------- selectors ----------
+_compiled = {}
+
+
+def _compile(selector):
+    """'h3 a.title' -> [compound('h3'), compound('a.title')]"""
+    selector = selector.strip()
+    if selector not in _compiled:
+        chain = []
+        for part in selector.split():
+            compound = []
+            for m in _SIMPLE_RE.finditer(part):
+                if m.group("tag"):
+                    compound.append(("tag", m.group("tag").lower()))
+                elif m.group("cls"):
+                    compound.append(("cls", m.group("cls")))
+                elif m.group("id"):
+                    compound.append(("id", m.group("id")))
+                else:
+                    compound.append(("attr", m.group("attr"), m.group("op"), m.group("val")))
+            chain.append(compound)
+        _compiled[selector] = chain
+    return _compiled[selector]
+
+
+def _matches_compound(node, compound):
+    for test in compound:
+        kind = test[0]
+        if kind == "tag":
+            if test[1] != "*" and node.tag != test[1]:
+                return False
+        elif kind == "cls":
+            if test[1] not in node.classes:
+                return False
+        elif kind == "id":
+            if node.attrs.get("id") != test[1]:
+                return False
+        else:
+            _, name, op, val = test
+            value = node.attrs.get(name)
+            if value is None:
+                return False
+            if op == "=" and value != val:
+                return False
+            if op == "*=" and val not in value:
+                return False
+            if op == "^=" and not value.startswith(val):
+                return False
+            if op == "$=" and not value.endswith(val):
+                return False
+    return True
+
+
+def _matches_chain(node, chain):
+    if not _matches_compound(node, chain[-1]):
+        return False
+    ancestor = node.parent
+    for compound in reversed(chain[:-1]):
+        while ancestor is not None and not (ancestor.tag != "#document" and _matches_compound(ancestor, compound)):
+            ancestor = ancestor.parent
+        if ancestor is None:
+            return False
+        ancestor = ancestor.parent
+    return True
+
+
+def extract_cards_html(html, card):
+    """Same records as card_extract.extract_cards, from a static HTML string"""
+    root = parse(html)
+    records = []
+    for el in root.select(card["container"]):
+        rec = {}
+        for field, spec in card["fields"].items():
+            node = el.select_one(spec["selector"])
+            if node is None:
+                rec[field] = None
+            elif "attr" in spec:
+                rec[field] = next((node.get(a) for a in spec["attr"] if node.get(a)), "")
+            else:
+                rec[field] = node.text()
+        if all(rec[f] is not None for f in card["required"]):
+            records.append(rec)
+    return records
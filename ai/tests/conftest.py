@@ -0,0 +1,58 @@
+"""
+The ai/ scripts import each other as top-level modules (run from ai/)
+Their module-level MongoClients connect lazily, so importing them needs no
+server; tests that need a database use mongomock collections.
+
+    python -m pytest -q ai/tests
+"""
+import inspect
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongomock.collection
+import pytest
+
+from scrape_fixtures import Corpus, fixture_path, serve
+from scrape_sites import SITES, site_slug
+
+
+def _drop_sort(add):
+    def wrapper(self, *args, sort=None, **kwargs):
+        assert sort is None, "mongomock bulk writes cannot sort"
+        return add(self, *args, **kwargs)
+    return wrapper
+
+
+# Recent pymongo hands bulk updates a sort= argument that mongomock 4.3 does not take
+# (bulk_write raised TypeError); none of our UpdateOne/ReplaceOne ops sort
+_bulk = mongomock.collection.BulkOperationBuilder
+for _name in ("add_update", "add_replace"):
+    if "sort" not in inspect.signature(getattr(_bulk, _name)).parameters:
+        setattr(_bulk, _name, _drop_sort(getattr(_bulk, _name)))
+
+
+@pytest.fixture
+def replay(tmp_path):
+    """
+    replay(pages) -> base_url of a scrape_fixtures replay server over a corpus of
+    {(site label, query, page, "html" / "json"): body}; anything else is a 404
+    """
+    servers = []
+
+    def start(pages=None):
+        corpus = Corpus(str(tmp_path / f"corpus{len(servers)}"))
+        for (label, query, page, kind), body in (pages or {}).items():
+            slug = site_slug(SITES[label]["label"])
+            corpus.add({"site": label, "slug": slug, "query": query, "page": page, "kind": kind,
+                        "url": "", "file": fixture_path(slug, query, page, kind)}, body)
+        corpus.save()
+        server, base_url = serve(corpus.root, port=0, background=True)
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
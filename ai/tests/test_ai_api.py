@@ -0,0 +1,52 @@
+import mongomock
+import pytest
+
+import ai_api
+from vector_index import VectorIndex
+
+
+@pytest.fixture
+def client(monkeypatch):
+    products = mongomock.MongoClient().db.products
+    products.insert_many([
+        {"_id": "tee", "category": "tshirt", "styleEmbedding": [1.0, 0.0]},
+        {"_id": "tee2", "category": "tshirt", "styleEmbedding": [0.9, 0.1]},
+        {"_id": "tee3", "category": "tshirt", "styleEmbedding": [0.8, 0.2]},
+        {"_id": "jeans", "category": "jeans", "styleEmbedding": [0.7, 0.3]},
+        # Embedded, but nothing the index can use
+        {"_id": "hollow", "category": "tshirt", "styleEmbedding": []},
+    ])
+    monkeypatch.setattr(ai_api, "products_collection", products)
+    monkeypatch.setattr(ai_api, "style_index", VectorIndex(products))
+    return ai_api.app.test_client()
+
+
+@pytest.mark.parametrize("endpoint", ["style-builder", "similar"])
+def test_missing_query_vector_is_a_400(client, endpoint):
+    resp = client.get(f"/api/{endpoint}/hollow")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "Product has no usable embedding"
+
+
+@pytest.mark.parametrize("endpoint", ["style-builder", "similar"])
+def test_invalid_weights_are_a_400(client, endpoint):
+    resp = client.get(f"/api/{endpoint}/tee?imageWeight=-1")
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "Invalid fusion weights"
+
+
+def test_search_errors_are_not_reported_as_invalid_weights(client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise ValueError("shapes (2,) and (3,) not aligned")
+
+    monkeypatch.setattr(ai_api.style_index, "search", broken)
+    resp = client.get("/api/similar/tee")
+    assert resp.status_code == 500
+    assert resp.get_json()["error"] == "Internal server error"
+
+
+@pytest.mark.parametrize("limit, expected", [("0", 1), ("-3", 1), ("2", 2), ("500", 2)])
+def test_similar_limit_is_clamped(client, limit, expected):
+    resp = client.get(f"/api/similar/tee?limit={limit}")
+    assert resp.status_code == 200
+    assert len(resp.get_json()["similar"]) == expected
@@ -0,0 +1,40 @@
+import pytest
+
+from canonical_urls import canonical_url, repair_url
+
+
+@pytest.mark.parametrize("url, canonical", [
+    # www. and Myntra's trailing /buy
+    ("https://www.myntra.com/tshirts/nike/123/buy", "https://myntra.com/tshirts/nike/123"),
+    ("https://myntra.com/tshirts/nike/123", "https://myntra.com/tshirts/nike/123"),
+    ("HTTPS://WWW.Myntra.com//tshirts/nike/123/", "https://myntra.com/tshirts/nike/123"),
+    # Shopify collection paths, query strings and fragments
+    ("https://www.superkicks.in/collections/footwear/products/nike-dunk?variant=1#top",
+     "https://superkicks.in/products/nike-dunk"),
+    ("https://www.superkicks.in/products/nike-dunk?utm_source=x", "https://superkicks.in/products/nike-dunk"),
+    ("//www.superkicks.in/products/nike-dunk", "https://superkicks.in/products/nike-dunk"),
+    # A path glued onto the domain
+    ("https://www.myntra.comtshirts/nike/123/buy", "https://myntra.com/tshirts/nike/123"),
+    ("https://www.vegnonveg.comfootwear/samba-og", "https://vegnonveg.com/footwear/samba-og"),
+    # Stand-in server: host, port and site prefix are kept
+    ("http://127.0.0.1:8765/superkicks/products/nike-dunk?x=1", "https://127.0.0.1:8765/superkicks/products/nike-dunk"),
+    # No host, no key
+    ("/products/nike-dunk", ""),
+    ("", ""),
+    (None, ""),
+])
+def test_canonical_url(url, canonical):
+    assert canonical_url(url) == canonical
+
+
+@pytest.mark.parametrize("url, repaired", [
+    ("https://www.myntra.comtshirts/nike/123/buy", "https://www.myntra.com/tshirts/nike/123/buy"),
+    ("https://www.superkicks.incollections/footwear", "https://www.superkicks.in/collections/footwear"),
+    ("//www.superkicks.in/products/nike-dunk", "https://www.superkicks.in/products/nike-dunk"),
+    # Anything else is left exactly as it is
+    ("https://www.myntra.com/tshirts/nike/123/buy?src=x", "https://www.myntra.com/tshirts/nike/123/buy?src=x"),
+    ("http://127.0.0.1:8765/hm/tshirts/1/buy", "http://127.0.0.1:8765/hm/tshirts/1/buy"),
+    ("  https://www.myntra.com/shoes/1  ", "https://www.myntra.com/shoes/1"),
+])
+def test_repair_url(url, repaired):
+    assert repair_url(url) == repaired
@@ -0,0 +1,42 @@
+import pytest
+
+from categories import classify
+
+# Real listing titles (H&M, Nike, Snitch, Mango on Myntra; SuperKicks; VegNonVeg)
+TITLES = [
+    ("H&M Jersey Shorts", "shorts"),
+    ("H&M Men Jersey Joggers", "pants"),
+    ("Women Jersey Dress", "dress"),
+    ("Nike Men Football Jersey", "tshirt"),
+    ("Women Boot Cut Jeans", "jeans"),
+    ("Mango Women Boot-Cut Trousers", "pants"),
+    ("Men Chelsea Boots", "shoes"),
+    ("Snitch Men Formal Dress Shirt", "shirt"),
+    ("H&M Women Sweatshirt Dress", "dress"),
+    ("H&M Men Relaxed Fit Sweatshirt", "hoodie"),
+    ("H&M Men Sweatpants", "pants"),
+    ("Nike Men Solid Trackpants", "pants"),
+    ("Mango Women Denim Jacket", "jacket"),
+    ("H&M Women Denim Shorts", "shorts"),
+    ("Mango Women Denim Skirt", "dress"),
+    ("Snitch Men Slim Fit Denim", "jeans"),
+    ("Nike Men Dri-FIT Running Shorts", "shorts"),
+    ("Nike Sportswear Club Fleece Men's Hoodie", "hoodie"),
+    ("Nike Men Polo T-shirt", "tshirt"),
+    ("Snitch Men Cuban Collar Shirt", "shirt"),
+    ("Mango Women Ribbed Crop Top", "shirt"),
+    ("Snitch Men Cargo Shorts", "shorts"),
+    ("Air Jordan 1 Low", "shoes"),
+    ("Nike Air Force 1 '07 Men's Shoes", "shoes"),
+    ("H&M Women Scarf", "clothing"),
+]
+
+
+@pytest.mark.parametrize("title, category", TITLES)
+def test_title_category(title, category):
+    assert classify(title) == category
+
+
+def test_url_path_when_the_name_has_no_garment_word():
+    assert classify("Nike Dunk Low Retro", "https://www.myntra.com/tshirts/nike/nike-graphic-tee/123/buy") == "tshirt"
+    assert classify("Samba OG") == "clothing"
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+import requests
+
+import crawl_frontier
+from crawl_frontier import JOB_FIELD, Frontier, page_id
+from scrape_sites import MAX_EMPTY_PAGES, SITES, fetch_base, listing_url
+from static_html import extract_cards_html
+
+SITE = SITES["SuperKicks"]
+QUERY = SITE["queries"][0]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(crawl_frontier, "MongoClient", lambda uri: client)
+    return client
+
+
+def frontier(owner, **kwargs):
+    return Frontier(owner=owner, **kwargs)
+
+
+def cards(*numbers):
+    return [{"name": f"Runner {n}", "href": f"/products/runner-{n}", "img": f"https://cdn.shopify.com/runner-{n}.jpg",
+             "price": "4999"} for n in numbers]
+
+
+def card_page(*numbers):
+    return "".join(
+        f'<div class="card-wrapper"><a href="/products/runner-{n}"><img src="https://cdn.shopify.com/runner-{n}.jpg"></a>'
+        f'<h3 class="card__heading">Runner {n}</h3><span class="price-item">₹ 4,999.00</span></div>'
+        for n in numbers
+    )
+
+
+def states(f, run_id):
+    return {d["page"]: d["state"] for d in f.pages.find({"run": run_id, "site": SITE["label"], "query": QUERY})}
+
+
+def run_page(f, run_id, records, writer):
+    """Claim the next page and finish it with the given records"""
+    slots, slot, pages, job = f.claim(run_id)
+    slots.complete(slot["_id"], {})
+    f.finish_page(run_id, SITE, job, records, writer, pages)
+    return job["page"]
+
+
+def test_seed_queues_the_lookahead_pages_and_domain_slots(client):
+    f = frontier("w1")
+    run_id = f.seed([SITE, SITES["Nike"]], domain_limit=2, lookahead=3)
+    assert states(f, run_id) == {1: "pending", 2: "pending", 3: "pending"}
+    assert f.pages.count_documents({"run": run_id, "site": "Nike"}) == 3 * len(SITES["Nike"]["queries"])
+    assert sorted(d["domain"] for d in f.slots.find({"run": run_id})) == [
+        "www.myntra.com", "www.myntra.com", "www.superkicks.in", "www.superkicks.in",
+    ]
+    # Queuing is idempotent: another worker's enqueue leaves claimed pages alone
+    f.pages.update_one({"_id": page_id(run_id, SITE["label"], QUERY, 1)}, {"$set": {"state": "done"}})
+    f.enqueue(run_id, SITE, QUERY, [1, 2, 4])
+    assert states(f, run_id) == {1: "done", 2: "pending", 3: "pending", 4: "pending"}
+
+
+def test_claims_are_capped_per_domain_across_workers(client):
+    run_id = frontier("seed").seed([SITE], domain_limit=1, lookahead=2)
+    first, second = frontier("w1"), frontier("w2")
+    slots, slot, pages, job = first.claim(run_id)
+    assert job["page"] == 1
+    # The only slot of the domain is held, so the other worker gets nothing even with page 2 pending
+    assert second.claim(run_id) is None
+    slots.complete(slot["_id"], {})
+    _, _, _, job2 = second.claim(run_id)
+    assert job2["page"] == 2
+
+
+def test_pages_with_new_products_queue_the_next_lookahead(client):
+    f = frontier("w1")
+    run_id = f.seed([SITE], domain_limit=1, lookahead=2)
+    writer = f.writer(run_id)
+    run_page(f, run_id, cards(1, 2), writer)
+    assert states(f, run_id) == {1: "done", 2: "pending", 3: "pending"}
+    assert f.pages.find_one({"_id": page_id(run_id, SITE["label"], QUERY, 1)})["added"] == 2
+    assert f.runs.find_one({"_id": run_id})["totals"] == {SITE["label"]: 2}
+
+
+def test_workers_write_to_the_frontier_database(client):
+    f = frontier("w1")
+    run_id = f.seed([SITE], domain_limit=1, lookahead=1)
+    writer = f.writer(run_id)
+    assert writer.collection is client["value_scout"]["products"]
+    run_page(f, run_id, cards(1, 2), writer)
+    assert client["value_scout"]["products"].count_documents({"lastSeenRun": run_id}) == 2
+    # A second worker sees them as written in this run, so the same page adds nothing
+    other = frontier("w2")
+    other.enqueue(run_id, SITE, QUERY, [5])
+    f.pages.update_many({"run": run_id, "page": {"$ne": 5}}, {"$set": {"state": "done"}})
+    run_page(other, run_id, cards(1, 2), other.writer(run_id))
+    assert f.runs.find_one({"_id": run_id})["totals"] == {SITE["label"]: 2}
+
+
+def test_empty_pages_stop_the_listing(client):
+    f = frontier("w1")
+    run_id = f.seed([SITE], domain_limit=1, lookahead=2)
+    writer = f.writer(run_id)
+    run_page(f, run_id, cards(1, 2), writer)
+    # Products another page already wrote in this run are not new
+    for _ in range(MAX_EMPTY_PAGES):
+        run_page(f, run_id, cards(1, 2), writer)
+    # An empty page only queues the one after it, so nothing is left past the last one
+    assert states(f, run_id) == {n: "done" for n in range(1, 2 + MAX_EMPTY_PAGES)}
+    assert f.claim(run_id) is None
+    assert f.drained(run_id)
+    assert f.runs.find_one({"_id": run_id})["status"] == "completed"
+
+
+def test_target_skips_the_rest_of_the_site(client):
+    site = {**SITE, "target": 3}
+    f = frontier("w1")
+    run_id = f.seed([site], domain_limit=1, lookahead=3)
+    writer = f.writer(run_id)
+    slots, slot, pages, job = f.claim(run_id)
+    slots.complete(slot["_id"], {})
+    f.finish_page(run_id, site, job, cards(1, 2, 3), writer, pages)
+    assert states(f, run_id) == {1: "done", 2: "skipped", 3: "skipped"}
+    assert f.drained(run_id)
+
+
+def test_a_failed_page_does_not_count_as_empty(client):
+    f = frontier("w1", max_attempts=1)
+    run_id = f.seed([SITE], domain_limit=1, lookahead=1)
+    slots, slot, pages, job = f.claim(run_id)
+    slots.complete(slot["_id"], {})
+    f.fail_page(run_id, SITE, job, RuntimeError("timeout"), pages)
+    assert states(f, run_id) == {1: "failed", 2: "pending"}
+
+
+def test_workers_crawl_a_replayed_listing_until_it_runs_dry(client, replay):
+    # Pages 3 onwards repeat page 2, as a listing past its end does
+    base_url = replay({
+        ("SuperKicks", QUERY, page, "html"): card_page(1, 2) if page == 1 else card_page(3, 4)
+        for page in range(1, 10)
+    })
+    run_id = frontier("seed").seed([SITE], domain_limit=2, lookahead=2, base_url=base_url)
+    workers = [(f, f.writer(run_id)) for f in (frontier("w0"), frontier("w1"))]
+    turn = 0
+    while True:
+        f, writer = workers[turn % len(workers)]
+        turn += 1
+        claim = f.claim(run_id)
+        if claim is None:
+            if f.drained(run_id):
+                break
+            continue
+        slots, slot, pages, job = claim
+        resp = requests.get(listing_url(SITE, job["query"], job["page"], fetch_base(SITE, base_url)), timeout=5)
+        slots.complete(slot["_id"], {})
+        f.finish_page(run_id, SITE, job, extract_cards_html(resp.text, SITE["card"]), writer, pages)
+
+    f = workers[0][0]
+    pages = states(f, run_id)
+    done = sorted(n for n, s in pages.items() if s == "done")
+    assert done == list(range(1, 3 + MAX_EMPTY_PAGES))
+    assert all(s == "skipped" for n, s in pages.items() if n not in done)
+    assert f.runs.find_one({"_id": run_id})["totals"] == {SITE["label"]: 4}
+    assert client["value_scout"]["products"].count_documents({}) == 4
+    assert f.status(run_id)["workers"] == 2
+
+
+def test_drained_only_poisons_its_own_run(client):
+    f = frontier("w1", max_attempts=1)
+    runs = [f.seed([SITE], domain_limit=1, lookahead=1) for _ in range(2)]
+    # Both runs hold a lease that expired on its final attempt (a crashed worker)
+    expired = {"owner": "gone", "attempts": 1, "expiresAt": datetime.utcnow() - timedelta(minutes=1)}
+    for run_id in runs:
+        f.pages.update_many({"run": run_id}, {"$set": {JOB_FIELD: dict(expired)}})
+    f.drained(runs[0])
+    status = {d["run"]: d[JOB_FIELD].get("status") for d in f.pages.find({"page": 1})}
+    assert status == {runs[0]: "poisoned", runs[1]: None}
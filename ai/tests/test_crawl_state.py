@@ -0,0 +1,49 @@
+from crawl_state import CrawlState, run_scope
+
+
+def test_resume_only_picks_up_the_same_engine_and_scope(tmp_path):
+    path = str(tmp_path / "state.db")
+    pipeline = CrawlState(path)
+    pipeline_run = pipeline.start_run("sync", scope="pipeline incremental")
+
+    # A one-site run neither resumes nor abandons the unfinished pipeline run
+    single = CrawlState(path)
+    single_run = single.start_run("sync", scope=run_scope(["Nike"]))
+    assert single_run != pipeline_run and not single.resumed
+    single.finish_run("completed")
+    assert CrawlState(path).start_run("async", scope="pipeline incremental") != pipeline_run
+
+    again = CrawlState(path)
+    assert again.start_run("sync", scope="pipeline incremental") == pipeline_run
+    assert again.resumed
+    assert {r["run_id"]: r["status"] for r in again.runs()}[pipeline_run] == "running"
+
+
+def test_resume_reloads_seen_ids_and_cursors(tmp_path):
+    path = str(tmp_path / "state.db")
+    state = CrawlState(path)
+    state.start_run("http", scope=run_scope(["SuperKicks"]))
+    state.commit(["a", "b"], {("SuperKicks", "sneakers"): {"page": 2, "empty_pages": 0, "added": 2, "done": False}})
+
+    resumed = CrawlState(path)
+    resumed.start_run("http", scope=run_scope(["SuperKicks"]))
+    assert resumed.is_seen("a") and resumed.is_seen("b")
+    assert resumed.cursor("SuperKicks", "sneakers")["page"] == 2
+    assert resumed.start_run("http", resume=False, scope=run_scope(["SuperKicks"])) != state.run_id
+
+
+def test_finish_run_prunes_old_runs_but_keeps_unfinished_ones(tmp_path):
+    path = str(tmp_path / "state.db")
+    crashed = CrawlState(path)
+    crashed.start_run("sync", scope="pipeline full")
+    crashed.commit(["kept"], {})
+    finished = []
+    for _ in range(3):
+        state = CrawlState(path)
+        state.start_run("http", scope=run_scope(["VegNonVeg"]))
+        state.commit([f"id-{state.run_id}"], {})
+        state.finish_run("completed", keep_runs=1)
+        finished.append(state.run_id)
+
+    runs_with_ids = {r[0] for r in state.db.execute("SELECT DISTINCT run_id FROM seen")}
+    assert runs_with_ids == {crashed.run_id, finished[-1]}
@@ -0,0 +1,37 @@
+import json
+import os
+
+import mongomock
+
+import crawl_telemetry
+from crawl_telemetry import CrawlTelemetry
+
+
+def test_one_log_per_run_closed_by_save_report(tmp_path):
+    log_dir = str(tmp_path / "logs")
+    telemetry = CrawlTelemetry("run1", json_log=log_dir)
+    # Nothing is created until the first event
+    assert not os.path.exists(log_dir)
+
+    telemetry.page("Nike", "nike-men", 1, cards=50, added=48)
+    telemetry.save_report(mongomock.MongoClient().db.crawl_reports)
+    assert telemetry._log is None
+
+    with open(os.path.join(log_dir, "run1.jsonl"), encoding="utf-8") as f:
+        events = [json.loads(line)["event"] for line in f]
+    assert events == ["page", "run"]
+
+
+def test_old_logs_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(crawl_telemetry, "JSON_LOG_KEEP", 3)
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    for i in range(5):
+        path = log_dir / f"old{i}.jsonl"
+        path.write_text("{}\n")
+        os.utime(path, (i, i))
+
+    telemetry = CrawlTelemetry("new", json_log=str(log_dir), worker="w1")
+    telemetry.event("summary")
+    telemetry.close()
+    assert sorted(os.listdir(log_dir)) == ["new-w1.jsonl", "old3.jsonl", "old4.jsonl"]
@@ -0,0 +1,72 @@
+import mongomock
+import pytest
+
+from crawl_state import CrawlState
+from ingest import DELIST_AFTER_RUNS, ProductWriter
+
+
+@pytest.fixture
+def writer(tmp_path):
+    state = CrawlState(str(tmp_path / "state.db"))
+    state.start_run("sync", scope="pipeline incremental")
+    return ProductWriter(collection=mongomock.MongoClient().db.products, state=state)
+
+
+def stored(writer, pid, source, query=None, page=None, seen=False, missed=0):
+    doc = {"_id": pid, "source": source, "lastSeenRun": writer.state.run_id if seen else "earlier-run",
+           "missedRuns": missed}
+    if query is not None:
+        doc["listing"] = {"query": query, "page": page}
+    writer.collection.insert_one(doc)
+    if seen:
+        writer.by_source.setdefault(source, {"new": 0, "changed": 0, "unchanged": 0})
+
+
+def missed(writer):
+    return {d["_id"]: d.get("missedRuns", 0) for d in writer.collection.find()}
+
+
+def test_listing_stopped_at_its_target_is_swept_up_to_its_last_page(writer):
+    stored(writer, "seen", "myntra_hm", "hm-men", 1, seen=True)
+    stored(writer, "gone", "myntra_hm", "hm-men", 2)
+    stored(writer, "further-down", "myntra_hm", "hm-men", 7)
+    stored(writer, "other-listing", "myntra_hm", "hm-women", 1)
+    stored(writer, "no-listing", "myntra_hm")
+    writer.listing_done("myntra_hm", "hm-men", 3)
+    # The target was met before the second listing started
+    writer.listing_done("myntra_hm", "hm-women", 0)
+
+    result = writer.sweep_delisted()
+    assert result["sources"] == ["myntra_hm"]
+    assert missed(writer) == {"seen": 0, "gone": 1, "further-down": 0, "other-listing": 0, "no-listing": 0}
+
+
+def test_listing_crawled_to_its_end_sweeps_the_whole_source(writer):
+    stored(writer, "seen", "vegnonveg", "footwear", 1, seen=True)
+    stored(writer, "gone", "vegnonveg", "footwear", 9)
+    stored(writer, "no-listing", "vegnonveg", missed=DELIST_AFTER_RUNS - 1)
+    writer.listing_done("vegnonveg", "footwear")
+
+    assert writer.sweep_delisted() == {"missed": 2, "delisted": 1, "sources": ["vegnonveg"]}
+    assert writer.collection.find_one({"_id": "no-listing"})["delisted"] is True
+
+
+def test_partial_source_is_not_swept(writer):
+    stored(writer, "seen", "superkicks", "sneakers", 1, seen=True)
+    stored(writer, "gone", "superkicks", "sneakers", 1)
+    writer.listing_done("superkicks", "sneakers")
+    writer.mark_partial("superkicks")
+
+    assert writer.sweep_delisted()["sources"] == []
+    assert missed(writer)["gone"] == 0
+
+
+def test_known_excludes_products_written_earlier_in_the_run(writer):
+    stored(writer, "catalogued", "myntra_nike")
+    stored(writer, "written-this-run", "myntra_nike", seen=True)
+    # Catalogued before the run, but already queued again in it
+    stored(writer, "queued", "myntra_nike")
+    writer.add({"_id": "queued", "source": "myntra_nike"})
+
+    assert writer.known(["catalogued", "written-this-run", "queued", "new"]) == {"catalogued"}
+    assert writer.known(["catalogued", "written-this-run"], this_run=True) == {"written-this-run"}
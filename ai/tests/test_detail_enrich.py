@@ -0,0 +1,38 @@
+import json
+
+import mongomock
+
+from detail_enrich import DetailEnricher
+from politeness import PolitenessScheduler
+from scrape_sites import SITES
+
+FAST = {"retries": 0, "backoff_base": 0.0, "burst": 100, "rate": 1000.0}
+
+DUNK = {
+    "options": [{"name": "Size"}],
+    "variants": [{"option1": "UK 8", "price": 869500, "compare_at_price": 999500, "available": True}],
+    "images": ["//www.superkicks.in/cdn/shop/files/dunk.jpg"],
+}
+
+
+def test_a_parser_error_fails_only_that_product(replay, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    site = SITES["SuperKicks"]
+    col = mongomock.MongoClient().db.products
+    col.insert_many([
+        {"_id": handle, "productName": handle, "source": site["source"], "contentFingerprint": "f",
+         "productUrl": f"https://www.superkicks.in/products/{handle}"}
+        for handle in ("dunk", "odd")
+    ])
+    base_url = replay({
+        ("SuperKicks", "products/dunk.js", 1, "html"): json.dumps(DUNK),
+        # Not the object parse_shopify expects: .get on a list raises AttributeError
+        ("SuperKicks", "products/odd.js", 1, "html"): "[]",
+    })
+    enricher = DetailEnricher(workers=2, base_url=base_url, collection=col, scheduler=PolitenessScheduler(FAST))
+    assert enricher.run([site]) == {"SuperKicks": 1}
+    dunk, odd = col.find_one({"_id": "dunk"}), col.find_one({"_id": "odd"})
+    assert (dunk["mrp"], dunk["discountPercent"], dunk["sizes"]) == (9995, 13, ["UK 8"])
+    assert "enrichedAt" in dunk
+    assert odd["detailError"].startswith("AttributeError")
+    assert "enrichedAt" not in odd
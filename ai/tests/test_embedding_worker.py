@@ -0,0 +1,61 @@
+import mongomock
+from pymongo.errors import AutoReconnect
+
+import embedding_worker
+from embedding_worker import EmbeddingWorker
+from embeddings import JOB_FIELD
+
+
+def make_worker(monkeypatch, collection):
+    monkeypatch.setattr(embedding_worker, "get_model", lambda: None)
+    worker = EmbeddingWorker(collection, sweep_seconds=3600, error_backoff_seconds=0.0)
+    # No change stream on mongomock; the watch thread would fall back to polling
+    monkeypatch.setattr(worker, "_watch_changes", lambda: None)
+    return worker
+
+
+def test_claim_error_releases_claims_and_keeps_running(monkeypatch):
+    collection = mongomock.MongoClient().db.products
+    collection.insert_one({"_id": "p1", JOB_FIELD: {"owner": "me", "attempts": 1, "status": "leased"}})
+    worker = make_worker(monkeypatch, collection)
+    worker.queue.owner = "me"
+    calls = []
+
+    def collect():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            # Claimed p1, then lost the connection while filling the batch
+            worker.queue.held.add("p1")
+            raise AutoReconnect("connection reset")
+        worker.stop()
+        return []
+
+    monkeypatch.setattr(worker, "_collect_batch", collect)
+    worker.run()
+
+    assert len(calls) == 2
+    job = collection.find_one({"_id": "p1"})[JOB_FIELD]
+    assert job["status"] == "released" and job["attempts"] == 0 and "owner" not in job
+    assert not worker.queue.held
+
+
+def test_embed_error_fails_the_batch_and_keeps_running(monkeypatch):
+    worker = make_worker(monkeypatch, mongomock.MongoClient().db.products)
+    batches = [[{"_id": "p1"}, {"_id": "p2"}], []]
+    failed = []
+
+    def collect():
+        if len(batches) == 1:
+            worker.stop()
+        return batches.pop(0)
+
+    def embed(batch, progress):
+        raise RuntimeError("CUDA out of memory")
+
+    monkeypatch.setattr(worker, "_collect_batch", collect)
+    monkeypatch.setattr(worker, "_embed_batch", embed)
+    monkeypatch.setattr(worker, "_fail_batch", lambda batch, error, progress: failed.append((batch, str(error))))
+    worker.run()
+
+    assert failed == [([{"_id": "p1"}, {"_id": "p2"}], "CUDA out of memory")]
+    assert batches == []
@@ -0,0 +1,139 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mongomock
+import pytest
+
+from crawl_telemetry import CrawlTelemetry
+from http_ingest import HttpIngest, shopify_records
+from ingest import ProductWriter
+from politeness import PolitenessScheduler
+from scrape_sites import MAX_FAILED_PAGES, SITES
+
+# No backoff between retries and a breaker that never opens, so only the failed-page count stops a listing
+FAST = {"retries": 0, "backoff_base": 0.0, "burst": 100, "rate": 1000.0, "breaker_threshold": 1000}
+
+
+class Unavailable(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_error(503)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def down():
+    """A server that answers 503 to everything, which the politeness scheduler counts as a failure"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Unavailable)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def ingest(base_url, policy=FAST):
+    job = HttpIngest(base_url=base_url, mode="html", scheduler=PolitenessScheduler(policy))
+    job.telemetry = CrawlTelemetry(engine="http", json_log=None)
+    return job
+
+
+def crawl(job, site, feed=False):
+    # Nothing reaches the collection: the writer's buffer is never full in these tests
+    writer = ProductWriter(collection=mongomock.MongoClient().db.products)
+    stats = {"requests": 0, "bytes": 0, "seconds": 0.0, "retries": 0, "products": 0}
+    cursor = {"page": 0, "empty_pages": 0, "added": 0, "done": False}
+    if feed:
+        return job.crawl_feed(site, site["queries"][0], writer, stats, cursor), writer, stats
+    job.crawl_html(site, site["queries"][0], writer, stats, cursor)
+    return writer, stats
+
+
+def product(handle, variants, images=None):
+    """A products.json entry; one image named after the handle unless images are given"""
+    if images is None:
+        images = [f"https://cdn.shopify.com/s/files/1/{handle}.jpg"]
+    return {"title": handle.replace("-", " ").title(), "handle": handle, "variants": variants,
+            "images": [{"src": src} for src in images]}
+
+
+def test_failed_pages_stop_the_listing(replay):
+    # Empty corpus: every page is a 404
+    site = SITES["VegNonVeg"]
+    writer, stats = crawl(ingest(replay()), site)
+    assert stats["requests"] == MAX_FAILED_PAGES < site["max_pages"]
+    assert site["source"] in writer.partial
+
+
+def test_open_breaker_stops_the_listing(down):
+    site = SITES["VegNonVeg"]
+    writer, stats = crawl(ingest(down, {**FAST, "breaker_threshold": 1, "breaker_cooldown": 0.0}), site)
+    assert stats["requests"] == 1
+    assert site["source"] in writer.partial
+
+
+def test_shopify_records_take_the_lowest_available_variant_price():
+    payload = {"products": [
+        # The cheapest variant is sold out
+        product("nike-dunk-low", [{"price": "7495.00", "available": False}, {"price": "8695.00", "available": True},
+                                  {"price": "9995.00", "available": True}]),
+        # Nothing in stock: all variants count
+        product("samba-og", [{"price": "10999.00", "available": False}, {"price": "9999.00", "available": False}]),
+        # No availability flags
+        product("gel-kayano", [{"price": "15999.00"}, {"price": "14999.50"}],
+                images=["https://cdn.shopify.com/a.jpg", "https://cdn.shopify.com/b.jpg"]),
+    ]}
+    assert shopify_records(payload) == [
+        {"name": "Nike Dunk Low", "href": "/products/nike-dunk-low",
+         "img": "https://cdn.shopify.com/s/files/1/nike-dunk-low.jpg", "price": "8695"},
+        {"name": "Samba Og", "href": "/products/samba-og",
+         "img": "https://cdn.shopify.com/s/files/1/samba-og.jpg", "price": "9999"},
+        {"name": "Gel Kayano", "href": "/products/gel-kayano", "img": "https://cdn.shopify.com/a.jpg", "price": "14999"},
+    ]
+
+
+def test_shopify_records_missing_fields():
+    assert shopify_records({}) == []
+    assert shopify_records({"products": [{}, {"title": "Gift Card", "variants": [{"price": None}], "images": []}]}) == [
+        {"name": "", "href": "", "img": "", "price": "0"},
+        {"name": "Gift Card", "href": "", "img": "", "price": "0"},
+    ]
+
+
+def test_feed_pages_are_crawled_until_an_empty_page(replay):
+    site = SITES["SuperKicks"]
+    query = site["queries"][0]
+    feed = [
+        {"products": [product("nike-dunk-low", [{"price": "8695.00"}]), product("samba-og", [{"price": "10999.00"}])]},
+        # A product seen on an earlier page is not added twice; one without an image is dropped
+        {"products": [product("samba-og", [{"price": "10999.00"}]), product("no-image", [{"price": "999"}], images=[])]},
+        {"products": []},
+    ]
+    base_url = replay({("SuperKicks", query, page, "json"): json.dumps(body) for page, body in enumerate(feed, 1)})
+    used_feed, writer, stats = crawl(ingest(base_url), site, feed=True)
+    assert used_feed
+    assert stats["requests"] == 3
+    assert sorted((d["productName"], d["price"], d["productUrl"]) for d in writer.buffer.values()) == [
+        ("Nike Dunk Low", 8695, "https://www.superkicks.in/products/nike-dunk-low"),
+        ("Samba Og", 10999, "https://www.superkicks.in/products/samba-og"),
+    ]
+    assert writer.cursors[("SuperKicks", query)] == {"page": 3, "empty_pages": 0, "added": 2, "done": True}
+    assert not writer.partial
+
+
+def test_missing_feed_falls_back_to_html(replay):
+    used_feed, writer, stats = crawl(ingest(replay()), SITES["SuperKicks"], feed=True)
+    assert not used_feed
+    assert stats["requests"] == 1
+    assert not writer.partial and not writer.buffer
+
+
+def test_failed_feed_page_marks_the_source_partial(replay):
+    site = SITES["SuperKicks"]
+    base_url = replay({("SuperKicks", site["queries"][0], 1, "json"):
+                       json.dumps({"products": [product("nike-dunk-low", [{"price": "8695.00"}])]})})
+    used_feed, writer, stats = crawl(ingest(base_url), site, feed=True)
+    assert used_feed
+    assert len(writer.buffer) == 1
+    assert site["source"] in writer.partial
@@ -0,0 +1,27 @@
+import mongomock
+
+from ingest import ProductWriter
+
+
+def product(pid, url, price):
+    return {"_id": pid, "productName": f"Runner {pid}", "brand": "Nike", "category": "shoes", "price": price,
+            "imageUrl": f"https://cdn.example.com/{pid}.jpg", "productUrl": url, "source": "myntra_nike"}
+
+
+def test_duplicate_upserts_record_no_price_history(monkeypatch):
+    col = mongomock.MongoClient().db.products
+    writer = ProductWriter(collection=col)
+    writer.add(product("a", "https://www.myntra.com/shoes/nike/1/buy", 4999))
+    writer.add(product("b", "https://www.myntra.com/shoes/nike/2/buy", 5999))
+    bulk_write = col.bulk_write
+
+    def racing_bulk_write(ops, ordered=True):
+        # Another worker stores product 2 under its own id between the lookup and the write
+        col.insert_one({"_id": "other", "canonicalUrl": "https://myntra.com/shoes/nike/2"})
+        return bulk_write(ops, ordered=ordered)
+
+    monkeypatch.setattr(col, "bulk_write", racing_bulk_write)
+    writer.flush()
+    assert writer.counts["duplicates"] == 1
+    assert sorted(d["_id"] for d in col.find()) == ["a", "other"]
+    assert [d["productId"] for d in col.database["price_history"].find()] == ["a"]
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from politeness import PolitenessScheduler, TransientError
+
+# Breaker opens after one failure; no cooldown or backoff, so the next request is the half-open probe
+POLICY = {"breaker_threshold": 1, "breaker_cooldown": 0.0, "breaker_max_cooldown": 0.0,
+          "retries": 0, "backoff_base": 0.0, "burst": 10, "rate": 100.0}
+
+
+def open_breaker(scheduler, domain):
+    def fail():
+        raise TransientError("HTTP 500")
+    with pytest.raises(TransientError):
+        scheduler.call(domain, fail)
+
+
+def test_cancelled_probe_frees_the_domain():
+    scheduler = PolitenessScheduler(POLICY)
+    open_breaker(scheduler, "shop.test")
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(3600)
+
+        probe = asyncio.create_task(scheduler.call_async("shop.test", hang))
+        await started.wait()
+        assert scheduler.domains["shop.test"].probing
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert not scheduler.domains["shop.test"].probing
+
+        async def ok():
+            return "page"
+        # Would poll every 0.5s forever if the cancelled probe still held the domain
+        return await asyncio.wait_for(scheduler.call_async("shop.test", ok), timeout=2)
+
+    assert asyncio.run(scenario()) == "page"
+    assert scheduler.domains["shop.test"].failures == 0
+
+
+def test_interrupted_sync_probe_frees_the_domain():
+    scheduler = PolitenessScheduler(POLICY)
+    open_breaker(scheduler, "shop.test")
+
+    def interrupted():
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.call("shop.test", interrupted)
+    assert not scheduler.domains["shop.test"].probing
+    assert scheduler.call("shop.test", lambda: "page") == "page"
+
+
+def test_only_one_probe_while_half_open():
+    scheduler = PolitenessScheduler(POLICY)
+    open_breaker(scheduler, "shop.test")
+    assert scheduler.acquire("shop.test") is True
+    wait, probe = scheduler._reserve("shop.test")
+    assert wait > 0 and probe is False
+    scheduler.record("shop.test", True)
+    assert scheduler.acquire("shop.test") is False
+
+
+def test_failed_call_retries_then_raises():
+    scheduler = PolitenessScheduler({**POLICY, "breaker_threshold": 10, "retries": 2})
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TransientError("HTTP 502")
+        return "page"
+    assert scheduler.call("shop.test", flaky) == "page"
+    assert len(calls) == 3
+
+    def down():
+        raise TransientError("HTTP 503")
+    with pytest.raises(TransientError):
+        scheduler.call("other.test", down)
+    assert scheduler.domains["other.test"].counts["failures"] == 3
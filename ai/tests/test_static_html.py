@@ -0,0 +1,130 @@
+import pytest
+import requests
+
+from scrape_sites import SITES, build_docs, fetch_base, listing_url, parse_price
+from static_html import extract_cards_html
+
+# Myntra listing markup as rendered (scripts kept: their text must not leak into fields)
+MYNTRA_PAGE = """
+<html><head><script>window.__myx = {"brand": "not a card"}</script></head><body>
+<ul class="results-base">
+  <li class="product-base" id="p1">
+    <a href="/tshirts/h&amp;m/hm-men-regular-fit-t-shirt/111/buy" target="_blank">
+      <div class="product-imageSliderContainer"><img src="https://assets.myntassets.com/h_720/111.jpg" alt=""></div>
+      <div class="product-productMetaInfo">
+        <h3 class="product-brand">H&amp;M</h3>
+        <h4 class="product-product">Men  Regular Fit
+          T-shirt</h4>
+        <div class="product-price"><span class="product-discountedPrice">Rs. 499</span>
+          <span class="product-strike">Rs. 799</span></div>
+      </div>
+    </a>
+  </li>
+  <li class="product-base" id="p2">
+    <a href="/jeans/h&amp;m/hm-women-boot-cut-jeans/222/buy">
+      <img src="https://assets.myntassets.com/h_720/222.jpg">
+      <h3 class="product-brand">H&amp;M</h3><h4 class="product-product">Women Boot Cut Jeans</h4>
+      <div class="product-price"><span>Rs. 1299</span></div>
+    </a>
+  </li>
+  <li class="product-base" id="ad"><div class="product-sponsored">Sponsored banner</div></li>
+</ul>
+</body></html>
+"""
+
+SUPERKICKS_PAGE = """
+<div class="grid">
+  <div class="card-wrapper">
+    <a href="/products/nike-dunk-low-retro" class="full-unstyled-link">
+      <img data-src="//www.superkicks.in/cdn/shop/files/dunk.jpg" alt="Dunk">
+    </a>
+    <h3 class="card__heading"><a href="/products/nike-dunk-low-retro">Nike Dunk Low Retro</a></h3>
+    <div class="price"><span class="price-item price-item--sale">₹ 8,695.00</span></div>
+  </div>
+  <div class="card-wrapper">
+    <h3 class="card__heading">Gift Card</h3>
+    <div class="price">₹ 1,000.00</div>
+  </div>
+</div>
+"""
+
+VEGNONVEG_PAGE = """
+<section>
+  <div class="product-item">
+    <a href="https://www.vegnonveg.com/footwear/adidas-samba-og"><img src="https://cdn.vegnonveg.com/samba.jpg"></a>
+    <div class="product-name">Adidas Samba OG</div>
+    <span class="product-price">₹ 10,999</span>
+  </div>
+</section>
+"""
+
+
+def test_myntra_card_spec():
+    records = extract_cards_html(MYNTRA_PAGE, SITES["H&M"]["card"])
+    assert records == [
+        # Like querySelector, a selector group returns the first match in document order: the
+        # .product-price block that wraps the discounted price (parse_price reads its first number)
+        {"brand": "H&M", "name": "Men Regular Fit T-shirt", "href": "/tshirts/h&m/hm-men-regular-fit-t-shirt/111/buy",
+         "img": "https://assets.myntassets.com/h_720/111.jpg", "price": "Rs. 499 Rs. 799"},
+        {"brand": "H&M", "name": "Women Boot Cut Jeans", "href": "/jeans/h&m/hm-women-boot-cut-jeans/222/buy",
+         "img": "https://assets.myntassets.com/h_720/222.jpg", "price": "Rs. 1299"},
+    ]
+
+
+def test_superkicks_card_spec():
+    records = extract_cards_html(SUPERKICKS_PAGE, SITES["SuperKicks"]["card"])
+    # The gift card has no product link or image, so required fields drop it
+    assert records == [{
+        "name": "Nike Dunk Low Retro", "price": "₹ 8,695.00", "href": "/products/nike-dunk-low-retro",
+        "img": "//www.superkicks.in/cdn/shop/files/dunk.jpg",
+    }]
+
+
+def test_vegnonveg_card_spec():
+    records = extract_cards_html(VEGNONVEG_PAGE, SITES["VegNonVeg"]["card"])
+    assert records == [{
+        "name": "Adidas Samba OG", "price": "₹ 10,999", "href": "https://www.vegnonveg.com/footwear/adidas-samba-og",
+        "img": "https://cdn.vegnonveg.com/samba.jpg",
+    }]
+
+
+def test_replayed_pages_parse_into_catalog_documents(replay):
+    pages = {
+        ("H&M", "H&M-men", 1, "html"): MYNTRA_PAGE,
+        ("SuperKicks", "collections/footwear", 1, "html"): SUPERKICKS_PAGE,
+        ("VegNonVeg", "footwear", 1, "html"): VEGNONVEG_PAGE,
+    }
+    base_url = replay(pages)
+    docs = {}
+    for label, query, page, _ in pages:
+        site = SITES[label]
+        resp = requests.get(listing_url(site, query, page, fetch_base(site, base_url)), timeout=5)
+        resp.raise_for_status()
+        docs[label] = build_docs(site, extract_cards_html(resp.text, site["card"]))
+
+    hm = docs["H&M"]
+    assert [(d["productName"], d["category"], d["price"], d["source"]) for d in hm] == [
+        ("H&M Men Regular Fit T-shirt", "tshirt", 499, "myntra_h&m"),
+        ("H&M Women Boot Cut Jeans", "jeans", 1299, "myntra_h&m"),
+    ]
+    # Links resolve against the real site, not the replay server
+    assert hm[0]["productUrl"] == "https://www.myntra.com/tshirts/h&m/hm-men-regular-fit-t-shirt/111/buy"
+    [dunk] = docs["SuperKicks"]
+    assert (dunk["productUrl"], dunk["imageUrl"], dunk["price"], dunk["category"]) == (
+        "https://www.superkicks.in/products/nike-dunk-low-retro",
+        "https://www.superkicks.in/cdn/shop/files/dunk.jpg", 8695, "shoes",
+    )
+    [samba] = docs["VegNonVeg"]
+    assert (samba["productName"], samba["price"], samba["source"]) == ("Adidas Samba OG", 10999, "vegnonveg")
+
+
+@pytest.mark.parametrize("text, price", [
+    ("Rs. 499 Rs. 799", 499),
+    ("₹ 8,695.00", 8695),
+    ("₹ 10,999", 10999),
+    ("Rs. 1,00,000", 100000),
+    ("₹1299", 1299),
+    ("Sold out", 0),
+])
+def test_parse_price(text, price):
+    assert parse_price(text) == price
@@ -0,0 +1,187 @@
+"""
+In-memory serving index for style recommendations
+Loads the stored image/text vectors once and builds fused, L2-normalised
+matrices per weighting - re-weighting is a vectorised rebuild, not a re-encode
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from embeddings import fuse_vectors
+
+INDEX_PROJECTION = {
+    "_id": 1,
+    "category": 1,
+    "imageEmbedding": 1,
+    "textEmbedding": 1,
+    "styleEmbedding": 1,
+    "clusterId": 1,
+}
+
+# Fused matrices cached per snapshot (one per distinct weighting in use)
+MAX_CACHED_WEIGHTINGS = 8
+
+# Distinct search looks at k * this many top matches before collapsing clusters
+DUPLICATE_HEADROOM = 3
+
+
+def component_vectors(doc):
+    """
+    Return (image_vec, text_vec) for a product document
+    Legacy documents only have the pre-fused styleEmbedding; using it for both
+    components gives (w_img + w_txt) * style, which has the same direction,
+    so cosine scores are unchanged until the product is re-embedded
+    """
+    image_vec = doc.get("imageEmbedding")
+    text_vec = doc.get("textEmbedding")
+    if image_vec and text_vec:
+        return image_vec, text_vec
+    style_vec = doc.get("styleEmbedding")
+    if style_vec:
+        return style_vec, style_vec
+    return None, None
+
+
+def _normalise_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _weights_key(weights):
+    return (float(weights["image"]), float(weights["text"]))
+
+
+class VectorIndex:
+    """Snapshot of every embedded product, refreshed on a TTL or on demand"""
+
+    def __init__(self, collection, ttl_seconds=300):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def load(self):
+        """Stream all embedded products into component matrices"""
+        started = time.time()
+        ids, categories, clusters, image_rows, text_rows = [], [], [], [], []
+        dim = None
+        skipped = 0
+
+        # Delisted products stay in the catalog but are no longer recommended
+        cursor = self.collection.find(
+            {"styleEmbedding": {"$exists": True}, "delisted": {"$ne": True}}, INDEX_PROJECTION, batch_size=1000
+        )
+        for doc in cursor:
+            image_vec, text_vec = component_vectors(doc)
+            if image_vec is None:
+                continue
+            if dim is None:
+                dim = len(image_vec)
+            # Mixed-dimension rows (old models) cannot share a matrix
+            if len(image_vec) != dim or len(text_vec) != dim:
+                skipped += 1
+                continue
+            ids.append(doc["_id"])
+            categories.append(doc.get("category", "clothing"))
+            clusters.append(doc.get("clusterId"))
+            image_rows.append(image_vec)
+            text_rows.append(text_vec)
+
+        snapshot = {
+            "ids": ids,
+            "positions": {pid: i for i, pid in enumerate(ids)},
+            "categories": np.array(categories, dtype=object),
+            "clusters": np.array(clusters, dtype=object),
+            "image": np.array(image_rows, dtype=np.float32).reshape(len(ids), dim or 0),
+            "text": np.array(text_rows, dtype=np.float32).reshape(len(ids), dim or 0),
+            "fused": {},
+            "loaded_at": time.time(),
+            "load_seconds": round(time.time() - started, 3),
+            "skipped": skipped,
+        }
+        with self._lock:
+            self._snapshot = snapshot
+        return self.stats()
+
+    def _current(self):
+        snap = self._snapshot
+        if snap is None or time.time() - snap["loaded_at"] > self.ttl_seconds:
+            self.load()
+            snap = self._snapshot
+        return snap
+
+    def stats(self):
+        snap = self._snapshot
+        if snap is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "products": len(snap["ids"]),
+            "dimension": int(snap["image"].shape[1]),
+            "skipped_dimension_mismatch": snap["skipped"],
+            "load_seconds": snap["load_seconds"],
+            "cached_weightings": [list(k) for k in snap["fused"]],
+        }
+
+    def _fused(self, snap, weights):
+        key = _weights_key(weights)
+        matrix = snap["fused"].get(key)
+        if matrix is None:
+            matrix = _normalise_rows(fuse_vectors(snap["image"], snap["text"], weights))
+            with self._lock:
+                if len(snap["fused"]) >= MAX_CACHED_WEIGHTINGS:
+                    snap["fused"].clear()
+                snap["fused"][key] = matrix
+        return matrix
+
+    def query_vector(self, product, weights):
+        """Fused, normalised vector for a product document"""
+        snap = self._current()
+        pos = snap["positions"].get(product["_id"])
+        if pos is not None:
+            return self._fused(snap, weights)[pos]
+        # Embedded after the last refresh - fuse it directly
+        image_vec, text_vec = component_vectors(product)
+        if image_vec is None:
+            return None
+        return _normalise_rows(fuse_vectors(image_vec, text_vec, weights))
+
+    def search(self, query_vec, categories, weights, exclude_id=None, k=5, distinct=True):
+        """
+        Top-k cosine matches among products in the given categories
+        distinct: one product per near-duplicate cluster (product_clusters.py),
+        and none from the excluded product's own cluster
+        Returns (results, total_candidates)
+        """
+        snap = self._current()
+        if not snap["ids"]:
+            return [], 0
+        mask = np.isin(snap["categories"], list(categories))
+        pos = snap["positions"].get(exclude_id)
+        if pos is not None:
+            mask[pos] = False
+            if distinct and snap["clusters"][pos] is not None:
+                mask &= snap["clusters"] != snap["clusters"][pos]
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return [], 0
+
+        scores = self._fused(snap, weights)[candidates] @ query_vec
+        # Headroom for duplicates collapsed below
+        want = min(k * DUPLICATE_HEADROOM if distinct else k, len(candidates))
+        top = np.argpartition(-scores, want - 1)[:want]
+        top = top[np.argsort(-scores[top])]
+        results, seen = [], set()
+        for i in top:
+            cluster = snap["clusters"][candidates[i]]
+            if distinct and cluster is not None:
+                if cluster in seen:
+                    continue
+                seen.add(cluster)
+            results.append({"id": snap["ids"][candidates[i]], "score": float(scores[i])})
+            if len(results) == k:
+                break
+        return results, len(candidates)
@@ -0,0 +1,231 @@
+"""Verify keyword categories against the stored CLIP image vectors (zero-shot).
+Every category gets a prototype: the mean of its text prompts ("a photo of a hoodie.")
+encoded by the same CLIP model as the products. All embedded products are scored
+against all prototypes with one matrix multiply per chunk, and products whose
+keyword category loses to another category by a confident margin are flagged
+(categoryCheck) or, with --fix, moved (category + categoryOverride, which ingest
+and reclassify_categories.py keep until the product's content changes).
+
+    python verify_categories.py --dry-run --samples 5
+    python verify_categories.py                  # flag disagreements
+    python verify_categories.py --fix --margin 0.5
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import numpy as np
+from pymongo import MongoClient, UpdateOne
+
+from categories import DEFAULT_CATEGORY
+from embeddings import MODEL_NAME, MODEL_VERSION, get_model
+from reclassify_categories import FIXED_CATEGORIES
+from vector_index import _normalise_rows
+
+client = MongoClient("mongodb://localhost:27017/")
+db = client["value_scout"]
+coll = db["products"]
+
+CHUNK_SIZE = 20000
+BATCH_SIZE = 1000
+
+# Prototype prompts per category (categories.py rows; the "clothing" default has none)
+PROMPTS = {
+    "shoes": ["a pair of shoes", "a pair of sneakers", "a pair of running shoes", "a pair of boots",
+              "a pair of sandals"],
+    "tshirt": ["a t-shirt", "a polo shirt", "a sports jersey"],
+    "hoodie": ["a hoodie", "a sweatshirt", "a sweater"],
+    "jacket": ["a jacket", "a coat", "a blazer"],
+    "dress": ["a dress", "a skirt", "a jumpsuit"],
+    "shirt": ["a button-up shirt", "a blouse", "a women's top"],
+    "shorts": ["a pair of shorts"],
+    "jeans": ["a pair of jeans"],
+    "pants": ["a pair of trousers", "a pair of joggers", "a pair of track pants", "a pair of leggings"],
+}
+TEMPLATES = ["a photo of {}.", "a product photo of {} on a white background.", "an e-commerce photo of {}."]
+
+# CLIP's learned logit scale: softmax(100 * cosine) gives zero-shot probabilities
+LOGIT_SCALE = 100.0
+# Probability lead the predicted category needs over the keyword category
+DEFAULT_MARGIN = 0.4
+
+PROTOTYPE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_prototypes.npz")
+
+
+def _prompt_key():
+    payload = json.dumps([MODEL_NAME, MODEL_VERSION, PROMPTS, TEMPLATES], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def category_prototypes(refresh=False):
+    """
+    (categories, prototype matrix) - one L2-normalised row per category
+    Encoded once and cached in PROTOTYPE_FILE until the model or prompts change
+    """
+    key = _prompt_key()
+    if not refresh and os.path.exists(PROTOTYPE_FILE):
+        cached = np.load(PROTOTYPE_FILE, allow_pickle=False)
+        if str(cached["key"]) == key:
+            return [str(c) for c in cached["categories"]], cached["prototypes"]
+
+    categories = list(PROMPTS)
+    texts = [template.format(prompt) for c in categories for prompt in PROMPTS[c] for template in TEMPLATES]
+    vectors = _normalise_rows(np.asarray(get_model().encode(texts, convert_to_numpy=True), dtype=np.float32))
+    rows, start = [], 0
+    for c in categories:
+        n = len(PROMPTS[c]) * len(TEMPLATES)
+        rows.append(vectors[start:start + n].mean(axis=0))
+        start += n
+    prototypes = _normalise_rows(np.array(rows, dtype=np.float32))
+    np.savez(PROTOTYPE_FILE, key=key, categories=np.array(categories), prototypes=prototypes)
+    print(f"🧭 Encoded {len(texts)} prompts into {len(categories)} category prototypes")
+    return categories, prototypes
+
+
+def _embedded_products(query):
+    """
+    (doc, vector) for every embedded product: the image vector where stored,
+    else the legacy fused styleEmbedding (mostly image, same CLIP space)
+    """
+    fields = {"category": 1, "source": 1, "productName": 1, "categoryCheck.fixed": 1}
+    for vector_field, scope in (("imageEmbedding", {"imageEmbedding": {"$exists": True}}),
+                                ("styleEmbedding", {"imageEmbedding": {"$exists": False},
+                                                    "styleEmbedding": {"$exists": True}})):
+        cursor = coll.find({**query, **scope}, {**fields, vector_field: 1}, batch_size=BATCH_SIZE)
+        for doc in cursor:
+            yield doc, doc.pop(vector_field)
+
+
+def _chunks(rows, dim, size):
+    """Fill preallocated float32 matrices of `size` rows; rows of another dimension are skipped"""
+    docs, matrix, skipped = [], np.empty((size, dim), dtype=np.float32), 0
+    for doc, vector in rows:
+        if len(vector) != dim:
+            skipped += 1
+            continue
+        matrix[len(docs)] = vector
+        docs.append(doc)
+        if len(docs) == size:
+            yield docs, matrix, skipped
+            docs, matrix, skipped = [], np.empty((size, dim), dtype=np.float32), 0
+    if docs or skipped:
+        yield docs, matrix[:len(docs)], skipped
+
+
+def score(matrix, prototypes):
+    """Zero-shot category probabilities for a chunk of product vectors (rows x categories)"""
+    logits = LOGIT_SCALE * (_normalise_rows(matrix) @ prototypes.T)
+    logits -= logits.max(axis=1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def verdicts(probs, current, categories):
+    """
+    Per product: (predicted index, confidence, margin)
+    The margin is the predicted probability minus that of the keyword category,
+    or of the runner-up when the keyword category has no prototype ("clothing")
+    """
+    order = np.argsort(-probs, axis=1)
+    predicted, runner_up = order[:, 0], order[:, 1]
+    rows = np.arange(len(probs))
+    index = {c: i for i, c in enumerate(categories)}
+    reference = np.array([index.get(c, -1) for c in current])
+    reference = np.where(reference < 0, runner_up, reference)
+    confidence = probs[rows, predicted]
+    return predicted, confidence, confidence - probs[rows, reference]
+
+
+def verify(sources=None, margin=DEFAULT_MARGIN, fix=False, dry_run=False, samples=3,
+           chunk_size=CHUNK_SIZE, refresh_prototypes=False):
+    categories, prototypes = category_prototypes(refresh_prototypes)
+    dim = prototypes.shape[1]
+
+    # Delisted products are never recommended; store listings are authoritative for their category
+    query = {"delisted": {"$ne": True}, "source": {"$nin": list(FIXED_CATEGORIES)}}
+    if sources:
+        query["source"]["$in"] = sources
+
+    moves = Counter()
+    examples = defaultdict(list)
+    ops = []
+    scanned = flagged = cleared = skipped = 0
+    load_seconds = score_seconds = 0.0
+    now = datetime.utcnow()
+
+    started = time.perf_counter()
+    for docs, matrix, chunk_skipped in _chunks(_embedded_products(query), dim, chunk_size):
+        skipped += chunk_skipped
+        if not docs:
+            continue
+        t0 = time.perf_counter()
+        load_seconds += t0 - started
+        current = [d.get("category") or DEFAULT_CATEGORY for d in docs]
+        predicted, confidence, lead = verdicts(score(matrix, prototypes), current, categories)
+        score_seconds += time.perf_counter() - t0
+
+        for doc, old, p, conf, m in zip(docs, current, predicted, confidence, lead):
+            scanned += 1
+            new = categories[p]
+            if new == old or m < margin:
+                # Agrees (or not confidently enough): drop a flag left by an earlier run; fixes keep theirs
+                check = doc.get("categoryCheck")
+                if check and not check.get("fixed") and not dry_run:
+                    ops.append(UpdateOne({"_id": doc["_id"]}, {"$unset": {"categoryCheck": ""}}))
+                    cleared += 1
+                continue
+            flagged += 1
+            moves[(old, new)] += 1
+            if len(examples[(old, new)]) < samples:
+                examples[(old, new)].append(f"{(doc.get('productName') or '')[:60]} [{conf:.2f}, +{m:.2f}]")
+            if dry_run:
+                continue
+            check = {"keyword": old, "suggested": new, "confidence": round(float(conf), 3),
+                     "margin": round(float(m), 3), "model": MODEL_NAME, "checkedAt": now, "fixed": fix}
+            update = {"$set": {"categoryCheck": check}}
+            if fix:
+                update["$set"].update({"category": new, "categoryOverride": new})
+            ops.append(UpdateOne({"_id": doc["_id"], "category": doc.get("category")}, update))
+        if len(ops) >= BATCH_SIZE:
+            coll.bulk_write(ops, ordered=False)
+            ops = []
+        started = time.perf_counter()
+    if ops:
+        coll.bulk_write(ops, ordered=False)
+
+    action = "would be flagged" if dry_run else ("moved" if fix else "flagged")
+    print(f"Scored {scanned} products against {len(categories)} categories in {score_seconds:.2f}s "
+          f"(loaded in {load_seconds:.1f}s); {flagged} {action} at margin {margin}")
+    if skipped:
+        print(f"⚠️  {skipped} products skipped (vector dimension != {dim}, embedded by another model)")
+    if cleared:
+        print(f"🧹 {cleared} earlier flags cleared")
+    if moves:
+        print(f"\n{'keyword':<12} {'embedding':<12} {'count':>7}")
+        print("-" * 33)
+        for (old, new), count in moves.most_common():
+            print(f"{old:<12} {new:<12} {count:>7}")
+            for example in examples[(old, new)]:
+                print(f"    e.g. {example}")
+    return moves
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check keyword categories against CLIP zero-shot prototypes")
+    parser.add_argument("--source", action="append", help="Only this source (repeatable; default: all)")
+    parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN,
+                        help=f"Probability lead needed to flag/fix (default: {DEFAULT_MARGIN})")
+    parser.add_argument("--fix", action="store_true", help="Move flagged products to the predicted category")
+    parser.add_argument("--dry-run", action="store_true", help="Only report disagreements")
+    parser.add_argument("--samples", type=int, default=3, help="Example products per move (default: 3)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Products scored per matrix multiply")
+    parser.add_argument("--refresh-prototypes", action="store_true", help="Re-encode the category prompts")
+    args = parser.parse_args()
+
+    verify(args.source, args.margin, args.fix, args.dry_run, args.samples, args.chunk_size,
+           args.refresh_prototypes)
+    print("Done.")